@@ -6,8 +6,9 @@ from gtfspy import TransitData
 DEFAULT_GTFS_FILE_PATH = os.path.join("..", "tests", "resources", "minimized_real_gtfs.zip")
 
 
-def load_gtfs(gtfs_file_path):
-    td = TransitData(gtfs_file_path)
+def load_gtfs(gtfs_file_path, workers=None):
+    td = TransitData()
+    td.load_gtfs_file(gtfs_file_path, workers=workers)
     print "TransitData object contains:"
     print "%d agencies" % (len(td.agencies))
     print "%d routes" % (len(td.routes))
@@ -22,11 +23,12 @@ def load_gtfs(gtfs_file_path):
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--gtfs-file-path", default=DEFAULT_GTFS_FILE_PATH)
+    parser.add_argument("-w", "--workers", type=int, default=None)
 
     args = parser.parse_args()
     gtfs_file_path = args.gtfs_file_path
 
-    load_gtfs(gtfs_file_path)
+    load_gtfs(gtfs_file_path, workers=args.workers)
 
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ import logging
 import os
 import time
 from datetime import datetime
+from multiprocessing import Pool
 
 import psutil
 
@@ -23,16 +24,16 @@ def pretty_size(bytes_num):
     return "%s %s" % (round(bytes_num, 2), sizes[i])
 
 
-def check_resources(gtfs_file_path):
+def check_resources(gtfs_file_path, compact_objects=False):
     process = psutil.Process(os.getpid())
 
-    start_memory = process.memory_info().vms
-    logging.info("Start our's")
+    start_memory = process.memory_info().rss
+    logging.info("Start our's (compact objects: %s)" % (compact_objects,))
     start = datetime.now()
-    td = TransitData(gtfs_file_path)
+    td = TransitData(gtfs_file_path, compact_objects=compact_objects)
     logging.info("End our's. duration: %s" % (datetime.now() - start,))
-    logging.info("Memory usage: %s (%s)" % (pretty_size(process.memory_info().vms - start_memory),
-                                            pretty_size(process.memory_info().vms)))
+    memory_usage = process.memory_info().rss - start_memory
+    logging.info("Memory usage: %s (%s)" % (pretty_size(memory_usage), pretty_size(process.memory_info().rss)))
 
     del td
     gc.collect()
@@ -40,15 +41,40 @@ def check_resources(gtfs_file_path):
     uo = gc.collect()
     logging.info("Unreachable objects: %s" % (uo,))
 
+    return memory_usage
+
+
+def compare_compact_objects(gtfs_file_path):
+    # every check runs in a fresh process, so the memory freed by the previous one won't hide the next one's usage
+    memory_usages = {}
+    for compact_objects in [False, True]:
+        pool = Pool(processes=1)
+        try:
+            memory_usages[compact_objects] = pool.apply(check_resources, (gtfs_file_path, compact_objects))
+        finally:
+            pool.close()
+            pool.join()
+
+    saved_memory = memory_usages[False] - memory_usages[True]
+    logging.info("Compact objects memory gain: %s (%.1f%%)" %
+                 (pretty_size(saved_memory), 100.0 * saved_memory / max(memory_usages[False], 1)))
+
 
 def main():
+    logging.basicConfig(level=logging.INFO)
+
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--gtfs-file-path", default=DEFAULT_GTFS_FILE_PATH)
+    parser.add_argument("-c", "--compare-compact", action="store_true",
+                        help="report the memory gain of the compact objects")
 
     args = parser.parse_args()
     gtfs_file_path = args.gtfs_file_path
 
-    check_resources(gtfs_file_path)
+    if args.compare_compact:
+        compare_compact_objects(gtfs_file_path)
+    else:
+        check_resources(gtfs_file_path)
 
 
 if __name__ == '__main__':
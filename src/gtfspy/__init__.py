@@ -1,3 +1,6 @@
+__version__ = "0.1"
+
 import data_objects
+from transit_data_cache import TransitDataCache
 from transit_data_object import TransitData
 from transit_data_utils import *
@@ -1,4 +1,5 @@
 from agency import *
+from compact_object import *
 from fare_attribute import *
 from fare_rule import *
 from line import *
@@ -7,6 +8,8 @@ from service import *
 from shape import *
 from stop import *
 from stop_time import *
+from stop_time_table import *
+from tracked_object import *
 from translator import *
 from trip import *
 from unknown_file import *
@@ -2,10 +2,11 @@
 import gtfspy
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
 from gtfspy.data_objects.line import LineCollection
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.validating import not_none_or_empty
 
 
-class Agency(object):
+class Agency(TrackedObject):
     def __init__(self, transit_data, agency_id, agency_name, agency_url, agency_timezone, agency_lang=None,
                  agency_phone=None, agency_email=None, agency_fare_url=None, **kwargs):
         """
@@ -20,20 +21,22 @@ class Agency(object):
         :type agency_fare_url: str | None
         """
 
+        self._collection = None
         self._id = int(agency_id)
-        self.agency_name = agency_name
-        self.agency_url = agency_url
-        self.agency_timezone = agency_timezone
+        self._agency_name = agency_name
+        self._agency_url = agency_url
+        self._agency_timezone = agency_timezone
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(agency_lang):
-            self.attributes["agency_lang"] = str(agency_lang)
+            attributes["agency_lang"] = str(agency_lang)
         if not_none_or_empty(agency_phone):
-            self.attributes["agency_phone"] = str(agency_phone)
+            attributes["agency_phone"] = str(agency_phone)
         if not_none_or_empty(agency_email):
-            self.attributes["agency_email"] = str(agency_email)
+            attributes["agency_email"] = str(agency_email)
         if not_none_or_empty(agency_fare_url):
-            self.attributes["agency_fare_url"] = str(agency_fare_url)
+            attributes["agency_fare_url"] = str(agency_fare_url)
+        self._set_attributes(attributes)
 
         self.lines = LineCollection(transit_data, self)
 
@@ -41,6 +44,65 @@ class Agency(object):
     def id(self):
         return self._id
 
+    def _changed(self):
+        """
+        Reports a change of the agency to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("agency.txt")
+
+    @property
+    def agency_name(self):
+        """
+        :rtype: str
+        """
+
+        return self._agency_name
+
+    @agency_name.setter
+    def agency_name(self, value):
+        """
+        :type value: str
+        """
+
+        self._agency_name = value
+        self._changed()
+
+    @property
+    def agency_url(self):
+        """
+        :rtype: str
+        """
+
+        return self._agency_url
+
+    @agency_url.setter
+    def agency_url(self, value):
+        """
+        :type value: str
+        """
+
+        self._agency_url = value
+        self._changed()
+
+    @property
+    def agency_timezone(self):
+        """
+        :rtype: str
+        """
+
+        return self._agency_timezone
+
+    @agency_timezone.setter
+    def agency_timezone(self, value):
+        """
+        :type value: str
+        """
+
+        self._agency_timezone = value
+        self._changed()
+
     @property
     def agency_lang(self):
         """
@@ -152,10 +214,12 @@ class AgencyCollection(BaseGtfsObjectCollection):
             if condition is not None and not condition(agency):
                 return None
 
-            self._transit_data._changed()
+            self._transit_data._changed("agency.txt")
 
             assert agency.id not in self._objects
             self._objects[agency.id] = agency
+            agency._collection = self
+            self._csv_schema.update(agency.get_csv_fields())
             return agency
         except:
             if not ignore_errors:
@@ -189,10 +253,12 @@ class AgencyCollection(BaseGtfsObjectCollection):
             for line in agency.lines:
                 assert len(line.routes) == 0
 
+        self._transit_data._changed("agency.txt")
         del self._objects[agency.id]
+        agency._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
@@ -200,5 +266,8 @@ class AgencyCollection(BaseGtfsObjectCollection):
             if next((route for line in agency.lines for route in line.routes), None) is None:
                 to_clean.append(agency)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("agency.txt")
         for agency in to_clean:
             del self._objects[agency.id]
+            agency._collection = None
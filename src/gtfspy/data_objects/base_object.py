@@ -3,6 +3,7 @@ import sys
 from abc import abstractmethod
 
 import gtfspy
+from gtfspy.utils.csv_schema import CsvSchema
 
 
 class BaseGtfsObjectCollection(object):
@@ -14,6 +15,7 @@ class BaseGtfsObjectCollection(object):
         self._transit_data = transit_data
         self._objects_type = objects_type
         self._objects = {}
+        self._csv_schema = CsvSchema()
 
     @abstractmethod
     def add(self, ignore_errors=False, condition=None, **kwargs):
@@ -24,22 +26,22 @@ class BaseGtfsObjectCollection(object):
             with open(csv_file, "wb") as f:
                 self.save(f)
         else:
-            fields = []
+            # attributes can be set on the objects after they were added, so make sure they are in the schema
             for obj in self:
-                fields += (field for field in obj.get_csv_fields() if field not in fields)
+                self._csv_schema.update(obj.attributes)
 
-            writer = csv.DictWriter(csv_file, fieldnames=fields, restval=None)
-            writer.writeheader()
-            writer.writerows(obj.to_csv_line() for obj in self)
+            self._csv_schema.write(csv_file, (obj.to_csv_line() for obj in self))
 
     def _load_file(self, csv_file, ignore_errors=False, filter=None):
         if isinstance(csv_file, str):
             with open(csv_file, "rb") as f:
                 self._load_file(f, ignore_errors=ignore_errors, filter=filter)
         else:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                self.add(ignore_errors=ignore_errors, condition=filter, **row)
+            self._load_rows(csv.DictReader(csv_file), ignore_errors=ignore_errors, filter=filter)
+
+    def _load_rows(self, rows, ignore_errors=False, filter=None):
+        for row in rows:
+            self.add(ignore_errors=ignore_errors, condition=filter, **row)
 
     def validate(self):
         for i, obj in self._objects.iteritems():
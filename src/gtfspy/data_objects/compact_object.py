@@ -0,0 +1,209 @@
+from collections import MutableMapping
+
+
+def create_attributes_slots(*fields):
+    """
+    Creates the attributes schema of a compact object: the slot name of every known optional field.
+
+    :type fields: str
+    :rtype: dict[str, str]
+    """
+
+    return {field: "_" + field for field in fields}
+
+
+def create_attribute_property(base_property, field, default=None, parse=None):
+    """
+    Creates a compact class' property of a known optional field, which reads the field's slot directly instead of going
+    through the attributes view. The field is set by the base class' setter.
+
+    :param base_property: the base class' property of the field
+    :type base_property: property
+    :type field: str
+    :param default: the value of a missing field
+    :param parse: a function applied to the field's value (or the default) by the base class' getter
+    :type parse: ((object) -> object) | None
+    :rtype: property
+    """
+
+    slot = "_" + field
+    if parse is None:
+        def getter(self):
+            return getattr(self, slot, default)
+    else:
+        def getter(self):
+            return parse(getattr(self, slot, default))
+
+    return property(getter, base_property.fset, doc=base_property.__doc__)
+
+
+class CompactAttributes(MutableMapping):
+    """
+    The attributes of a compact object, exposed as a dict like object.
+
+    The known optional fields are stored in the object's slots (an unset slot is a missing field), and only the
+    unknown fields are stored in a dict, which is created when the first one is set.
+    """
+
+    __slots__ = ["_obj"]
+
+    def __init__(self, obj):
+        """
+        :type obj: CompactObject
+        """
+
+        self._obj = obj
+
+    def __getitem__(self, key):
+        obj = self._obj
+        slot = obj._ATTRIBUTES_SLOTS.get(key)
+        try:
+            if slot is not None:
+                return getattr(obj, slot)
+            return obj._extra_attributes[key]
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._set(key, value)
+        self._obj._changed()
+
+    def _set(self, key, value):
+        # sets the field without reporting the change
+        obj = self._obj
+        slot = obj._ATTRIBUTES_SLOTS.get(key)
+        if slot is not None:
+            setattr(obj, slot, value)
+        else:
+            try:
+                obj._extra_attributes[key] = value
+            except AttributeError:
+                obj._extra_attributes = {key: value}
+
+    def __delitem__(self, key):
+        obj = self._obj
+        slot = obj._ATTRIBUTES_SLOTS.get(key)
+        try:
+            if slot is not None:
+                delattr(obj, slot)
+            else:
+                del obj._extra_attributes[key]
+                if len(obj._extra_attributes) == 0:
+                    del obj._extra_attributes
+        except AttributeError:
+            raise KeyError(key)
+        obj._changed()
+
+    def __iter__(self):
+        obj = self._obj
+        for key, slot in obj._ATTRIBUTES_SLOTS.iteritems():
+            if hasattr(obj, slot):
+                yield key
+        for key in getattr(obj, "_extra_attributes", ()):
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _to_dict(self):
+        """
+        :return: the attributes, read from the slots in a single pass
+        :rtype: dict
+        """
+
+        obj = self._obj
+        result = dict(getattr(obj, "_extra_attributes", ()))
+        for key, slot in obj._ATTRIBUTES_SLOTS.iteritems():
+            try:
+                result[key] = getattr(obj, slot)
+            except AttributeError:
+                pass
+        return result
+
+    def __eq__(self, other):
+        # the objects are compared by their attributes, so the comparison skips Mapping's generic one
+        if type(other) is CompactAttributes:
+            other = other._to_dict()
+        return self._to_dict() == other
+
+    def __ne__(self, other):
+        return not (self == other)
+
+
+class SlottedObject(object):
+    """
+    Base class of the data objects that keep their fields in __slots__ instead of a __dict__.
+
+    The objects are pickled by the values of their set slots, which also works with the pickle protocols 0 and 1. The
+    links to the objects' owners aren't pickled, since a copy of an object isn't owned by any transit data.
+    """
+
+    __slots__ = ()
+
+    _OWNER_SLOTS = frozenset(["_collection", "_shape"])
+
+    def __getstate__(self):
+        state = {}
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if slot != "__weakref__" and slot not in SlottedObject._OWNER_SLOTS:
+                    try:
+                        # the slot's own descriptor, since the slot's name may be shadowed by a subclass' property
+                        state[slot] = cls.__dict__[slot].__get__(self, cls)
+                    except AttributeError:
+                        pass
+        return state
+
+    def __setstate__(self, state):
+        for cls in type(self).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if slot in SlottedObject._OWNER_SLOTS:
+                    cls.__dict__[slot].__set__(self, None)
+                elif slot in state:
+                    cls.__dict__[slot].__set__(self, state[slot])
+
+
+class CompactObject(object):
+    """
+    Base class of the compact variants of the data objects.
+
+    A compact class inherits from CompactObject and from the slotted base of the regular data object class (e.g.
+    BaseRoute, which the regular Route extends with an attributes dict and a __dict__ through TrackedObject), defines
+    its attributes schema in _ATTRIBUTES_SLOTS (see create_attributes_slots) and lists the schema's slots and an
+    _extra_attributes slot for the unknown fields in its __slots__, so a compact object has no __dict__. The base
+    class' getters, setters and to_csv_line work unchanged through the attributes view, which reports the changes of
+    the fields with the object's _changed method (see TrackedObject).
+    """
+
+    __slots__ = ()
+
+    _ATTRIBUTES_SLOTS = {}
+
+    @property
+    def attributes(self):
+        """
+        :rtype: CompactAttributes
+        """
+
+        return CompactAttributes(self)
+
+    @attributes.setter
+    def attributes(self, value):
+        """
+        :type value: dict
+        """
+
+        attributes = CompactAttributes(self)
+        attributes.clear()
+        attributes.update(value)
+
+    def _set_attributes(self, attributes):
+        """
+        Sets the attributes of an object that is being created, without reporting the change.
+
+        :type attributes: collections.Mapping
+        """
+
+        compact_attributes = CompactAttributes(self)
+        for key, value in attributes.iteritems():
+            compact_attributes._set(key, value)
@@ -1,30 +1,109 @@
 import gtfspy
 from gtfspy.data_objects import Agency
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.parsing import parse_or_default
 from gtfspy.utils.validating import not_none_or_empty
 
 
-class FareAttribute(object):
+class FareAttribute(TrackedObject):
     def __init__(self, transit_data, fare_id, price, currency_type, payment_method, transfers, agency_id=None,
                  transfer_duration=None,
                  **kwargs):
+        self._collection = None
         self._id = fare_id
-        self.price = float(price)
-        self.currency_type = currency_type
-        self.payment_method = int(payment_method)
-        self.transfers = parse_or_default(transfers, None, int)
+        self._price = float(price)
+        self._currency_type = currency_type
+        self._payment_method = int(payment_method)
+        self._transfers = parse_or_default(transfers, None, int)
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(agency_id):
-            self.attributes["agency_id"] = transit_data.agencies[int(agency_id)]
+            attributes["agency_id"] = transit_data.agencies[int(agency_id)]
         if not_none_or_empty(transfer_duration):
-            self.attributes["transfer_duration"] = int(transfer_duration)
+            attributes["transfer_duration"] = int(transfer_duration)
+        self._set_attributes(attributes)
 
     @property
     def id(self):
         return self._id
 
+    def _changed(self):
+        """
+        Reports a change of the fare attribute to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("fare_attributes.txt")
+
+    @property
+    def price(self):
+        """
+        :rtype: float
+        """
+
+        return self._price
+
+    @price.setter
+    def price(self, value):
+        """
+        :type value: float
+        """
+
+        self._price = value
+        self._changed()
+
+    @property
+    def currency_type(self):
+        """
+        :rtype: str
+        """
+
+        return self._currency_type
+
+    @currency_type.setter
+    def currency_type(self, value):
+        """
+        :type value: str
+        """
+
+        self._currency_type = value
+        self._changed()
+
+    @property
+    def payment_method(self):
+        """
+        :rtype: int
+        """
+
+        return self._payment_method
+
+    @payment_method.setter
+    def payment_method(self, value):
+        """
+        :type value: int
+        """
+
+        self._payment_method = value
+        self._changed()
+
+    @property
+    def transfers(self):
+        """
+        :rtype: int | None
+        """
+
+        return self._transfers
+
+    @transfers.setter
+    def transfers(self, value):
+        """
+        :type value: int | None
+        """
+
+        self._transfers = value
+        self._changed()
+
     @property
     def is_prepaid_needed(self):
         """
@@ -126,10 +205,12 @@ class FareAttributeCollection(BaseGtfsObjectCollection):
             if condition is not None and not condition(fare_attribute):
                 return None
 
-            self._transit_data._changed()
+            self._transit_data._changed("fare_attributes.txt")
 
             assert fare_attribute.id not in self._objects
             self._objects[fare_attribute.id] = fare_attribute
+            fare_attribute._collection = self
+            self._csv_schema.update(fare_attribute.get_csv_fields())
             return fare_attribute
         except:
             if not ignore_errors:
@@ -152,25 +233,27 @@ class FareAttributeCollection(BaseGtfsObjectCollection):
             assert self[fare_attribute.id] is fare_attribute
 
         if recursive:
-            fare_rules_to_clean = [fare_rule for fare_rule in self._transit_data.fare_rules
-                                   if fare_rule.fare is fare_attribute]
-            for fare_rule in fare_rules_to_clean:
+            for fare_rule in self._transit_data.fare_rules.get_by_fare_id(fare_attribute.id):
                 self._transit_data.fare_rules.remove(fare_rule, recursive=True, clean_after=False)
         else:
-            assert next((fare_rule for fare_rule in self._transit_data.fare_rules if fare_rule.fare is fare_attribute),
-                        None) is None
+            assert len(self._transit_data.fare_rules.get_by_fare_id(fare_attribute.id)) == 0
 
+        self._transit_data._changed("fare_attributes.txt")
         del self._objects[fare_attribute.id]
+        fare_attribute._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
-        fares_with_rules = {fare_rule.fare.id for fare_rule in self._transit_data.fare_rules}
-        to_clean = [fare_attribute for fare_attribute in self if fare_attribute.id not in fares_with_rules]
+        to_clean = [fare_attribute for fare_attribute in self
+                    if len(self._transit_data.fare_rules.get_by_fare_id(fare_attribute.id)) == 0]
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("fare_attributes.txt")
         for fare_attribute in to_clean:
             del self._objects[fare_attribute.id]
+            fare_attribute._collection = None
 
     def has_data(self):
         return len(self._objects) > 0
@@ -1,11 +1,16 @@
 import csv
 import sys
+from collections import OrderedDict, defaultdict
 
 import gtfspy
+from gtfspy.data_objects.tracked_object import TrackedObject
+from gtfspy.utils.csv_schema import CsvSchema
 from gtfspy.utils.validating import not_none_or_empty
 
+ZONE_FIELDS = ["origin_id", "destination_id", "contains_id"]
 
-class FareRule(object):
+
+class FareRule(TrackedObject):
     def __init__(self, transit_data, fare_id, route_id=None, origin_id=None, destination_id=None, contains_id=None,
                  **kwargs):
         """
@@ -17,17 +22,43 @@ class FareRule(object):
         :type contains_id: str | int | None
         """
 
-        self.fare = transit_data.fare_attributes[fare_id]
+        self._collection = None
+        self._fare = transit_data.fare_attributes[fare_id]
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(route_id):
-            self.attributes["route_id"] = transit_data.routes[route_id]
+            attributes["route_id"] = transit_data.routes[route_id]
         if not_none_or_empty(origin_id):
-            self.attributes["origin_id"] = int(origin_id)
+            attributes["origin_id"] = int(origin_id)
         if not_none_or_empty(destination_id):
-            self.attributes["destination_id"] = int(destination_id)
+            attributes["destination_id"] = int(destination_id)
         if not_none_or_empty(contains_id):
-            self.attributes["contains_id"] = int(contains_id)
+            attributes["contains_id"] = int(contains_id)
+        self._set_attributes(attributes)
+
+    def _changed(self):
+        """
+        Reports a change of the fare rule to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("fare_rules.txt")
+
+    @property
+    def fare(self):
+        """
+        :rtype: gtfspy.data_objects.FareAttribute
+        """
+
+        return self._fare
+
+    @fare.setter
+    def fare(self, value):
+        """
+        :type value: gtfspy.data_objects.FareAttribute
+        """
+
+        self._set_indexed_value("_fare", value)
 
     @property
     def route(self):
@@ -43,7 +74,7 @@ class FareRule(object):
         :type value: gtfspy.data_objects.Route | None
         """
 
-        self.attributes["route_id"] = value
+        self._set_indexed_value("route_id", value)
 
     @property
     def origin_id(self):
@@ -59,7 +90,7 @@ class FareRule(object):
         :type value: int | None
         """
 
-        self.attributes["origin_id"] = value
+        self._set_indexed_value("origin_id", value)
 
     @property
     def destination_id(self):
@@ -75,7 +106,7 @@ class FareRule(object):
         :type value: int | None
         """
 
-        self.attributes["destination_id"] = value
+        self._set_indexed_value("destination_id", value)
 
     @property
     def contains_id(self):
@@ -91,7 +122,22 @@ class FareRule(object):
         :type value: int | None
         """
 
-        self.attributes["contains_id"] = value
+        self._set_indexed_value("contains_id", value)
+
+    def _set_indexed_value(self, key, value):
+        # the fare rule's collection indexes it by its fare, route and zones, so it's re-indexed on their change
+        collection = self._collection
+        if collection is not None:
+            collection._unindex(self)
+
+        if key == "_fare":
+            self._fare = value
+            self._changed()
+        else:
+            self.attributes[key] = value
+
+        if collection is not None:
+            collection._index(self)
 
     def get_csv_fields(self):
         return ["fare_id"] + self.attributes.keys()
@@ -124,13 +170,25 @@ class FareRule(object):
 
 
 class FareRuleCollection:
+    """
+    The fare rules of a transit data, in the order they were added.
+
+    The fare rules are indexed by their fare id, route and origin, destination and contains zones, so they can be looked
+    up and removed without scanning the whole collection.
+    """
+
     def __init__(self, transit_data, csv_file=None):
         """
         :type transit_data: gtfspy.transit_data_object.TransitData
         """
 
         self._transit_data = transit_data
-        self._objects = []
+        # the fare rules keyed by their identity, in the order they were added
+        self._objects = OrderedDict()
+        self._fare_index = defaultdict(set)
+        self._route_index = defaultdict(set)
+        self._zones_indexes = {field: defaultdict(set) for field in ZONE_FIELDS}
+        self._csv_schema = CsvSchema()
 
         if csv_file is not None:
             self._load_file(csv_file)
@@ -142,9 +200,12 @@ class FareRuleCollection:
             if condition is not None and not condition(fare_rule):
                 return None
 
-            self._transit_data._changed()
+            self._transit_data._changed("fare_rules.txt")
 
-            self._objects.append(fare_rule)
+            self._objects[id(fare_rule)] = fare_rule
+            self._index(fare_rule)
+            fare_rule._collection = self
+            self._csv_schema.update(fare_rule.get_csv_fields())
             return fare_rule
         except:
             if not ignore_errors:
@@ -160,30 +221,125 @@ class FareRuleCollection:
         return self.add(**fare_rule.to_csv_line())
 
     def remove(self, fare_rule, recursive=False, clean_after=True):
-        self._objects.remove(fare_rule)
+        collection_fare_rule = self._find(fare_rule)
+        if collection_fare_rule is None:
+            raise ValueError("The fare rule isn't in the collection")
+        fare_rule = collection_fare_rule
+
+        self._transit_data._changed("fare_rules.txt")
+        self._transit_data._touched(fare_rule.fare)
+        self._remove(fare_rule)
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
-        zone_ids = {stop.zone_id for stop in self._transit_data.stops}
-        fare_rules_to_clean = [fare_rule for fare_rule in self
-                               if (fare_rule.route is not None
-                                   and fare_rule.route.id not in self._transit_data.routes)
-                               or (fare_rule.origin_id is not None and fare_rule.origin_id not in zone_ids)
-                               or (fare_rule.destination_id is not None and fare_rule.destination_id not in zone_ids)
-                               or (fare_rule.contains_id is not None and fare_rule.contains_id not in zone_ids)]
+        fare_rules_to_clean = set()
+        for route, fare_rules in self._route_index.iteritems():
+            if route.id not in self._transit_data.routes:
+                fare_rules_to_clean.update(fare_rules)
+
+        if any(len(zone_index) > 0 for zone_index in self._zones_indexes.itervalues()):
+            zone_ids = {stop.zone_id for stop in self._transit_data.stops}
+            for zone_index in self._zones_indexes.itervalues():
+                for zone_id, fare_rules in zone_index.iteritems():
+                    if zone_id not in zone_ids:
+                        fare_rules_to_clean.update(fare_rules)
+
+        if len(fare_rules_to_clean) > 0:
+            self._transit_data._changed("fare_rules.txt")
         for fare_rule in fare_rules_to_clean:
-            self._objects.remove(fare_rule)
+            self._remove(fare_rule)
+
+    def get_by_fare_id(self, fare_id):
+        """
+        :type fare_id: str
+        :rtype: list[FareRule]
+        """
+
+        return list(self._fare_index.get(fare_id, ()))
+
+    def get_by_route(self, route):
+        """
+        :type route: gtfspy.data_objects.Route
+        :rtype: list[FareRule]
+        """
+
+        return list(self._route_index.get(route, ()))
+
+    def get_by_origin_id(self, zone_id):
+        """
+        :type zone_id: int
+        :rtype: list[FareRule]
+        """
+
+        return list(self._zones_indexes["origin_id"].get(zone_id, ()))
+
+    def get_by_destination_id(self, zone_id):
+        """
+        :type zone_id: int
+        :rtype: list[FareRule]
+        """
+
+        return list(self._zones_indexes["destination_id"].get(zone_id, ()))
+
+    def get_by_contains_id(self, zone_id):
+        """
+        :type zone_id: int
+        :rtype: list[FareRule]
+        """
+
+        return list(self._zones_indexes["contains_id"].get(zone_id, ()))
+
+    def _find(self, fare_rule):
+        """
+        Finds the fare rule of the collection, which is the given fare rule or equal to it.
+
+        :type fare_rule: FareRule
+        :rtype: FareRule | None
+        """
+
+        if self._objects.get(id(fare_rule)) is fare_rule:
+            return fare_rule
+
+        if not isinstance(fare_rule, FareRule):
+            return None
+        return next((collection_fare_rule for collection_fare_rule in self._fare_index.get(fare_rule.fare.id, ())
+                     if collection_fare_rule == fare_rule), None)
+
+    def _remove(self, fare_rule):
+        del self._objects[id(fare_rule)]
+        self._unindex(fare_rule)
+        fare_rule._collection = None
+
+    def _index(self, fare_rule):
+        self._fare_index[fare_rule.fare.id].add(fare_rule)
+        if fare_rule.route is not None:
+            self._route_index[fare_rule.route].add(fare_rule)
+        for field, zone_index in self._zones_indexes.iteritems():
+            zone_id = fare_rule.attributes.get(field)
+            if zone_id is not None:
+                zone_index[zone_id].add(fare_rule)
+
+    def _unindex(self, fare_rule):
+        _discard_from_index(self._fare_index, fare_rule.fare.id, fare_rule)
+        if fare_rule.route is not None:
+            _discard_from_index(self._route_index, fare_rule.route, fare_rule)
+        for field, zone_index in self._zones_indexes.iteritems():
+            zone_id = fare_rule.attributes.get(field)
+            if zone_id is not None:
+                _discard_from_index(zone_index, zone_id, fare_rule)
 
     def _load_file(self, csv_file, ignore_errors=False, filter=None):
         if isinstance(csv_file, str):
             with open(csv_file, "rb") as f:
                 self._load_file(f, ignore_errors=ignore_errors, filter=filter)
         else:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                self.add(ignore_errors=ignore_errors, condition=filter, **row)
+            self._load_rows(csv.DictReader(csv_file), ignore_errors=ignore_errors, filter=filter)
+
+    def _load_rows(self, rows, ignore_errors=False, filter=None):
+        for row in rows:
+            self.add(ignore_errors=ignore_errors, condition=filter, **row)
 
     def has_data(self):
         return len(self._objects) > 0
@@ -193,32 +349,30 @@ class FareRuleCollection:
             with open(csv_file, "wb") as f:
                 self.save(f)
         else:
-            fields = []
+            # attributes can be set on the fare rules after they were added, so make sure they are in the schema
             for obj in self:
-                fields += (field for field in obj.get_csv_fields() if field not in fields)
+                self._csv_schema.update(obj.attributes)
 
-            writer = csv.DictWriter(csv_file, fieldnames=fields, restval=None)
-            writer.writeheader()
-            writer.writerows(obj.to_csv_line() for obj in self)
+            self._csv_schema.write(csv_file, (obj.to_csv_line() for obj in self))
 
     def validate(self):
-        for obj in self._objects:
+        for obj in self._objects.itervalues():
             obj.validate(self._transit_data)
 
     def __len__(self):
         return len(self._objects)
 
     def __iter__(self):
-        return iter(self._objects)
+        return self._objects.itervalues()
 
     def __contains__(self, item):
-        return item in self._objects
+        return self._find(item) is not None
 
     def __eq__(self, other):
         if not isinstance(other, FareRuleCollection):
             return False
 
-        return self._objects == other._objects
+        return self._objects.values() == other._objects.values()
 
     def __ne__(self, other):
         return not (self == other)
@@ -229,3 +383,11 @@ class FareRuleCollection:
             if k not in ["_transit_data"]:
                 size += sys.getsizeof(v)
         return size
+
+
+def _discard_from_index(index, key, fare_rule):
+    fare_rules = index.get(key)
+    if fare_rules is not None:
+        fare_rules.discard(fare_rule)
+        if len(fare_rules) == 0:
+            del index[key]
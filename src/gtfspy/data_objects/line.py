@@ -2,6 +2,7 @@ import itertools
 
 import gtfspy
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.route import merge_trips_calendars
 
 
 class Line(object):
@@ -24,13 +25,26 @@ class Line(object):
         # TODO: check if the route id exists
         self.routes[route.id] = route
 
-    def get_trips_calendar(self, from_date, to_date=None, sort=True):
-        res = itertools.chain.from_iterable(route.get_trips_calendar(from_date, to_date=to_date, sort=False)
-                                            for route in self.routes.itervalues())
+    def get_trips_calendar(self, from_date, to_date=None, sort=True, stream=False):
+        """
+        :type from_date: date
+        :type to_date: date | None
+        :param sort: whether to return the calendar ordered by time
+        :type sort: bool
+        :param stream: whether to yield the calendar in time order instead of building the full list, so the caller can
+        stop early (implies sort)
+        :type stream: bool
+        :rtype: collections.Iterable[(datetime, gtfspy.data_objects.Trip)]
+        """
+
+        if not sort and not stream:
+            return itertools.chain.from_iterable(route.get_trips_calendar(from_date, to_date=to_date, sort=False)
+                                                 for route in self.routes.itervalues())
 
-        if sort:
+        res = merge_trips_calendars(route.get_trips_calendar(from_date, to_date=to_date, stream=True)
+                                    for route in self.routes.itervalues())
+        if not stream:
             res = list(res)
-            res.sort()
 
         return res
 
@@ -50,7 +64,7 @@ class LineCollection(BaseGtfsObjectCollection):
     def get_line(self, route):
         line_number = route.route_short_name
 
-        self._transit_data._changed()
+        self._transit_data._changed("routes.txt")
 
         if line_number not in self:
             line = Line(self._agency, line_number)
@@ -89,7 +103,7 @@ class LineCollection(BaseGtfsObjectCollection):
         del self._objects[line.line_number]
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
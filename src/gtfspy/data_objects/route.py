@@ -1,9 +1,52 @@
+import heapq
+from itertools import izip, repeat
+
 import gtfspy
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.compact_object import CompactObject, SlottedObject, create_attribute_property, \
+    create_attributes_slots
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.validating import not_none_or_empty, validate_yes_no_unknown
 
 
-class Route(object):
+def merge_trips_calendars(calendars):
+    """
+    Merges trips calendars that are each ordered by time into a single calendar ordered by time, with a heap of the
+    calendars' next items. The calendars are consumed lazily, so reading the first items costs O(k log k) for k
+    calendars, and the merged calendar is never built in full.
+
+    :param calendars: the calendars to merge, as iterables of (time, trip) ordered by time
+    :type calendars: collections.Iterable[collections.Iterable[(datetime, gtfspy.data_objects.Trip)]]
+    :rtype: collections.Iterable[(datetime, gtfspy.data_objects.Trip)]
+    """
+
+    # the calendar's index breaks ties between equal times, so the trips themselves are never compared
+    heap = []
+    for index, calendar in enumerate(calendars):
+        calendar = iter(calendar)
+        for t, trip in calendar:
+            heap.append((t, index, trip, calendar))
+            break
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        t, index, trip, calendar = heap[0]
+        yield t, trip
+        for t, trip in calendar:
+            heapq.heapreplace(heap, (t, index, trip, calendar))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+class BaseRoute(SlottedObject):
+    """
+    The fields and methods shared by Route and CompactRoute, which keep the optional and unknown fields differently.
+    """
+
+    __slots__ = ["_collection", "_id", "_route_short_name", "_route_long_name", "_route_type", "_agency", "line",
+                 "trips", "__weakref__"]
+
     def __init__(self, transit_data, route_id, route_short_name, route_long_name, route_type, agency_id,
                  route_desc=None, route_url=None, route_color=None, route_text_color=None, route_sort_order=None,
                  **kwargs):
@@ -21,25 +64,27 @@ class Route(object):
         :type route_sort_order: str | int | None
         """
 
+        self._collection = None
         self._id = route_id
-        self.route_short_name = route_short_name
-        self.route_long_name = route_long_name
+        self._route_short_name = route_short_name
+        self._route_long_name = route_long_name
         # TODO: create dedicated object to route type
-        self.route_type = int(route_type)
-        self.agency = transit_data.agencies[int(agency_id)]
+        self._route_type = int(route_type)
+        self._agency = transit_data.agencies[int(agency_id)]
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(route_desc):
-            self.attributes["route_desc"] = str(route_desc)
+            attributes["route_desc"] = str(route_desc)
         if not_none_or_empty(route_url):
-            self.attributes["route_url"] = str(route_url)
+            attributes["route_url"] = str(route_url)
         if not_none_or_empty(route_color):
             # TODO: find type for the route color
-            self.attributes["route_color"] = str(route_color)
+            attributes["route_color"] = str(route_color)
         if not_none_or_empty(route_text_color):
-            self.attributes["route_text_color"] = str(route_text_color)
+            attributes["route_text_color"] = str(route_text_color)
         if not_none_or_empty(route_sort_order):
-            self.attributes["route_sort_order"] = int(route_sort_order)
+            attributes["route_sort_order"] = int(route_sort_order)
+        self._set_attributes(attributes)
 
         self.line = self.agency.get_line(self)
         self.trips = []
@@ -48,6 +93,104 @@ class Route(object):
     def id(self):
         return self._id
 
+    def _copy(self, transit_data, route_class):
+        """
+        Creates a copy of the route in another transit data from its typed fields, without formatting and parsing them.
+
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type route_class: type
+        :rtype: Route
+        """
+
+        route = route_class.__new__(route_class)
+        route._collection = None
+        route._id = self._id
+        route._route_short_name = self._route_short_name
+        route._route_long_name = self._route_long_name
+        route._route_type = self._route_type
+        route._agency = transit_data.agencies[self._agency.id]
+        route._set_attributes(self.attributes)
+
+        route.line = route.agency.get_line(route)
+        route.trips = []
+        return route
+
+    def _changed(self):
+        """
+        Reports a change of the route to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("routes.txt")
+
+    @property
+    def route_short_name(self):
+        """
+        :rtype: str
+        """
+
+        return self._route_short_name
+
+    @route_short_name.setter
+    def route_short_name(self, value):
+        """
+        :type value: str
+        """
+
+        self._route_short_name = value
+        self._changed()
+
+    @property
+    def route_long_name(self):
+        """
+        :rtype: str
+        """
+
+        return self._route_long_name
+
+    @route_long_name.setter
+    def route_long_name(self, value):
+        """
+        :type value: str
+        """
+
+        self._route_long_name = value
+        self._changed()
+
+    @property
+    def route_type(self):
+        """
+        :rtype: int
+        """
+
+        return self._route_type
+
+    @route_type.setter
+    def route_type(self, value):
+        """
+        :type value: int
+        """
+
+        self._route_type = value
+        self._changed()
+
+    @property
+    def agency(self):
+        """
+        :rtype: gtfspy.data_objects.Agency
+        """
+
+        return self._agency
+
+    @agency.setter
+    def agency(self, value):
+        """
+        :type value: gtfspy.data_objects.Agency
+        """
+
+        self._agency = value
+        self._changed()
+
     @property
     def route_desc(self):
         """
@@ -152,14 +295,30 @@ class Route(object):
 
         return None if len(self.trips) == 0 else self.trips[0].last_stop
 
-    def get_trips_calendar(self, from_date, to_date=None, stop_id=None, sort=True):
-        res = ((t, trip)
-               for trip in self.trips
-               for t in trip.get_trip_calendar(from_date, to_date=to_date, stop_id=stop_id))
+    def get_trips_calendar(self, from_date, to_date=None, stop_id=None, sort=True, stream=False):
+        """
+        :type from_date: date
+        :type to_date: date | None
+        :type stop_id: int | None
+        :param sort: whether to return the calendar ordered by time
+        :type sort: bool
+        :param stream: whether to yield the calendar in time order instead of building the full list, so the caller can
+        stop early (implies sort)
+        :type stream: bool
+        :rtype: collections.Iterable[(datetime, gtfspy.data_objects.Trip)]
+        """
+
+        if not sort and not stream:
+            return ((t, trip)
+                    for trip in self.trips
+                    for t in trip.get_trip_calendar(from_date, to_date=to_date, stop_id=stop_id))
 
-        if sort:
+        # the trips are ordered by their first departure, so the trips of the same day come out of the heap in order
+        trips = sorted(self.trips, key=lambda trip: trip.stop_times[0].departure_seconds)
+        res = merge_trips_calendars(
+            izip(trip.get_trip_calendar(from_date, to_date=to_date, stop_id=stop_id), repeat(trip)) for trip in trips)
+        if not stream:
             res = list(res)
-            res.sort()
 
         return res
 
@@ -184,7 +343,7 @@ class Route(object):
         assert self.route_type in xrange(0, 8)
 
     def __eq__(self, other):
-        if not isinstance(other, Route):
+        if not isinstance(other, BaseRoute):
             return False
 
         return self.id == other.id and self.route_short_name == other.route_short_name and \
@@ -195,46 +354,77 @@ class Route(object):
         return not (self == other)
 
 
+class Route(TrackedObject, BaseRoute):
+    """
+    A route, which also accepts arbitrary attributes.
+    """
+
+    __slots__ = ["_attributes", "__dict__"]
+
+
+class CompactRoute(CompactObject, BaseRoute):
+    """
+    A Route that stores its known optional fields in slots instead of an attributes dict.
+    """
+
+    _ATTRIBUTES_SLOTS = create_attributes_slots("route_desc", "route_url", "route_color", "route_text_color",
+                                                "route_sort_order")
+    __slots__ = _ATTRIBUTES_SLOTS.values() + ["_extra_attributes"]
+
+    route_desc = create_attribute_property(BaseRoute.route_desc, "route_desc")
+    route_url = create_attribute_property(BaseRoute.route_url, "route_url")
+    route_color = create_attribute_property(BaseRoute.route_color, "route_color")
+    route_text_color = create_attribute_property(BaseRoute.route_text_color, "route_text_color")
+    route_sort_order = create_attribute_property(BaseRoute.route_sort_order, "route_sort_order")
+
+
 class RouteCollection(BaseGtfsObjectCollection):
     def __init__(self, transit_data, csv_file=None):
-        BaseGtfsObjectCollection.__init__(self, transit_data, Route)
+        BaseGtfsObjectCollection.__init__(self, transit_data, BaseRoute)
 
         if csv_file is not None:
             self._load_file(csv_file)
 
     def add(self, ignore_errors=False, condition=None, **kwargs):
         try:
-            route = Route(transit_data=self._transit_data, **kwargs)
+            route_class = CompactRoute if self._transit_data.compact_objects else Route
+            route = route_class(transit_data=self._transit_data, **kwargs)
 
             if condition is not None and not condition(route):
                 return None
 
-            self._transit_data._changed()
-
-            assert route.id not in self._objects
-            self._objects[route.id] = route
-            route.line.add_route(route)
-            return route
+            return self._add(route)
         except:
             if not ignore_errors:
                 raise
 
+    def _add(self, route):
+        self._transit_data._changed("routes.txt")
+
+        assert route.id not in self._objects
+        self._objects[route.id] = route
+        route._collection = self
+        self._csv_schema.update(route.get_csv_fields())
+        route.line.add_route(route)
+        return route
+
     def add_object(self, route, recursive=False):
-        assert isinstance(route, Route)
+        assert isinstance(route, BaseRoute)
 
         if route.id not in self:
             if recursive:
                 self._transit_data.agencies.add_object(route.agency, recursive=True)
             else:
                 assert route.agency in self._transit_data.agencies
-            return self.add(**route.to_csv_line())
+            return self._add(route._copy(self._transit_data,
+                                         CompactRoute if self._transit_data.compact_objects else Route))
         else:
             old_route = self[route.id]
             assert route == old_route
             return old_route
 
     def remove(self, route, recursive=False, clean_after=True):
-        if not isinstance(route, Route):
+        if not isinstance(route, BaseRoute):
             route = self[route]
         else:
             assert self[route.id] is route
@@ -243,18 +433,19 @@ class RouteCollection(BaseGtfsObjectCollection):
             for trip in route.trips:
                 self._transit_data.trips.remove(trip, recursive=True, clean_after=False)
 
-            fare_rules_to_remove = [fare_rule for fare_rule in self._transit_data.fare_rules
-                                    if fare_rule.route is route]
-            for fare_rule in fare_rules_to_remove:
+            for fare_rule in self._transit_data.fare_rules.get_by_route(route):
                 self._transit_data.fare_rules.remove(fare_rule, recursive=True, clean_after=False)
         else:
             assert len(route.trips) == 0
 
+        self._transit_data._changed("routes.txt")
+        self._transit_data._touched(route)
         del route.line.routes[route.id]
         del self._objects[route.id]
+        route._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
@@ -262,6 +453,9 @@ class RouteCollection(BaseGtfsObjectCollection):
             if len(route.trips) == 0:
                 to_clean.append(route)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("routes.txt")
         for route in to_clean:
             del route.line.routes[route.id]
             del self._objects[route.id]
+            route._collection = None
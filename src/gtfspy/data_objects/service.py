@@ -1,11 +1,12 @@
 from datetime import datetime, date
 
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.parsing import parse_or_default, str_to_bool
 from gtfspy.utils.validating import not_none_or_empty
 
 
-class Service(object):
+class Service(TrackedObject):
     def __init__(self, service_id, start_date, end_date, sunday=None, monday=None, tuesday=None, wednesday=None,
                  thursday=None, friday=None, saturday=None, **kwargs):
         """
@@ -21,9 +22,11 @@ class Service(object):
         :type saturday: str | bool | None
         """
 
+        self._collection = None
         self._id = int(service_id)
-        self.start_date = start_date if isinstance(start_date, date) else datetime.strptime(start_date, "%Y%m%d").date()
-        self.end_date = end_date if isinstance(end_date, date) else datetime.strptime(end_date, "%Y%m%d").date()
+        self._start_date = start_date if isinstance(start_date, date) else \
+            datetime.strptime(start_date, "%Y%m%d").date()
+        self._end_date = end_date if isinstance(end_date, date) else datetime.strptime(end_date, "%Y%m%d").date()
         sunday = parse_or_default(sunday, False, str_to_bool)
         monday = parse_or_default(monday, False, str_to_bool)
         tuesday = parse_or_default(tuesday, False, str_to_bool)
@@ -31,14 +34,86 @@ class Service(object):
         thursday = parse_or_default(thursday, False, str_to_bool)
         friday = parse_or_default(friday, False, str_to_bool)
         saturday = parse_or_default(saturday, False, str_to_bool)
-        self.days_relevance = [sunday, monday, tuesday, wednesday, thursday, friday, saturday]
+        self._days_relevance = (sunday, monday, tuesday, wednesday, thursday, friday, saturday)
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        self._set_attributes({k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)})
+
+        self.trips = set()
+
+        # the exceptions of calendar_dates.txt (date -> whether the service was added or removed on it)
+        self._calendar_dates = {}
+        self._active_days = None
 
     @property
     def id(self):
         return self._id
 
+    def _changed(self):
+        """
+        Reports a change of the service to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("calendar.txt")
+
+    @property
+    def start_date(self):
+        """
+        :rtype: date
+        """
+
+        return self._start_date
+
+    @start_date.setter
+    def start_date(self, value):
+        """
+        :type value: date
+        """
+
+        self._start_date = value
+        self._changed()
+
+    @property
+    def end_date(self):
+        """
+        :rtype: date
+        """
+
+        return self._end_date
+
+    @end_date.setter
+    def end_date(self, value):
+        """
+        :type value: date
+        """
+
+        self._end_date = value
+        self._changed()
+
+    @property
+    def days_relevance(self):
+        """
+        :return: whether the service is active on each day of the week, from sunday to saturday
+        :rtype: tuple[bool]
+        """
+
+        return self._days_relevance
+
+    @days_relevance.setter
+    def days_relevance(self, value):
+        """
+        :type value: collections.Iterable[bool]
+        """
+
+        self._days_relevance = tuple(bool(is_active) for is_active in value)
+        self._changed()
+
+    def _set_day(self, weekday, value):
+        # the days are kept in a tuple, so they can only be changed through the setters, which report the change
+        days_relevance = list(self._days_relevance)
+        days_relevance[weekday] = bool(value)
+        self.days_relevance = days_relevance
+
     @property
     def sunday(self):
         """
@@ -53,7 +128,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[0] = bool(value)
+        self._set_day(0, value)
 
     @property
     def monday(self):
@@ -69,7 +144,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[1] = bool(value)
+        self._set_day(1, value)
 
     @property
     def tuesday(self):
@@ -85,7 +160,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[2] = bool(value)
+        self._set_day(2, value)
 
     @property
     def wednesday(self):
@@ -101,7 +176,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[3] = bool(value)
+        self._set_day(3, value)
 
     @property
     def thursday(self):
@@ -117,7 +192,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[4] = bool(value)
+        self._set_day(4, value)
 
     @property
     def friday(self):
@@ -133,7 +208,7 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[5] = bool(value)
+        self._set_day(5, value)
 
     @property
     def saturday(self):
@@ -149,14 +224,106 @@ class Service(object):
         :type value: bool | int
         """
 
-        self.days_relevance[6] = bool(value)
+        self._set_day(6, value)
+
+    @property
+    def calendar_dates(self):
+        """
+        :return: the service's exceptions, by date (True if the service was added on the date, False if removed)
+        :rtype: dict[date, bool]
+        """
+
+        return dict(self._calendar_dates)
+
+    def _set_calendar_date(self, day, is_active):
+        """
+        Adds an exception (of calendar_dates.txt) to the service, without reporting the change (see
+        ServiceCollection.set_calendar_date).
+
+        :type day: date
+        :type is_active: bool
+        """
+
+        self._calendar_dates[day] = bool(is_active)
+        self._active_days = None
 
     def is_active_on(self, date):
         """
         :rtype: bool
         """
 
-        return self.days_relevance[date.isoweekday() % 7]
+        first_ordinal, active_days = self._get_active_days()
+        offset = date.toordinal() - first_ordinal
+        return offset >= 0 and bool(active_days >> offset & 1)
+
+    def count_active_days(self, from_date, to_date):
+        """
+        :type from_date: date
+        :type to_date: date
+        :rtype: int
+        """
+
+        return bin(self._get_active_days_in_range(from_date, to_date)[1]).count("1")
+
+    def get_active_dates(self, from_date, to_date):
+        """
+        :type from_date: date
+        :type to_date: date
+        :rtype: collections.Iterable[date]
+        """
+
+        first_ordinal, active_days = self._get_active_days_in_range(from_date, to_date)
+        while active_days != 0:
+            lowest_day = active_days & -active_days
+            yield date.fromordinal(first_ordinal + lowest_day.bit_length() - 1)
+            active_days ^= lowest_day
+
+    def _get_active_days_in_range(self, from_date, to_date):
+        first_ordinal, active_days = self._get_active_days()
+        from_offset = max(from_date.toordinal() - first_ordinal, 0)
+        to_offset = to_date.toordinal() - first_ordinal
+        if to_offset < from_offset:
+            return first_ordinal, 0
+        return first_ordinal, active_days & ((1 << (to_offset + 1)) - (1 << from_offset))
+
+    def _get_active_days(self):
+        """
+        Compiles the service's calendar into a bitset of its active days, where bit i is the i-th day since the first
+        day of the calendar. The bitset is compiled again whenever the service's dates or days change.
+
+        :return: the ordinal of the first day of the calendar and the bitset
+        :rtype: (int, int | long)
+        """
+
+        key = (self.start_date, self.end_date, self.days_relevance)
+        if self._active_days is not None and self._active_days[0] == key:
+            return self._active_days[1]
+
+        first_ordinal = self.start_date.toordinal()
+        days_count = self.end_date.toordinal() - first_ordinal + 1
+        if days_count > 0:
+            # days_relevance starts on sunday, and the first day's isoweekday is 1 for monday to 7 for sunday
+            first_weekday = self.start_date.isoweekday() % 7
+            week = "".join("1" if self.days_relevance[(first_weekday + i) % 7] else "0" for i in xrange(7))
+            active_days = int((week * (days_count // 7 + 1))[:days_count][::-1], 2)
+        else:
+            active_days = 0
+
+        for day, is_active in self._calendar_dates.iteritems():
+            offset = day.toordinal() - first_ordinal
+            if offset < 0:
+                if not is_active:
+                    continue
+                active_days <<= -offset
+                first_ordinal += offset
+                offset = 0
+            if is_active:
+                active_days |= 1 << offset
+            else:
+                active_days &= ~(1 << offset)
+
+        self._active_days = (key, (first_ordinal, active_days))
+        return self._active_days[1]
 
     def get_csv_fields(self):
         return ["service_id", "start_date", "end_date", "sunday", "monday", "tuesday", "wednesday", "thursday",
@@ -189,7 +356,7 @@ class Service(object):
 
         return self.id == other.id and self.start_date == other.start_date and \
                self.end_date == other.end_date and self.days_relevance == other.days_relevance and \
-               self.attributes == other.attributes
+               self.attributes == other.attributes and self._calendar_dates == other._calendar_dates
 
     def __ne__(self, other):
         return not (self == other)
@@ -199,6 +366,9 @@ class ServiceCollection(BaseGtfsObjectCollection):
     def __init__(self, transit_data, csv_file=None):
         BaseGtfsObjectCollection.__init__(self, transit_data, Service)
 
+        self._services_by_date = None
+        self._services_by_date_registered = False
+
         if csv_file is not None:
             self._load_file(csv_file)
 
@@ -209,10 +379,12 @@ class ServiceCollection(BaseGtfsObjectCollection):
             if condition is not None and not condition(service):
                 return None
 
-            self._transit_data._changed()
+            self._transit_data._changed("calendar.txt")
 
             assert service.id not in self._objects
             self._objects[service.id] = service
+            service._collection = self
+            self._csv_schema.update(service.get_csv_fields())
             return service
         except:
             if not ignore_errors:
@@ -222,12 +394,78 @@ class ServiceCollection(BaseGtfsObjectCollection):
         assert isinstance(service, Service)
 
         if service.id not in self:
-            return self.add(**service.to_csv_line())
+            new_service = self.add(**service.to_csv_line())
+            if len(service._calendar_dates) > 0:
+                self._transit_data._changed("calendar_dates.txt")
+            for day, is_active in service._calendar_dates.iteritems():
+                new_service._set_calendar_date(day, is_active)
+            return new_service
         else:
             old_service = self[service.id]
             assert service == old_service
             return old_service
 
+    def set_calendar_date(self, service, day, is_active):
+        """
+        Adds an exception to the service, which is saved to calendar_dates.txt.
+
+        :type service: Service | int
+        :type day: date
+        :type is_active: bool
+        """
+
+        if not isinstance(service, Service):
+            service = self[service]
+        else:
+            assert self[service.id] is service
+
+        self._transit_data._changed("calendar_dates.txt")
+        service._set_calendar_date(day, is_active)
+
+    def get_services_on(self, day):
+        """
+        Returns the services that are active on the date, from a lookup of all the active dates of the services. The
+        lookup is built on the first call, and rebuilt after calendar.txt or calendar_dates.txt changes.
+
+        :type day: date
+        :rtype: list[Service]
+        """
+
+        if self._services_by_date is None:
+            if not self._services_by_date_registered:
+                self._transit_data._register_derived_index(["calendar.txt", "calendar_dates.txt"],
+                                                           self._invalidate_services_by_date)
+                self._services_by_date_registered = True
+
+            services_by_date = {}
+            for service in self:
+                first_ordinal, active_days = service._get_active_days()
+                while active_days != 0:
+                    lowest_day = active_days & -active_days
+                    services_by_date.setdefault(first_ordinal + lowest_day.bit_length() - 1, []).append(service)
+                    active_days ^= lowest_day
+            self._services_by_date = services_by_date
+
+        return list(self._services_by_date.get(day.toordinal(), []))
+
+    def _invalidate_services_by_date(self):
+        self._services_by_date = None
+
+    def _load_calendar_dates(self, rows):
+        """
+        Folds the exceptions of calendar_dates.txt into the services. The exceptions of services that aren't in
+        calendar.txt are ignored.
+
+        :type rows: collections.Iterable[dict]
+        """
+
+        for row in rows:
+            service = self._objects.get(int(row["service_id"]))
+            if service is not None:
+                service._set_calendar_date(datetime.strptime(row["date"], "%Y%m%d").date(),
+                                           int(row["exception_type"]) == 1)
+        self._services_by_date = None
+
     def remove(self, service, recursive=False, clean_after=True):
         if not isinstance(service, Service):
             service = self[service]
@@ -235,22 +473,26 @@ class ServiceCollection(BaseGtfsObjectCollection):
             assert self[service.id] is service
 
         if recursive:
-            for trip in self._transit_data.trips:
-                if trip.service is service:
-                    self._transit_data.trips.remove(trip, recursive=True, clean_after=False)
+            for trip in list(service.trips):
+                self._transit_data.trips.remove(trip, recursive=True, clean_after=False)
         else:
-            assert next((trip for trip in self._transit_data.trips if trip.service is service), None) is None
+            assert len(service.trips) == 0
 
+        self._transit_data._changed("calendar.txt")
         del self._objects[service.id]
+        service._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
         for service in self:
-            if next((trip for trip in self._transit_data.trips if trip.service is service), None) is None:
+            if len(service.trips) == 0:
                 to_clean.append(service)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("calendar.txt")
         for service in to_clean:
             del self._objects[service.id]
+            service._collection = None
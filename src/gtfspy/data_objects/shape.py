@@ -1,13 +1,24 @@
 import csv
+from collections import OrderedDict
 from operator import attrgetter
 
 from sortedcontainers import SortedList
 
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.compact_object import CompactObject, SlottedObject, create_attribute_property, \
+    create_attributes_slots
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.validating import not_none_or_empty
 
 
-class ShapePoint(object):
+class BaseShapePoint(SlottedObject):
+    """
+    The fields and methods shared by ShapePoint and CompactShapePoint, which keep the optional and unknown fields
+    differently.
+    """
+
+    __slots__ = ["_shape", "_latitude", "_longitude", "_sequence", "__weakref__"]
+
     def __init__(self, shape_pt_lat, shape_pt_lon, shape_pt_sequence, shape_dist_traveled=None, **kwargs):
         """
         :type shape_pt_lat: str | float
@@ -16,13 +27,75 @@ class ShapePoint(object):
         :type shape_dist_traveled: str | float | None
         """
 
-        self.latitude = float(shape_pt_lat)
-        self.longitude = float(shape_pt_lon)
-        self.sequence = int(shape_pt_sequence)
+        self._shape = None
+        self._latitude = float(shape_pt_lat)
+        self._longitude = float(shape_pt_lon)
+        self._sequence = int(shape_pt_sequence)
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(shape_dist_traveled):
-            self.attributes["shape_dist_traveled"] = float(shape_dist_traveled)
+            attributes["shape_dist_traveled"] = float(shape_dist_traveled)
+        self._set_attributes(attributes)
+
+    def _changed(self):
+        """
+        Reports a change of the shape point to the transit data that owns its shape (if any).
+        """
+
+        shape = self._shape
+        if shape is not None and shape._collection is not None:
+            shape._collection._transit_data._changed("shapes.txt")
+
+    @property
+    def latitude(self):
+        """
+        :rtype: float
+        """
+
+        return self._latitude
+
+    @latitude.setter
+    def latitude(self, value):
+        """
+        :type value: float
+        """
+
+        self._latitude = value
+        self._changed()
+
+    @property
+    def longitude(self):
+        """
+        :rtype: float
+        """
+
+        return self._longitude
+
+    @longitude.setter
+    def longitude(self, value):
+        """
+        :type value: float
+        """
+
+        self._longitude = value
+        self._changed()
+
+    @property
+    def sequence(self):
+        """
+        :rtype: int
+        """
+
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, value):
+        """
+        :type value: int
+        """
+
+        self._sequence = value
+        self._changed()
 
     @property
     def shape_dist_traveled(self):
@@ -40,38 +113,86 @@ class ShapePoint(object):
 
         self.attributes["shape_dist_traveled"] = value
 
+    def _copy(self, shape_point_class):
+        """
+        Creates a copy of the shape point from its typed fields, without formatting and parsing them.
+
+        :type shape_point_class: type
+        :rtype: ShapePoint
+        """
+
+        shape_point = shape_point_class.__new__(shape_point_class)
+        shape_point._shape = None
+        shape_point._latitude = self._latitude
+        shape_point._longitude = self._longitude
+        shape_point._sequence = self._sequence
+        shape_point._set_attributes(self.attributes)
+        return shape_point
+
     def validate(self, transit_data):
         assert 90 >= self.latitude >= -90
         assert 180 >= self.longitude >= -180
 
     def __eq__(self, other):
-        if not isinstance(other, ShapePoint):
+        if not isinstance(other, BaseShapePoint):
             return False
 
-        return self.latitude == other.latitude and self.longitude == other.longitude and \
-               self.sequence == other.sequence and \
-               (self.shape_dist_traveled is None or other.shape_dist_traveled is None or
-                self.shape_dist_traveled == other.shape_dist_traveled) and \
-               self.attributes == other.attributes
+        # the shapes are compared point by point for every trip, so the fields are read from their slots, and
+        # shape_dist_traveled is compared only as one of the attributes
+        return self._latitude == other._latitude and self._longitude == other._longitude and \
+               self._sequence == other._sequence and self.attributes == other.attributes
 
     def __ne__(self, other):
         return not (self == other)
 
 
+class ShapePoint(TrackedObject, BaseShapePoint):
+    """
+    A shape point, which also accepts arbitrary attributes.
+    """
+
+    __slots__ = ["_attributes", "__dict__"]
+
+
+class CompactShapePoint(CompactObject, BaseShapePoint):
+    """
+    A ShapePoint that stores its known optional fields in slots instead of an attributes dict.
+    """
+
+    _ATTRIBUTES_SLOTS = create_attributes_slots("shape_dist_traveled")
+    __slots__ = _ATTRIBUTES_SLOTS.values() + ["_extra_attributes"]
+
+    shape_dist_traveled = create_attribute_property(BaseShapePoint.shape_dist_traveled, "shape_dist_traveled")
+
+
 class Shape(object):
     def __init__(self, shape_id):
         """
         :type shape_id: str | int
         """
 
+        self._collection = None
         self._id = int(shape_id)
 
-        self.shape_points = SortedList(key=attrgetter("sequence"))
+        self.shape_points = SortedList(key=attrgetter("_sequence"))
+        self.trips = set()
 
     @property
     def id(self):
         return self._id
 
+    def _add_shape_points(self, shape_points):
+        """
+        Adds shape points that don't belong to any shape, in a single bulk update of the sorted points.
+
+        :type shape_points: collections.Iterable[ShapePoint]
+        """
+
+        shape_points = list(shape_points)
+        for shape_point in shape_points:
+            shape_point._shape = self
+        self.shape_points.update(shape_points)
+
     def get_csv_fields(self):
         return ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"] + \
                list({key for shape_point in self.shape_points for key in shape_point.attributes.iterkeys()})
@@ -107,6 +228,7 @@ class Shape(object):
 class ShapeCollection(BaseGtfsObjectCollection):
     def __init__(self, transit_data, csv_file=None):
         BaseGtfsObjectCollection.__init__(self, transit_data, Shape)
+        self._csv_schema.update(["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"])
 
         if csv_file is not None:
             self._load_file(csv_file)
@@ -114,31 +236,78 @@ class ShapeCollection(BaseGtfsObjectCollection):
     def add(self, ignore_errors=False, condition=None, **kwargs):
         try:
             shape_id = int(kwargs.pop("shape_id"))
-            shape_point = ShapePoint(**kwargs)
+            shape_point_class = CompactShapePoint if self._transit_data.compact_objects else ShapePoint
+            shape_point = shape_point_class(**kwargs)
 
             if condition is not None and not condition(shape_point):
                 return None
 
-            self._transit_data._changed()
+            self._transit_data._changed("shapes.txt")
 
             if shape_id not in self._objects:
                 shape = Shape(shape_id)
                 self._objects[shape_id] = shape
+                shape._collection = self
             else:
                 shape = self[shape_id]
-            shape.shape_points.add(shape_point)
+            shape._add_shape_points([shape_point])
+            self._csv_schema.update(shape_point.attributes)
             return shape_point
         except:
             if not ignore_errors:
                 raise
 
+    def _load_rows(self, rows, ignore_errors=False, filter=None):
+        """
+        Loads the shape points of the rows into per shape buffers, and adds every buffer to its shape in a single bulk
+        update of the shape's sorted points (which costs a single pass when the rows are in sequence order) instead of
+        inserting the points one by one.
+        """
+
+        shape_point_class = CompactShapePoint if self._transit_data.compact_objects else ShapePoint
+
+        shapes_points = OrderedDict()
+        for row in rows:
+            try:
+                shape_id = int(row.pop("shape_id"))
+                shape_point = shape_point_class(**row)
+            except:
+                if not ignore_errors:
+                    raise
+                continue
+
+            if filter is not None and not filter(shape_point):
+                continue
+
+            shape_points = shapes_points.get(shape_id)
+            if shape_points is None:
+                shape_points = shapes_points[shape_id] = []
+            shape_points.append(shape_point)
+            self._csv_schema.update(shape_point.attributes)
+
+        if len(shapes_points) > 0:
+            self._transit_data._changed("shapes.txt")
+        for shape_id, shape_points in shapes_points.iteritems():
+            shape = self._objects.get(shape_id)
+            if shape is None:
+                shape = self._objects[shape_id] = Shape(shape_id)
+                shape._collection = self
+            shape._add_shape_points(shape_points)
+
     def add_object(self, shape, recursive=False):
         assert isinstance(shape, Shape)
 
         if shape.id not in self:
-            for row in shape.to_csv_line():
-                self.add(**row)
-            return self[shape.id]
+            shape_point_class = CompactShapePoint if self._transit_data.compact_objects else ShapePoint
+            new_shape = Shape(shape.id)
+            new_shape._add_shape_points(shape_point._copy(shape_point_class) for shape_point in shape.shape_points)
+
+            self._transit_data._changed("shapes.txt")
+            self._objects[new_shape.id] = new_shape
+            new_shape._collection = self
+            for shape_point in new_shape.shape_points:
+                self._csv_schema.update(shape_point.attributes)
+            return new_shape
         else:
             old_shape = self[shape.id]
             assert shape == old_shape
@@ -151,36 +320,37 @@ class ShapeCollection(BaseGtfsObjectCollection):
             assert self[shape.id] is shape
 
         if recursive:
-            for trip in self._transit_data.trips:
-                if trip.shape is shape:
-                    self._transit_data.trips.remove(trip, recursive=True, clean_after=False)
+            for trip in list(shape.trips):
+                self._transit_data.trips.remove(trip, recursive=True, clean_after=False)
         else:
-            assert next((trip for trip in self._transit_data.trips if trip.shape is shape), None) is None
+            assert len(shape.trips) == 0
 
+        self._transit_data._changed("shapes.txt")
         del self._objects[shape.id]
+        shape._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
         for shape in self:
-            if next((trip for trip in self._transit_data.trips if trip.shape is shape), None) is None:
+            if len(shape.trips) == 0:
                 to_clean.append(shape)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("shapes.txt")
         for shape in to_clean:
             del self._objects[shape.id]
+            shape._collection = None
 
     def save(self, csv_file):
         if isinstance(csv_file, str):
             with open(csv_file, "wb") as f:
                 self.save(f)
         else:
-            fields = []
-            for obj in self:
-                fields += (field for field in obj.get_csv_fields() if field not in fields)
-
-            writer = csv.DictWriter(csv_file, fieldnames=fields, restval=None)
-            writer.writeheader()
-            for obj in self:
-                writer.writerows(obj.to_csv_line())
+            for shape in self:
+                for shape_point in shape.shape_points:
+                    self._csv_schema.update(shape_point.attributes)
+
+            self._csv_schema.write(csv_file, (line for shape in self for line in shape.to_csv_line()))
@@ -1,10 +1,25 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from operator import itemgetter
+
 import gtfspy
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.compact_object import CompactObject, SlottedObject, create_attribute_property, \
+    create_attributes_slots
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.parsing import parse_yes_no_unknown, yes_no_unknown_to_int
+from gtfspy.utils.time import SECONDS_IN_DAY, parse_time_seconds
 from gtfspy.utils.validating import not_none_or_empty, validate_true_false, validate_yes_no_unknown
 
 
-class Stop(object):
+class BaseStop(SlottedObject):
+    """
+    The fields and methods shared by Stop and CompactStop, which keep the optional and unknown fields differently.
+    """
+
+    __slots__ = ["_collection", "_id", "_stop_name", "_stop_lat", "_stop_lon", "stop_times", "__weakref__"]
+
     def __init__(self, transit_data, stop_id, stop_name, stop_lat, stop_lon, stop_code=None, stop_desc=None,
                  zone_id=None, stop_url=None, location_type=None, parent_station=None, stop_timezone=None,
                  wheelchair_boarding=None, **kwargs):
@@ -24,38 +39,135 @@ class Stop(object):
         :type wheelchair_boarding: str | int | None
         """
 
+        self._collection = None
         self._id = int(stop_id)
-        self.stop_name = stop_name
-        self.stop_lat = float(stop_lat)
-        self.stop_lon = float(stop_lon)
+        self._stop_name = stop_name
+        self._stop_lat = float(stop_lat)
+        self._stop_lon = float(stop_lon)
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(stop_code):
-            self.attributes["stop_code"] = str(stop_code)
+            attributes["stop_code"] = str(stop_code)
         if not_none_or_empty(stop_desc):
-            self.attributes["stop_desc"] = str(stop_desc)
+            attributes["stop_desc"] = str(stop_desc)
         if not_none_or_empty(zone_id):
-            self.attributes["zone_id"] = int(zone_id)
+            attributes["zone_id"] = int(zone_id)
         if not_none_or_empty(stop_url):
-            self.attributes["stop_url"] = str(stop_url)
+            attributes["stop_url"] = str(stop_url)
         if not_none_or_empty(location_type):
-            self.attributes["location_type"] = int(location_type)
+            attributes["location_type"] = int(location_type)
         if not_none_or_empty(parent_station):
-            self.attributes["parent_station"] = transit_data.stops[int(parent_station)]
+            attributes["parent_station"] = transit_data.stops[int(parent_station)]
         if not_none_or_empty(stop_timezone):
-            self.attributes["stop_timezone"] = str(stop_timezone)
+            attributes["stop_timezone"] = str(stop_timezone)
         if not_none_or_empty(wheelchair_boarding):
             if isinstance(wheelchair_boarding, bool):
-                self.attributes["wheelchair_boarding"] = yes_no_unknown_to_int(wheelchair_boarding)
+                attributes["wheelchair_boarding"] = yes_no_unknown_to_int(wheelchair_boarding)
             else:
-                self.attributes["wheelchair_boarding"] = int(wheelchair_boarding)
+                attributes["wheelchair_boarding"] = int(wheelchair_boarding)
+        self._set_attributes(attributes)
 
-        self.stop_times = []
+        if transit_data.stop_times_table is None:
+            self.stop_times = []
+        else:
+            self.stop_times = transit_data.stop_times_table.create_stop_stop_times(self)
 
     @property
     def id(self):
         return self._id
 
+    def _copy(self, transit_data, stop_class):
+        """
+        Creates a copy of the stop in another transit data from its typed fields, without formatting and parsing them.
+
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type stop_class: type
+        :rtype: Stop
+        """
+
+        stop = stop_class.__new__(stop_class)
+        stop._collection = None
+        stop._id = self._id
+        stop._stop_name = self._stop_name
+        stop._stop_lat = self._stop_lat
+        stop._stop_lon = self._stop_lon
+
+        attributes = dict(self.attributes)
+        if self.parent_station is not None:
+            attributes["parent_station"] = transit_data.stops[self.parent_station.id]
+        stop._set_attributes(attributes)
+
+        if transit_data.stop_times_table is None:
+            stop.stop_times = []
+        else:
+            stop.stop_times = transit_data.stop_times_table.create_stop_stop_times(stop)
+        return stop
+
+    def _changed(self):
+        """
+        Reports a change of the stop to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("stops.txt")
+
+    @property
+    def stop_name(self):
+        """
+        :rtype: str
+        """
+
+        return self._stop_name
+
+    @stop_name.setter
+    def stop_name(self, value):
+        """
+        :type value: str
+        """
+
+        self._stop_name = value
+        self._changed()
+
+    @property
+    def stop_lat(self):
+        """
+        :rtype: float
+        """
+
+        return self._stop_lat
+
+    @stop_lat.setter
+    def stop_lat(self, value):
+        """
+        :type value: float
+        """
+
+        self._stop_lat = value
+        self._moved()
+
+    @property
+    def stop_lon(self):
+        """
+        :rtype: float
+        """
+
+        return self._stop_lon
+
+    @stop_lon.setter
+    def stop_lon(self, value):
+        """
+        :type value: float
+        """
+
+        self._stop_lon = value
+        self._moved()
+
+    def _moved(self):
+        # the spatial index of the stop's collection is built from the stops' coordinates
+        self._changed()
+        if self._collection is not None:
+            self._collection._drop_spatial_index()
+
     @property
     def stop_code(self):
         """
@@ -213,7 +325,7 @@ class Stop(object):
         assert validate_yes_no_unknown(self.attributes.get("wheelchair_boarding", None))
 
     def __eq__(self, other):
-        if not isinstance(other, Stop):
+        if not isinstance(other, BaseStop):
             return False
 
         return self.id == other.id and self.stop_name == other.stop_name and \
@@ -224,31 +336,73 @@ class Stop(object):
         return not (self == other)
 
 
+class Stop(TrackedObject, BaseStop):
+    """
+    A stop, which also accepts arbitrary attributes.
+    """
+
+    __slots__ = ["_attributes", "__dict__"]
+
+
+class CompactStop(CompactObject, BaseStop):
+    """
+    A Stop that stores its known optional fields in slots instead of an attributes dict.
+    """
+
+    _ATTRIBUTES_SLOTS = create_attributes_slots("stop_code", "stop_desc", "zone_id", "stop_url", "location_type",
+                                                "parent_station", "stop_timezone", "wheelchair_boarding")
+    __slots__ = _ATTRIBUTES_SLOTS.values() + ["_extra_attributes"]
+
+    stop_code = create_attribute_property(BaseStop.stop_code, "stop_code")
+    stop_desc = create_attribute_property(BaseStop.stop_desc, "stop_desc")
+    zone_id = create_attribute_property(BaseStop.zone_id, "zone_id")
+    stop_url = create_attribute_property(BaseStop.stop_url, "stop_url")
+    location_type = create_attribute_property(BaseStop.location_type, "location_type")
+    parent_station = create_attribute_property(BaseStop.parent_station, "parent_station")
+    stop_timezone = create_attribute_property(BaseStop.stop_timezone, "stop_timezone")
+    wheelchair_boarding = create_attribute_property(BaseStop.wheelchair_boarding, "wheelchair_boarding",
+                                                    parse=parse_yes_no_unknown)
+
+
 class StopCollection(BaseGtfsObjectCollection):
     def __init__(self, transit_data, csv_file=None):
-        BaseGtfsObjectCollection.__init__(self, transit_data, Stop)
+        BaseGtfsObjectCollection.__init__(self, transit_data, BaseStop)
+
+        self._departure_boards = {}
+        self._active_services = {}
+        self._departure_boards_registered = False
+        self._spatial_index = None
+        self._spatial_index_registered = False
 
         if csv_file is not None:
             self._load_file(csv_file)
 
     def add(self, ignore_errors=False, condition=None, **kwargs):
         try:
-            stop = Stop(transit_data=self._transit_data, **kwargs)
+            stop_class = CompactStop if self._transit_data.compact_objects else Stop
+            stop = stop_class(transit_data=self._transit_data, **kwargs)
 
             if condition is not None and not condition(stop):
                 return None
 
-            self._transit_data._changed()
-
-            assert stop.id not in self._objects
-            self._objects[stop.id] = stop
-            return stop
+            return self._add(stop)
         except:
             if not ignore_errors:
                 raise
 
+    def _add(self, stop):
+        self._transit_data._changed("stops.txt")
+
+        assert stop.id not in self._objects
+        self._objects[stop.id] = stop
+        stop._collection = self
+        self._csv_schema.update(stop.get_csv_fields())
+        if self._spatial_index is not None:
+            self._spatial_index.add(stop)
+        return stop
+
     def add_object(self, stop, recursive=False):
-        assert isinstance(stop, Stop)
+        assert isinstance(stop, BaseStop)
 
         if stop.id not in self:
             if stop.parent_station is not None:
@@ -256,28 +410,158 @@ class StopCollection(BaseGtfsObjectCollection):
                     self.add_object(stop.parent_station, recursive=True)
                 else:
                     assert stop.parent_station in self
-            return self.add(**stop.to_csv_line())
+            stop_class = CompactStop if self._transit_data.compact_objects else Stop
+            return self._add(stop._copy(self._transit_data, stop_class))
         else:
             old_stop = self[stop.id]
             assert stop == old_stop
             return old_stop
 
     def remove(self, stop, recursive=False, clean_after=True):
-        if not isinstance(stop, Stop):
+        if not isinstance(stop, BaseStop):
             stop = self[stop]
         else:
             assert self[stop.id] is stop
 
         if recursive:
+            if len(stop.stop_times) > 0:
+                self._transit_data._changed("stop_times.txt")
             for stop_time in stop.stop_times:
                 stop_time.trip.stop_times.remove(stop_time)
+                self._transit_data._touched(stop_time.trip)
         else:
             assert len(stop.stop_times) == 0
 
+        self._transit_data._changed("stops.txt")
+        self._transit_data._touched(stop, stop.parent_station)
         del self._objects[stop.id]
+        stop._collection = None
+        if self._spatial_index is not None:
+            self._spatial_index.remove(stop)
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
+
+    def get_departures(self, stop, day, from_time, to_time=None, limit=None):
+        """
+        Returns the departures from the stop on the date, between the two times (inclusive), ordered by their times.
+
+        The departures are looked up by bisection in the stop's departure board (see build_departure_boards), and
+        filtered by the services that are active on the date, and on the day before for the trips that depart after
+        midnight (at GTFS times past 24:00:00).
+
+        :type stop: Stop | int
+        :type day: date
+        :param from_time: the time since the date's midnight, as a GTFS time, seconds or timedelta
+        :type from_time: str | int | timedelta
+        :type to_time: str | int | timedelta | None
+        :type limit: int | None
+        :return: the departure times (seconds since the date's midnight) and stop times
+        :rtype: list[(int, gtfspy.data_objects.StopTime)]
+        """
+
+        if isinstance(stop, BaseStop):
+            assert self[stop.id] is stop
+        else:
+            stop = self[stop]
+
+        from_time = parse_time_seconds(from_time)
+        to_time = 2 * SECONDS_IN_DAY if to_time is None else parse_time_seconds(to_time)
+        board = self._get_departure_board(stop)
+
+        result = board.get_departures(from_time, to_time, self._get_active_services(day), limit=limit)
+        result += ((departure_time - SECONDS_IN_DAY, stop_time) for departure_time, stop_time in
+                   board.get_departures(from_time + SECONDS_IN_DAY, to_time + SECONDS_IN_DAY,
+                                        self._get_active_services(day - timedelta(days=1)), limit=limit))
+        result.sort(key=itemgetter(0))
+        return result if limit is None else result[:limit]
+
+    def build_departure_boards(self, stops=None):
+        """
+        Builds the departure boards of the stops (all the stops by default) ahead of get_departures, which otherwise
+        builds the board of a stop on its first query. The boards are dropped whenever stop_times.txt changes.
+
+        :type stops: collections.Iterable[Stop] | None
+        """
+
+        for stop in self if stops is None else stops:
+            self._get_departure_board(stop)
+
+    def _get_departure_board(self, stop):
+        if not self._departure_boards_registered:
+            self._transit_data._register_derived_index(["stops.txt", "stop_times.txt"],
+                                                       self._departure_boards.clear)
+            self._transit_data._register_derived_index(["calendar.txt", "calendar_dates.txt"],
+                                                       self._active_services.clear)
+            self._departure_boards_registered = True
+
+        board = self._departure_boards.get(stop.id)
+        if board is None:
+            board = self._departure_boards[stop.id] = DepartureBoard(stop)
+        return board
+
+    def _get_active_services(self, day):
+        active_services = self._active_services.get(day)
+        if active_services is None:
+            active_services = self._active_services[day] = \
+                frozenset(self._transit_data.calendar.get_services_on(day))
+        return active_services
+
+    def get_nearest_stops(self, lat, lon, k=1):
+        """
+        :type lat: float
+        :type lon: float
+        :type k: int
+        :return: the k nearest stops' distances from the point (in meters) and the stops, ordered by the distance
+        :rtype: list[(float, Stop)]
+        """
+
+        return self._get_spatial_index().get_nearest_stops(float(lat), float(lon), k=k)
+
+    def get_stops_in_radius(self, lat, lon, radius):
+        """
+        :type lat: float
+        :type lon: float
+        :param radius: the maximum distance from the point, in meters
+        :type radius: float
+        :return: the stops' distances from the point (in meters) and the stops, ordered by the distance
+        :rtype: list[(float, Stop)]
+        """
+
+        return self._get_spatial_index().get_stops_in_radius(float(lat), float(lon), float(radius))
+
+    def get_stops_in_bounding_box(self, bounding_box):
+        """
+        :param bounding_box: the minimum latitude, minimum longitude, maximum latitude and maximum longitude of the box
+        :type bounding_box: (float, float, float, float)
+        :rtype: list[Stop]
+        """
+
+        return self._get_spatial_index().get_stops_in_bounding_box(tuple(float(value) for value in bounding_box))
+
+    def _get_spatial_index(self):
+        """
+        Builds the spatial index of the stops on the first query. The collection keeps it up to date when stops are
+        added and removed, and it's dropped when the coordinates of a stop change or when the whole transit data may
+        have changed (e.g. on load).
+
+        :rtype: gtfspy.data_objects.stop_spatial_index.StopSpatialIndex
+        """
+
+        if not self._spatial_index_registered:
+            # the index isn't derived from stops.txt as a whole, since adding and removing stops updates it in place
+            self._transit_data._register_derived_index([], self._drop_spatial_index)
+            self._spatial_index_registered = True
+
+        if self._spatial_index is None:
+            # numpy is only needed for the spatial queries, so the index is imported on demand
+            from gtfspy.data_objects.stop_spatial_index import StopSpatialIndex
+
+            self._spatial_index = StopSpatialIndex(self)
+        return self._spatial_index
+
+    def _drop_spatial_index(self):
+        self._spatial_index = None
 
     def clean(self):
         to_clean = set()
@@ -291,5 +575,50 @@ class StopCollection(BaseGtfsObjectCollection):
                 if stop.id in to_clean:
                     to_clean.remove(stop.id)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("stops.txt")
         for stop_id in to_clean:
-            del self._objects[stop_id]
+            if self._spatial_index is not None:
+                self._spatial_index.remove(self._objects[stop_id])
+            self._objects.pop(stop_id)._collection = None
+
+
+class DepartureBoard(object):
+    """
+    The stop times of a stop, ordered by their departure times (seconds since the service day midnight) in an array
+    for bisection lookups.
+    """
+
+    def __init__(self, stop):
+        """
+        :type stop: Stop
+        """
+
+        stop_times = [(stop_time.departure_seconds, stop_time) for stop_time in stop.stop_times
+                      if stop_time.departure_time is not None]
+        stop_times.sort(key=itemgetter(0))
+
+        self.departure_times = array("i", (departure_time for departure_time, _ in stop_times))
+        self.stop_times = [stop_time for _, stop_time in stop_times]
+
+    def get_departures(self, from_time, to_time, services, limit=None):
+        """
+        :param from_time: seconds since the service day midnight
+        :type from_time: int
+        :type to_time: int
+        :param services: the active services, the departures of trips of other services are skipped
+        :type services: frozenset[gtfspy.data_objects.Service]
+        :type limit: int | None
+        :rtype: list[(int, gtfspy.data_objects.StopTime)]
+        """
+
+        departure_times = self.departure_times
+        stop_times = self.stop_times
+
+        result = []
+        for i in xrange(bisect_left(departure_times, from_time), bisect_right(departure_times, to_time)):
+            if stop_times[i].trip.service in services:
+                result.append((departure_times[i], stop_times[i]))
+                if len(result) == limit:
+                    break
+        return result
@@ -0,0 +1,188 @@
+import math
+
+import numpy as np
+
+from gtfspy.utils.geo import EARTH_RADIUS, is_in_bounding_box
+
+DEFAULT_CELL_SIZE = 0.01
+
+
+class StopSpatialIndex(object):
+    """
+    A uniform grid over the stops' coordinates, for nearest stop, radius and bounding box queries.
+
+    Every stop is kept in the grid cell of its coordinates (cell_size degrees of latitude and longitude), so a query
+    only reads the stops of the cells that overlap its area, and refines them by their exact (haversine) distances,
+    computed with NumPy for all the candidates at once. Stops are added and removed one by one, without rebuilding the
+    grid. The antimeridian isn't wrapped around.
+    """
+
+    def __init__(self, stops=(), cell_size=DEFAULT_CELL_SIZE):
+        """
+        :type stops: collections.Iterable[gtfspy.data_objects.Stop]
+        :param cell_size: the size of the grid's cells, in degrees
+        :type cell_size: float
+        """
+
+        assert cell_size > 0
+
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        # the cell every stop was added to, so it's removed from the same cell even if its coordinates were changed
+        self._stops_cells = {}
+
+        for stop in stops:
+            self.add(stop)
+
+    def add(self, stop):
+        """
+        :type stop: gtfspy.data_objects.Stop
+        """
+
+        assert stop.id not in self._stops_cells
+
+        cell = self._get_cell(stop.stop_lat, stop.stop_lon)
+        self._cells.setdefault(cell, []).append(stop)
+        self._stops_cells[stop.id] = cell
+
+    def remove(self, stop):
+        """
+        :type stop: gtfspy.data_objects.Stop
+        """
+
+        cell = self._stops_cells.pop(stop.id)
+        cell_stops = self._cells[cell]
+        cell_stops.remove(stop)
+        if len(cell_stops) == 0:
+            del self._cells[cell]
+
+    def get_stops_in_bounding_box(self, bounding_box):
+        """
+        :param bounding_box: the minimum latitude, minimum longitude, maximum latitude and maximum longitude of the box
+        :type bounding_box: (float, float, float, float)
+        :rtype: list[gtfspy.data_objects.Stop]
+        """
+
+        min_lat, min_lon, max_lat, max_lon = bounding_box
+        return [stop for stop in self._get_candidates(min_lat, min_lon, max_lat, max_lon)
+                if is_in_bounding_box(stop.stop_lat, stop.stop_lon, bounding_box)]
+
+    def get_stops_in_radius(self, lat, lon, radius):
+        """
+        :type lat: float
+        :type lon: float
+        :param radius: the maximum distance from the point, in meters
+        :type radius: float
+        :return: the stops' distances from the point (in meters) and the stops, ordered by the distance
+        :rtype: list[(float, gtfspy.data_objects.Stop)]
+        """
+
+        lat_radius = math.degrees(radius / EARTH_RADIUS)
+        max_abs_lat = min(abs(lat) + lat_radius, 90.0)
+        cos_lat = math.cos(math.radians(max_abs_lat))
+        lon_radius = 180.0 if cos_lat * 180.0 <= lat_radius else lat_radius / cos_lat
+
+        candidates = self._get_candidates(lat - lat_radius, lon - lon_radius, lat + lat_radius, lon + lon_radius)
+        return [(distance, stop) for distance, stop in _get_sorted_distances(lat, lon, candidates)
+                if distance <= radius]
+
+    def get_nearest_stops(self, lat, lon, k=1):
+        """
+        :type lat: float
+        :type lon: float
+        :type k: int
+        :return: the k nearest stops' distances from the point (in meters) and the stops, ordered by the distance
+        :rtype: list[(float, gtfspy.data_objects.Stop)]
+        """
+
+        if k <= 0 or len(self._stops_cells) == 0:
+            return []
+
+        # the rings of cells around the point's cell are read until they have k stops, and the distance of the k-th
+        # nearest of them bounds the distance of the k nearest stops
+        row, col = self._get_cell(lat, lon)
+        candidates = list(self._cells.get((row, col), ()))
+        ring = 0
+        cells_read = 1
+        while len(candidates) < k and cells_read < len(self._cells):
+            ring += 1
+            for ring_cell in _get_ring_cells(row, col, ring):
+                candidates.extend(self._cells.get(ring_cell, ()))
+            cells_read += 8 * ring
+        if len(candidates) < k:
+            candidates = [stop for cell_stops in self._cells.itervalues() for stop in cell_stops]
+
+        distances = _get_sorted_distances(lat, lon, candidates)
+        return self.get_stops_in_radius(lat, lon, distances[min(k, len(distances)) - 1][0])[:k]
+
+    def _get_cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def _get_candidates(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        :return: the stops of the cells that overlap the box
+        :rtype: list[gtfspy.data_objects.Stop]
+        """
+
+        min_row, min_col = self._get_cell(min_lat, min_lon)
+        max_row, max_col = self._get_cell(max_lat, max_lon)
+
+        cells = self._cells
+        # a box larger than the grid is answered from the grid's cells instead of the box's cells
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(cells):
+            return [stop for (row, col), cell_stops in cells.iteritems()
+                    if min_row <= row <= max_row and min_col <= col <= max_col
+                    for stop in cell_stops]
+
+        result = []
+        for row in xrange(min_row, max_row + 1):
+            for col in xrange(min_col, max_col + 1):
+                result.extend(cells.get((row, col), ()))
+        return result
+
+    def __len__(self):
+        return len(self._stops_cells)
+
+
+def haversine_distances(lat, lon, lats, lons):
+    """
+    :type lat: float
+    :type lon: float
+    :type lats: np.ndarray
+    :type lons: np.ndarray
+    :return: the distances of the points from the point, in meters
+    :rtype: np.ndarray
+    """
+
+    lat = math.radians(lat)
+    lats = np.radians(lats)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin(np.radians(lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _get_sorted_distances(lat, lon, stops):
+    """
+    :type lat: float
+    :type lon: float
+    :type stops: list[gtfspy.data_objects.Stop]
+    :rtype: list[(float, gtfspy.data_objects.Stop)]
+    """
+
+    lats = np.fromiter((stop.stop_lat for stop in stops), dtype=np.float64, count=len(stops))
+    lons = np.fromiter((stop.stop_lon for stop in stops), dtype=np.float64, count=len(stops))
+    distances = haversine_distances(lat, lon, lats, lons)
+    return [(float(distances[i]), stops[i]) for i in np.argsort(distances, kind="mergesort")]
+
+
+def _get_ring_cells(row, col, ring):
+    """
+    :return: the cells at the given Chebyshev distance from the cell
+    :rtype: collections.Iterable[(int, int)]
+    """
+
+    for i in xrange(-ring, ring + 1):
+        yield row - ring, col + i
+        yield row + ring, col + i
+    for i in xrange(-ring + 1, ring):
+        yield row + i, col - ring
+        yield row + i, col + ring
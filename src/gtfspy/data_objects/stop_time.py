@@ -1,18 +1,28 @@
 from datetime import timedelta
 
 import gtfspy
-from gtfspy.utils.time import parse_timedelta, str_timedelta
+from gtfspy.data_objects.compact_object import CompactObject, SlottedObject, create_attribute_property, \
+    create_attributes_slots
+from gtfspy.data_objects.tracked_object import TrackedObject
+from gtfspy.utils.time import parse_timedelta, parse_time_seconds, str_time_seconds
 from gtfspy.utils.validating import not_none_or_empty, validate_true_false
 
 
-class StopTime(object):
+class BaseStopTime(SlottedObject):
+    """
+    The fields and methods shared by StopTime and CompactStopTime, which keep the optional and unknown fields
+    differently.
+    """
+
+    __slots__ = ["_trip", "_arrival_time", "_departure_time", "_stop", "_stop_sequence", "__weakref__"]
+
     def __init__(self, transit_data, trip_id, arrival_time, departure_time, stop_id, stop_sequence, pickup_type=None,
                  drop_off_type=None, shape_dist_traveled=None, stop_headsign=None, timepoint=None, **kwargs):
         """
         :type transit_data: gtfspy.transit_data_object.TransitData
         :type trip_id: str
-        :type arrival_time: str | timedelta
-        :type departure_time: str | timedelta
+        :type arrival_time: str | int | timedelta
+        :type departure_time: str | int | timedelta
         :type stop_id: str | int
         :type stop_sequence: str | int
         :type pickup_type: str | int | bool | None
@@ -22,23 +32,138 @@ class StopTime(object):
         :type timepoint: str | int | None
         """
 
-        self.trip = transit_data.trips[trip_id]
-        self.arrival_time = parse_timedelta(arrival_time)
-        self.departure_time = parse_timedelta(departure_time)
-        self.stop = transit_data.stops[int(stop_id)]
-        self.stop_sequence = int(stop_sequence)
+        self._trip = transit_data.trips[trip_id]
+        if transit_data.integer_times:
+            self._arrival_time = parse_time_seconds(arrival_time)
+            self._departure_time = parse_time_seconds(departure_time)
+        else:
+            self._arrival_time = parse_timedelta(arrival_time)
+            self._departure_time = parse_timedelta(departure_time)
+        self._stop = transit_data.stops[int(stop_id)]
+        self._stop_sequence = int(stop_sequence)
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(pickup_type):
-            self.attributes["pickup_type"] = int(pickup_type)
+            attributes["pickup_type"] = int(pickup_type)
         if not_none_or_empty(drop_off_type):
-            self.attributes["drop_off_type"] = int(drop_off_type)
+            attributes["drop_off_type"] = int(drop_off_type)
         if not_none_or_empty(shape_dist_traveled):
-            self.attributes["shape_dist_traveled"] = float(shape_dist_traveled)
+            attributes["shape_dist_traveled"] = float(shape_dist_traveled)
         if not_none_or_empty(stop_headsign):
-            self.attributes["stop_headsign"] = str(stop_headsign)
+            attributes["stop_headsign"] = str(stop_headsign)
         if not_none_or_empty(timepoint):
-            self.attributes["timepoint"] = int(timepoint)
+            attributes["timepoint"] = int(timepoint)
+        self._set_attributes(attributes)
+
+    def _changed(self):
+        """
+        Reports a change of the stop time to the transit data that owns its trip (if any).
+        """
+
+        collection = self.trip._collection
+        if collection is not None:
+            collection._transit_data._changed("stop_times.txt")
+
+    @property
+    def trip(self):
+        """
+        :rtype: gtfspy.data_objects.Trip
+        """
+
+        return self._trip
+
+    @trip.setter
+    def trip(self, value):
+        """
+        :type value: gtfspy.data_objects.Trip
+        """
+
+        self._trip = value
+        self._changed()
+
+    @property
+    def arrival_time(self):
+        """
+        :rtype: timedelta | int
+        """
+
+        return self._arrival_time
+
+    @arrival_time.setter
+    def arrival_time(self, value):
+        """
+        :type value: timedelta | int
+        """
+
+        self._arrival_time = value
+        self._changed()
+
+    @property
+    def departure_time(self):
+        """
+        :rtype: timedelta | int
+        """
+
+        return self._departure_time
+
+    @departure_time.setter
+    def departure_time(self, value):
+        """
+        :type value: timedelta | int
+        """
+
+        self._departure_time = value
+        self._changed()
+
+    @property
+    def stop(self):
+        """
+        :rtype: gtfspy.data_objects.Stop
+        """
+
+        return self._stop
+
+    @stop.setter
+    def stop(self, value):
+        """
+        :type value: gtfspy.data_objects.Stop
+        """
+
+        self._stop = value
+        self._changed()
+
+    @property
+    def stop_sequence(self):
+        """
+        :rtype: int
+        """
+
+        return self._stop_sequence
+
+    @stop_sequence.setter
+    def stop_sequence(self, value):
+        """
+        :type value: int
+        """
+
+        self._stop_sequence = value
+        self._changed()
+
+    @property
+    def arrival_seconds(self):
+        """
+        :rtype: int
+        """
+
+        return parse_time_seconds(self.arrival_time)
+
+    @property
+    def departure_seconds(self):
+        """
+        :rtype: int
+        """
+
+        return parse_time_seconds(self.departure_time)
 
     @property
     def pickup_type(self):
@@ -152,13 +277,36 @@ class StopTime(object):
 
         self.attributes["timepoint"] = int(value)
 
+    def _copy(self, transit_data, stop_time_class):
+        """
+        Creates a copy of the stop time in another transit data from its typed fields, without formatting and parsing
+        them.
+
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type stop_time_class: type
+        :rtype: StopTime
+        """
+
+        stop_time = stop_time_class.__new__(stop_time_class)
+        stop_time._trip = transit_data.trips[self.trip.id]
+        if transit_data.integer_times:
+            stop_time._arrival_time = self.arrival_seconds
+            stop_time._departure_time = self.departure_seconds
+        else:
+            stop_time._arrival_time = parse_timedelta(self.arrival_time)
+            stop_time._departure_time = parse_timedelta(self.departure_time)
+        stop_time._stop = transit_data.stops[self.stop.id]
+        stop_time._stop_sequence = self.stop_sequence
+        stop_time._set_attributes(self.attributes)
+        return stop_time
+
     def get_csv_fields(self):
         return ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"] + self.attributes.keys()
 
     def to_csv_line(self):
         result = dict(trip_id=self.trip.id,
-                      arrival_time=str_timedelta(self.arrival_time),
-                      departure_time=str_timedelta(self.departure_time),
+                      arrival_time=str_time_seconds(self.arrival_seconds),
+                      departure_time=str_time_seconds(self.departure_seconds),
                       stop_id=self.stop.id,
                       stop_sequence=self.stop_sequence,
                       **self.attributes)
@@ -179,12 +327,43 @@ class StopTime(object):
         assert self.arrival_time is None or self.departure_time is None or self.arrival_time <= self.departure_time
 
     def __eq__(self, other):
-        if not isinstance(other, StopTime):
+        if not isinstance(other, BaseStopTime):
             return False
 
-        return self.trip == other.trip and self.arrival_time == other.arrival_time and \
-               self.departure_time == other.departure_time and self.stop == other.stop and \
+        return self.trip == other.trip and _times_equal(self.arrival_time, other.arrival_time) and \
+               _times_equal(self.departure_time, other.departure_time) and self.stop == other.stop and \
                self.stop_sequence == other.stop_sequence and self.attributes == other.attributes
 
     def __ne__(self, other):
         return not (self == other)
+
+
+def _times_equal(time1, time2):
+    # times of the same representation are compared as they are, and only mixed ones are converted to seconds
+    if type(time1) is type(time2):
+        return time1 == time2
+    return parse_time_seconds(time1) == parse_time_seconds(time2)
+
+
+class StopTime(TrackedObject, BaseStopTime):
+    """
+    A stop time, which also accepts arbitrary attributes.
+    """
+
+    __slots__ = ["_attributes", "__dict__"]
+
+
+class CompactStopTime(CompactObject, BaseStopTime):
+    """
+    A StopTime that stores its known optional fields in slots instead of an attributes dict.
+    """
+
+    _ATTRIBUTES_SLOTS = create_attributes_slots("pickup_type", "drop_off_type", "shape_dist_traveled", "stop_headsign",
+                                                "timepoint")
+    __slots__ = _ATTRIBUTES_SLOTS.values() + ["_extra_attributes"]
+
+    pickup_type = create_attribute_property(BaseStopTime.pickup_type, "pickup_type", 0)
+    drop_off_type = create_attribute_property(BaseStopTime.drop_off_type, "drop_off_type", 0)
+    shape_dist_traveled = create_attribute_property(BaseStopTime.shape_dist_traveled, "shape_dist_traveled")
+    stop_headsign = create_attribute_property(BaseStopTime.stop_headsign, "stop_headsign")
+    is_exact_time = create_attribute_property(BaseStopTime.is_exact_time, "timepoint", 1, parse=bool)
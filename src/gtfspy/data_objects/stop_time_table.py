@@ -0,0 +1,546 @@
+from array import array
+from bisect import bisect_right
+from collections import MutableMapping
+from datetime import timedelta
+
+import gtfspy
+from gtfspy.data_objects.stop_time import BaseStopTime
+from gtfspy.utils.time import parse_time_seconds
+from gtfspy.utils.validating import not_none_or_empty
+
+_MISSING_CODE = -1
+_MISSING_FLOAT = float("nan")
+
+
+class StopTimeTable(object):
+    """
+    Columnar storage for all the stop times of a TransitData object.
+
+    Every stop time is a row in a set of typed arrays. Trips and stops keep only the row numbers of their stop times
+    (see TripStopTimes and StopStopTimes), and StopTimeView objects are created on demand when a row is accessed.
+
+    Removing a stop time leaves its row in the arrays as a tombstone. The rows are reclaimed only by an explicit call
+    to compact, since it renumbers the rows that stop time views read.
+    """
+
+    def __init__(self, transit_data):
+        """
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        """
+
+        self._transit_data = transit_data
+
+        self._trips = []
+        self._trips_indices = {}
+        self._stops = []
+        self._stops_indices = {}
+
+        self.trip_index = array("i")
+        self.stop_index = array("i")
+        self.arrival_time = array("i")
+        self.departure_time = array("i")
+        self.stop_sequence = array("i")
+        self.pickup_type = array("b")
+        self.drop_off_type = array("b")
+        self.timepoint = array("b")
+        self.shape_dist_traveled = array("d")
+        self.stop_headsign = []
+        self.extra_attributes = {}
+
+        # the rows of the removed stop times, until the table is compacted
+        self._removed_rows = set()
+
+    def create_trip_stop_times(self, trip):
+        """
+        :type trip: gtfspy.data_objects.Trip
+        :rtype: TripStopTimes
+        """
+
+        return TripStopTimes(self, trip)
+
+    def create_stop_stop_times(self, stop):
+        """
+        :type stop: gtfspy.data_objects.Stop
+        :rtype: StopStopTimes
+        """
+
+        return StopStopTimes(self, stop)
+
+    def add(self, trip_id, arrival_time, departure_time, stop_id, stop_sequence, pickup_type=None,
+            drop_off_type=None, shape_dist_traveled=None, stop_headsign=None, timepoint=None, **kwargs):
+        """
+        :type trip_id: str
+        :type arrival_time: str | int | timedelta
+        :type departure_time: str | int | timedelta
+        :type stop_id: str | int
+        :type stop_sequence: str | int
+        :type pickup_type: str | int | bool | None
+        :type drop_off_type: str | int | bool | None
+        :type shape_dist_traveled: str | int | float | None
+        :type stop_headsign: str
+        :type timepoint: str | int | None
+        :rtype: StopTimeView
+        """
+
+        trip = self._transit_data.trips[trip_id]
+        stop = self._transit_data.stops[int(stop_id)]
+        stop_sequence = int(stop_sequence)
+
+        row = len(self.trip_index)
+        self.trip_index.append(self._get_trip_index(trip))
+        self.stop_index.append(self._get_stop_index(stop))
+        self.arrival_time.append(parse_time_seconds(arrival_time))
+        self.departure_time.append(parse_time_seconds(departure_time))
+        self.stop_sequence.append(stop_sequence)
+        self.pickup_type.append(int(pickup_type) if not_none_or_empty(pickup_type) else _MISSING_CODE)
+        self.drop_off_type.append(int(drop_off_type) if not_none_or_empty(drop_off_type) else _MISSING_CODE)
+        self.timepoint.append(int(timepoint) if not_none_or_empty(timepoint) else _MISSING_CODE)
+        self.shape_dist_traveled.append(float(shape_dist_traveled) if not_none_or_empty(shape_dist_traveled)
+                                        else _MISSING_FLOAT)
+        self.stop_headsign.append(str(stop_headsign) if not_none_or_empty(stop_headsign) else None)
+
+        extra_attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        if len(extra_attributes) > 0:
+            self.extra_attributes[row] = extra_attributes
+
+        trip.stop_times._insert_row(row)
+        stop.stop_times._rows.append(row)
+        return StopTimeView(self, row)
+
+    def _load_columns(self, trips, stops, trip_index, stop_index, arrival_time, departure_time, stop_sequence,
+                      pickup_type, drop_off_type, timepoint, shape_dist_traveled, stop_headsign, extra_attributes):
+        """
+        Fills an empty table with complete columns, e.g. from a snapshot file.
+
+        :type trips: list[gtfspy.data_objects.Trip]
+        :type stops: list[gtfspy.data_objects.Stop]
+        :type trip_index: array
+        :type stop_index: array
+        :type arrival_time: array
+        :type departure_time: array
+        :type stop_sequence: array
+        :type pickup_type: array
+        :type drop_off_type: array
+        :type timepoint: array
+        :type shape_dist_traveled: array
+        :type stop_headsign: list[str | None]
+        :type extra_attributes: dict[int, dict]
+        """
+
+        assert len(self) == 0
+
+        self._trips = list(trips)
+        self._trips_indices = {trip: i for i, trip in enumerate(self._trips)}
+        self._stops = list(stops)
+        self._stops_indices = {stop: i for i, stop in enumerate(self._stops)}
+
+        self.trip_index = trip_index
+        self.stop_index = stop_index
+        self.arrival_time = arrival_time
+        self.departure_time = departure_time
+        self.stop_sequence = stop_sequence
+        self.pickup_type = pickup_type
+        self.drop_off_type = drop_off_type
+        self.timepoint = timepoint
+        self.shape_dist_traveled = shape_dist_traveled
+        self.stop_headsign = stop_headsign
+        self.extra_attributes = dict(extra_attributes)
+
+        for row in xrange(len(trip_index)):
+            self._trips[trip_index[row]].stop_times._insert_row(row)
+            self._stops[stop_index[row]].stop_times._rows.append(row)
+
+    def compact(self):
+        """
+        Reclaims the rows of the removed stop times, and forgets the trips and stops that have no stop times left. The
+        remaining rows keep their order but are renumbered, so stop times read from the table before it's compacted
+        shouldn't be used after it.
+        """
+
+        trips = self._transit_data.trips._objects
+        live_rows = []
+        for trip in self._trips:
+            if trips.get(trip.id) is trip:
+                live_rows.extend(trip.stop_times._rows)
+            else:
+                # the stop times of a removed trip are removed with it
+                trip.stop_times._rows = array("i")
+        live_rows.sort()
+
+        new_rows = array("i", [-1]) * len(self)
+        for new_row, row in enumerate(live_rows):
+            new_rows[row] = new_row
+
+        old_trips = self._trips
+        old_stops = self._stops
+        old_trip_index = self.trip_index
+        old_stop_index = self.stop_index
+        self._trips = []
+        self._trips_indices = {}
+        self._stops = []
+        self._stops_indices = {}
+        self.trip_index = array("i", (self._get_trip_index(old_trips[old_trip_index[row]]) for row in live_rows))
+        self.stop_index = array("i", (self._get_stop_index(old_stops[old_stop_index[row]]) for row in live_rows))
+        for column_name in ["arrival_time", "departure_time", "stop_sequence", "pickup_type", "drop_off_type",
+                            "timepoint", "shape_dist_traveled"]:
+            column = getattr(self, column_name)
+            setattr(self, column_name, array(column.typecode, (column[row] for row in live_rows)))
+        stop_headsign = self.stop_headsign
+        self.stop_headsign = [stop_headsign[row] for row in live_rows]
+        self.extra_attributes = {new_rows[row]: attributes for row, attributes in self.extra_attributes.iteritems()
+                                 if new_rows[row] != -1}
+
+        for trip in self._trips:
+            trip.stop_times._rows = array("i", (new_rows[row] for row in trip.stop_times._rows))
+        for stop in old_stops:
+            stop.stop_times._rows = array("i", (new_rows[row] for row in stop.stop_times._rows
+                                                if new_rows[row] != -1))
+        self._removed_rows = set()
+
+    def _get_trip_index(self, trip):
+        index = self._trips_indices.get(trip)
+        if index is None:
+            index = len(self._trips)
+            self._trips.append(trip)
+            self._trips_indices[trip] = index
+        return index
+
+    def _get_stop_index(self, stop):
+        index = self._stops_indices.get(stop)
+        if index is None:
+            index = len(self._stops)
+            self._stops.append(stop)
+            self._stops_indices[stop] = index
+        return index
+
+    def __len__(self):
+        return len(self.trip_index)
+
+
+class StopTimeAttributes(MutableMapping):
+    """
+    The optional fields of a single stop time row, exposed as a dict like object.
+    """
+
+    _CODE_COLUMNS = ["pickup_type", "drop_off_type", "timepoint"]
+
+    def __init__(self, table, row):
+        """
+        :type table: StopTimeTable
+        :type row: int
+        """
+
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        if key in StopTimeAttributes._CODE_COLUMNS:
+            value = getattr(self._table, key)[self._row]
+            if value != _MISSING_CODE:
+                return value
+        elif key == "shape_dist_traveled":
+            value = self._table.shape_dist_traveled[self._row]
+            if value == value:
+                return value
+        elif key == "stop_headsign":
+            value = self._table.stop_headsign[self._row]
+            if value is not None:
+                return value
+        else:
+            return self._table.extra_attributes[self._row][key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        self._table._transit_data._changed("stop_times.txt")
+        if key in StopTimeAttributes._CODE_COLUMNS:
+            getattr(self._table, key)[self._row] = _MISSING_CODE if value is None else int(value)
+        elif key == "shape_dist_traveled":
+            self._table.shape_dist_traveled[self._row] = _MISSING_FLOAT if value is None else float(value)
+        elif key == "stop_headsign":
+            self._table.stop_headsign[self._row] = value
+        else:
+            self._table.extra_attributes.setdefault(self._row, {})[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in StopTimeAttributes._CODE_COLUMNS or key in ["shape_dist_traveled", "stop_headsign"]:
+            self[key] = None
+        else:
+            self._table._transit_data._changed("stop_times.txt")
+            extra_attributes = self._table.extra_attributes[self._row]
+            del extra_attributes[key]
+            if len(extra_attributes) == 0:
+                del self._table.extra_attributes[self._row]
+
+    def __iter__(self):
+        table = self._table
+        row = self._row
+        if table.pickup_type[row] != _MISSING_CODE:
+            yield "pickup_type"
+        if table.drop_off_type[row] != _MISSING_CODE:
+            yield "drop_off_type"
+        if table.shape_dist_traveled[row] == table.shape_dist_traveled[row]:
+            yield "shape_dist_traveled"
+        if table.stop_headsign[row] is not None:
+            yield "stop_headsign"
+        if table.timepoint[row] != _MISSING_CODE:
+            yield "timepoint"
+        for key in table.extra_attributes.get(row, ()):
+            yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class StopTimeView(BaseStopTime):
+    """
+    A lightweight StopTime that reads and writes its data directly from a StopTimeTable row.
+    """
+
+    __slots__ = ["_table", "_row"]
+
+    def __init__(self, table, row):
+        """
+        :type table: StopTimeTable
+        :type row: int
+        """
+
+        self._table = table
+        self._row = row
+
+    def _changed(self):
+        """
+        Reports a change of the row to the table's transit data.
+        """
+
+        self._table._transit_data._changed("stop_times.txt")
+
+    @property
+    def trip(self):
+        """
+        :rtype: gtfspy.data_objects.Trip
+        """
+
+        return self._table._trips[self._table.trip_index[self._row]]
+
+    @trip.setter
+    def trip(self, value):
+        """
+        :type value: gtfspy.data_objects.Trip
+        """
+
+        self._table.trip_index[self._row] = self._table._get_trip_index(value)
+        self._changed()
+
+    @property
+    def stop(self):
+        """
+        :rtype: gtfspy.data_objects.Stop
+        """
+
+        return self._table._stops[self._table.stop_index[self._row]]
+
+    @stop.setter
+    def stop(self, value):
+        """
+        :type value: gtfspy.data_objects.Stop
+        """
+
+        self._table.stop_index[self._row] = self._table._get_stop_index(value)
+        self._changed()
+
+    @property
+    def arrival_time(self):
+        """
+        :rtype: timedelta | int
+        """
+
+        seconds = self._table.arrival_time[self._row]
+        return seconds if self._table._transit_data.integer_times else timedelta(seconds=seconds)
+
+    @arrival_time.setter
+    def arrival_time(self, value):
+        """
+        :type value: str | int | timedelta
+        """
+
+        self._table.arrival_time[self._row] = parse_time_seconds(value)
+        self._changed()
+
+    @property
+    def arrival_seconds(self):
+        """
+        :rtype: int
+        """
+
+        return self._table.arrival_time[self._row]
+
+    @property
+    def departure_time(self):
+        """
+        :rtype: timedelta | int
+        """
+
+        seconds = self._table.departure_time[self._row]
+        return seconds if self._table._transit_data.integer_times else timedelta(seconds=seconds)
+
+    @departure_time.setter
+    def departure_time(self, value):
+        """
+        :type value: str | int | timedelta
+        """
+
+        self._table.departure_time[self._row] = parse_time_seconds(value)
+        self._changed()
+
+    @property
+    def departure_seconds(self):
+        """
+        :rtype: int
+        """
+
+        return self._table.departure_time[self._row]
+
+    @property
+    def stop_sequence(self):
+        """
+        :rtype: int
+        """
+
+        return self._table.stop_sequence[self._row]
+
+    @stop_sequence.setter
+    def stop_sequence(self, value):
+        """
+        :type value: int
+        """
+
+        self._table.stop_sequence[self._row] = int(value)
+        self._changed()
+
+    @property
+    def attributes(self):
+        """
+        :rtype: StopTimeAttributes
+        """
+
+        return StopTimeAttributes(self._table, self._row)
+
+    def __eq__(self, other):
+        if isinstance(other, StopTimeView) and self._table is other._table and self._row == other._row:
+            return True
+
+        return BaseStopTime.__eq__(self, other)
+
+
+class TripStopTimes(object):
+    """
+    The stop times of a single trip in a StopTimeTable, ordered by their stop sequence.
+    """
+
+    def __init__(self, table, trip):
+        """
+        :type table: StopTimeTable
+        :type trip: gtfspy.data_objects.Trip
+        """
+
+        self._table = table
+        self._trip = trip
+        self._rows = array("i")
+
+    def _insert_row(self, row):
+        stop_sequence = self._table.stop_sequence
+        sequence = stop_sequence[row]
+        if len(self._rows) == 0 or stop_sequence[self._rows[-1]] <= sequence:
+            self._rows.append(row)
+        else:
+            sequences = [stop_sequence[r] for r in self._rows]
+            self._rows.insert(bisect_right(sequences, sequence), row)
+
+    def add(self, stop_time):
+        """
+        :type stop_time: StopTimeView
+        """
+
+        assert isinstance(stop_time, StopTimeView) and stop_time._table is self._table
+        self._insert_row(stop_time._row)
+        self._table._removed_rows.discard(stop_time._row)
+
+    def remove(self, stop_time):
+        """
+        :type stop_time: StopTimeView
+        """
+
+        if not isinstance(stop_time, StopTimeView) or stop_time._table is not self._table:
+            raise ValueError("%r not in list" % (stop_time,))
+        self._rows.remove(stop_time._row)
+        self._table._removed_rows.add(stop_time._row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        table = self._table
+        for row in self._rows:
+            yield StopTimeView(table, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [StopTimeView(self._table, row) for row in self._rows[index]]
+        return StopTimeView(self._table, self._rows[index])
+
+    def __contains__(self, item):
+        return isinstance(item, StopTimeView) and item._table is self._table and item._row in self._rows
+
+
+class StopStopTimes(object):
+    """
+    The stop times of a single stop in a StopTimeTable, in insertion order.
+    """
+
+    def __init__(self, table, stop):
+        """
+        :type table: StopTimeTable
+        :type stop: gtfspy.data_objects.Stop
+        """
+
+        self._table = table
+        self._stop = stop
+        self._rows = array("i")
+
+    def append(self, stop_time):
+        """
+        :type stop_time: StopTimeView
+        """
+
+        assert isinstance(stop_time, StopTimeView) and stop_time._table is self._table
+        self._rows.append(stop_time._row)
+        self._table._removed_rows.discard(stop_time._row)
+
+    def remove(self, stop_time):
+        """
+        :type stop_time: StopTimeView
+        """
+
+        if not isinstance(stop_time, StopTimeView) or stop_time._table is not self._table:
+            raise ValueError("%r not in list" % (stop_time,))
+        self._rows.remove(stop_time._row)
+        self._table._removed_rows.add(stop_time._row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        table = self._table
+        for row in self._rows:
+            yield StopTimeView(table, row)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [StopTimeView(self._table, row) for row in self._rows[index]]
+        return StopTimeView(self._table, self._rows[index])
+
+    def __contains__(self, item):
+        return isinstance(item, StopTimeView) and item._table is self._table and item._row in self._rows
+
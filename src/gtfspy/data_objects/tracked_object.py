@@ -0,0 +1,83 @@
+class TrackedAttributes(dict):
+    """
+    The attributes dict of a regular data object, which reports every change of its items to the object.
+
+    The dict is pickled and copied as a plain dict, since a copy of an object isn't owned by any transit data.
+    """
+
+    __slots__ = ["_owner"]
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owner._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owner._changed()
+
+    def clear(self):
+        dict.clear(self)
+        self._owner._changed()
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        self._owner._changed()
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._owner._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        self._owner._changed()
+        return value
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._owner._changed()
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class TrackedObject(object):
+    """
+    Base class of the regular data objects, which keep their attributes in a TrackedAttributes dict.
+
+    Every data object reports the changes made through its setters and its attributes with its _changed method, which
+    marks the object's GTFS file as changed in the transit data of the collection that owns the object (if any), so
+    saving with passthrough doesn't copy the file from the source file. The compact objects report the changes made
+    through their attributes view instead (see CompactObject).
+    """
+
+    __slots__ = ()
+
+    @property
+    def attributes(self):
+        """
+        :rtype: TrackedAttributes
+        """
+
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value):
+        """
+        :type value: dict
+        """
+
+        self._set_attributes(value)
+        self._changed()
+
+    def _set_attributes(self, attributes):
+        """
+        Sets the attributes without reporting the change, e.g. of an object that is being created.
+
+        :type attributes: collections.Mapping
+        """
+
+        tracked_attributes = TrackedAttributes(attributes)
+        tracked_attributes._owner = self
+        self._attributes = tracked_attributes
@@ -11,6 +11,16 @@ class Translator(object):
         elif data is not None:
             self._load_data(data)
 
+    def _copy(self):
+        """
+        :rtype: Translator
+        """
+
+        translator = Translator()
+        for language, translations in self._words.iteritems():
+            translator._words[language] = dict(translations)
+        return translator
+
     def _load_data(self, data):
         for row in data:
             self.add_translate(row["lang"], row["trans_id"], row["translation"])
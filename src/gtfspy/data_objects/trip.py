@@ -1,15 +1,24 @@
-from datetime import date, time, timedelta
+from datetime import date, datetime, time, timedelta
 from operator import attrgetter
 
 from sortedcontainers import SortedList
 
 import gtfspy
 from gtfspy.data_objects.base_object import BaseGtfsObjectCollection
+from gtfspy.data_objects.compact_object import CompactObject, SlottedObject, create_attribute_property, \
+    create_attributes_slots
+from gtfspy.data_objects.tracked_object import TrackedObject
 from gtfspy.utils.parsing import parse_yes_no_unknown, yes_no_unknown_to_int
 from gtfspy.utils.validating import not_none_or_empty, validate_yes_no_unknown
 
 
-class Trip(object):
+class BaseTrip(SlottedObject):
+    """
+    The fields and methods shared by Trip and CompactTrip, which keep the optional and unknown fields differently.
+    """
+
+    __slots__ = ["_collection", "_id", "_route", "_service", "stop_times", "__weakref__"]
+
     def __init__(self, transit_data, trip_id, route_id, service_id, trip_headsign=None, trip_short_name=None,
                  direction_id=None, block_id=None, shape_id=None, bikes_allowed=None, wheelchair_accessible=None,
                  original_trip_id=None, **kwargs):
@@ -28,40 +37,79 @@ class Trip(object):
         :type original_trip_id: str | None
         """
 
+        self._collection = None
         self._id = trip_id
-        self.route = transit_data.routes[route_id]
-        self.service = transit_data.calendar[int(service_id)]
+        self._route = transit_data.routes[route_id]
+        self._service = transit_data.calendar[int(service_id)]
 
-        self.attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
+        attributes = {k: v for k, v in kwargs.iteritems() if not_none_or_empty(v)}
         if not_none_or_empty(trip_headsign):
-            self.attributes["trip_headsign"] = str(trip_headsign)
+            attributes["trip_headsign"] = str(trip_headsign)
         if not_none_or_empty(trip_short_name):
-            self.attributes["trip_short_name"] = str(trip_short_name)
+            attributes["trip_short_name"] = str(trip_short_name)
         if not_none_or_empty(direction_id):
-            self.attributes["direction_id"] = int(direction_id)
+            attributes["direction_id"] = int(direction_id)
         if not_none_or_empty(block_id):
-            self.attributes["block_id"] = int(block_id)
+            attributes["block_id"] = int(block_id)
         if not_none_or_empty(shape_id):
-            self.attributes["shape_id"] = transit_data.shapes[int(shape_id)]
+            attributes["shape_id"] = transit_data.shapes[int(shape_id)]
         if not_none_or_empty(bikes_allowed):
             if isinstance(bikes_allowed, bool):
-                self.attributes["bikes_allowed"] = yes_no_unknown_to_int(bikes_allowed)
+                attributes["bikes_allowed"] = yes_no_unknown_to_int(bikes_allowed)
             else:
-                self.attributes["bikes_allowed"] = int(bikes_allowed)
+                attributes["bikes_allowed"] = int(bikes_allowed)
         if not_none_or_empty(wheelchair_accessible):
             if isinstance(wheelchair_accessible, bool):
-                self.attributes["wheelchair_accessible"] = yes_no_unknown_to_int(wheelchair_accessible)
+                attributes["wheelchair_accessible"] = yes_no_unknown_to_int(wheelchair_accessible)
             else:
-                self.attributes["wheelchair_accessible"] = int(wheelchair_accessible)
+                attributes["wheelchair_accessible"] = int(wheelchair_accessible)
         if not_none_or_empty(original_trip_id):
-            self.attributes["original_trip_id"] = str(original_trip_id)
+            attributes["original_trip_id"] = str(original_trip_id)
+        self._set_attributes(attributes)
 
-        self.stop_times = SortedList(key=attrgetter("stop_sequence"))
+        if transit_data.stop_times_table is None:
+            self.stop_times = SortedList(key=attrgetter("_stop_sequence"))
+        else:
+            self.stop_times = transit_data.stop_times_table.create_trip_stop_times(self)
 
     @property
     def id(self):
         return self._id
 
+    def _copy(self, transit_data, trip_class):
+        """
+        Creates a copy of the trip in another transit data from its typed fields, without formatting and parsing them.
+
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type trip_class: type
+        :rtype: Trip
+        """
+
+        trip = trip_class.__new__(trip_class)
+        trip._collection = None
+        trip._id = self._id
+        trip._route = transit_data.routes[self._route.id]
+        trip._service = transit_data.calendar[self._service.id]
+
+        attributes = dict(self.attributes)
+        if self.shape is not None:
+            attributes["shape_id"] = transit_data.shapes[self.shape.id]
+        trip._set_attributes(attributes)
+
+        if transit_data.stop_times_table is None:
+            trip.stop_times = SortedList(key=attrgetter("_stop_sequence"))
+        else:
+            trip.stop_times = transit_data.stop_times_table.create_trip_stop_times(trip)
+        return trip
+
+    def _changed(self):
+        """
+        Reports a change of the trip to the transit data that owns it (if any).
+        """
+
+        if self._collection is not None:
+            self._collection._transit_data._changed("trips.txt")
+
     @property
     def trip_headsign(self):
         """
@@ -110,6 +158,43 @@ class Trip(object):
     def block_id(self, value):
         self.attributes["block_id"] = value
 
+    @property
+    def route(self):
+        """
+        :rtype: gtfspy.data_objects.Route
+        """
+
+        return self._route
+
+    @route.setter
+    def route(self, value):
+        """
+        :type value: gtfspy.data_objects.Route
+        """
+
+        self._route = value
+        self._changed()
+
+    @property
+    def service(self):
+        """
+        :rtype: gtfspy.data_objects.Service
+        """
+
+        return self._service
+
+    @service.setter
+    def service(self, value):
+        """
+        :type value: gtfspy.data_objects.Service
+        """
+
+        if self in self._service.trips:
+            self._service.trips.remove(self)
+            value.trips.add(self)
+        self._service = value
+        self._changed()
+
     @property
     def shape(self):
         """
@@ -120,6 +205,15 @@ class Trip(object):
 
     @shape.setter
     def shape(self, value):
+        """
+        :type value: gtfspy.data_objects.Shape | None
+        """
+
+        if self in self._service.trips:
+            if self.shape is not None:
+                self.shape.trips.discard(self)
+            if value is not None:
+                value.trips.add(self)
         self.attributes["shape_id"] = value
 
     @property
@@ -160,10 +254,10 @@ class Trip(object):
 
     @property
     def start_time(self):
-        arrival_time_seconds = self.stop_times[0].arrival_time.total_seconds()
-        return time(hour=int(arrival_time_seconds / (60 * 60)),
-                    minute=int(arrival_time_seconds / 60) % 60,
-                    second=int(arrival_time_seconds) % 60)
+        arrival_time_seconds = self.stop_times[0].arrival_seconds
+        return time(hour=arrival_time_seconds // (60 * 60),
+                    minute=arrival_time_seconds // 60 % 60,
+                    second=arrival_time_seconds % 60)
 
     @property
     def stops(self):
@@ -195,6 +289,7 @@ class Trip(object):
         :type to_date: date | None
         :type stop_sequence: int | None
         :type stop_id: int | None
+        :rtype: collections.Iterable[datetime]
         """
 
         if to_date is None:
@@ -210,12 +305,9 @@ class Trip(object):
         else:
             stop_time = self.stop_times[0]
 
-        i = from_date
-        day_interval = timedelta(days=1)
-        while i <= to_date:
-            if self.service.is_active_on(i):
-                yield i + stop_time.arrival_time
-            i += day_interval
+        arrival_time = timedelta(seconds=stop_time.arrival_seconds)
+        for day in self.service.get_active_dates(from_date, to_date):
+            yield datetime.combine(day, time()) + arrival_time
 
     def get_csv_fields(self):
         return ["trip_id", "route_id", "service_id"] + self.attributes.keys()
@@ -246,7 +338,7 @@ class Trip(object):
             stop_time.validate(transit_data)
 
     def __eq__(self, other):
-        if not isinstance(other, Trip):
+        if not isinstance(other, BaseTrip):
             return False
 
         return self.id == other.id and self.route == other.route and self.service == other.service and \
@@ -256,32 +348,70 @@ class Trip(object):
         return not (self == other)
 
 
+class Trip(TrackedObject, BaseTrip):
+    """
+    A trip, which also accepts arbitrary attributes.
+    """
+
+    __slots__ = ["_attributes", "__dict__"]
+
+
+class CompactTrip(CompactObject, BaseTrip):
+    """
+    A Trip that stores its known optional fields in slots instead of an attributes dict.
+    """
+
+    _ATTRIBUTES_SLOTS = create_attributes_slots("trip_headsign", "trip_short_name", "direction_id", "block_id",
+                                                "shape_id", "bikes_allowed", "wheelchair_accessible",
+                                                "original_trip_id")
+    __slots__ = _ATTRIBUTES_SLOTS.values() + ["_extra_attributes"]
+
+    trip_headsign = create_attribute_property(BaseTrip.trip_headsign, "trip_headsign")
+    trip_short_name = create_attribute_property(BaseTrip.trip_short_name, "trip_short_name")
+    direction_id = create_attribute_property(BaseTrip.direction_id, "direction_id")
+    block_id = create_attribute_property(BaseTrip.block_id, "block_id")
+    shape = create_attribute_property(BaseTrip.shape, "shape_id")
+    bikes_allowed = create_attribute_property(BaseTrip.bikes_allowed, "bikes_allowed", parse=parse_yes_no_unknown)
+    wheelchair_accessible = create_attribute_property(BaseTrip.wheelchair_accessible, "wheelchair_accessible",
+                                                      parse=parse_yes_no_unknown)
+    original_trip_id = create_attribute_property(BaseTrip.original_trip_id, "original_trip_id")
+
+
 class TripCollection(BaseGtfsObjectCollection):
     def __init__(self, transit_data, csv_file=None):
-        BaseGtfsObjectCollection.__init__(self, transit_data, Trip)
+        BaseGtfsObjectCollection.__init__(self, transit_data, BaseTrip)
 
         if csv_file is not None:
             self._load_file(csv_file)
 
     def add(self, ignore_errors=False, condition=None, **kwargs):
         try:
-            trip = Trip(transit_data=self._transit_data, **kwargs)
+            trip_class = CompactTrip if self._transit_data.compact_objects else Trip
+            trip = trip_class(transit_data=self._transit_data, **kwargs)
 
             if condition is not None and not condition(trip):
                 return None
 
-            self._transit_data._changed()
-
-            assert trip.id not in self._objects
-            self._objects[trip.id] = trip
-            trip.route.trips.append(trip)
-            return trip
+            return self._add(trip)
         except:
             if not ignore_errors:
                 raise
 
+    def _add(self, trip):
+        self._transit_data._changed("trips.txt")
+
+        assert trip.id not in self._objects
+        self._objects[trip.id] = trip
+        trip._collection = self
+        self._csv_schema.update(trip.get_csv_fields())
+        trip.route.trips.append(trip)
+        trip.service.trips.add(trip)
+        if trip.shape is not None:
+            trip.shape.trips.add(trip)
+        return trip
+
     def add_object(self, trip, recursive=False):
-        assert isinstance(trip, Trip)
+        assert isinstance(trip, BaseTrip)
 
         if trip.id not in self._transit_data.trips:
             if recursive:
@@ -293,29 +423,35 @@ class TripCollection(BaseGtfsObjectCollection):
                 assert trip.route in self._transit_data.routes
                 assert trip.service in self._transit_data.calendar
                 assert trip.shape is None or trip.shape in self._transit_data.shapes
-            return self.add(**trip.to_csv_line())
+            trip_class = CompactTrip if self._transit_data.compact_objects else Trip
+            return self._add(trip._copy(self._transit_data, trip_class))
         else:
             old_trip = self[trip.id]
             assert trip == old_trip
             return old_trip
 
     def remove(self, trip, recursive=False, clean_after=True):
-        if not isinstance(trip, Trip):
+        if not isinstance(trip, BaseTrip):
             trip = self[trip]
         else:
             assert self[trip.id] is trip
 
         if recursive:
+            if len(trip.stop_times) > 0:
+                self._transit_data._changed("stop_times.txt")
             for stop_time in trip.stop_times:
                 stop_time.stop.stop_times.remove(stop_time)
+                self._transit_data._touched(stop_time.stop)
         else:
             assert len(trip.stop_times) == 0
 
-        trip.route.trips.remove(trip)
+        self._transit_data._changed("trips.txt")
+        self._remove_references(trip)
         del self._objects[trip.id]
+        trip._collection = None
 
         if clean_after:
-            self._transit_data.clean()
+            self._transit_data._clean_after_remove()
 
     def clean(self):
         to_clean = []
@@ -323,6 +459,16 @@ class TripCollection(BaseGtfsObjectCollection):
             if len(trip.stop_times) == 0:
                 to_clean.append(trip)
 
+        if len(to_clean) > 0:
+            self._transit_data._changed("trips.txt")
         for trip in to_clean:
-            trip.route.trips.remove(trip)
+            self._remove_references(trip)
             del self._objects[trip.id]
+            trip._collection = None
+
+    def _remove_references(self, trip):
+        self._transit_data._touched(trip.route, trip.service, trip.shape)
+        trip.route.trips.remove(trip)
+        trip.service.trips.discard(trip)
+        if trip.shape is not None:
+            trip.shape.trips.discard(trip)
@@ -1,4 +1,59 @@
+from io import BytesIO
+from zipfile import ZipFile
+
+
 class UnknownFile(object):
-    def __init__(self, f):
-        # TODO: check if csv file
-        self.data = f.read()
+    def __init__(self, f=None, source_file=None, file_name=None):
+        """
+        Creates an unknown file with the content of f, or a lazy unknown file that reads the member file_name of the
+        zip file source_file only when its data is needed. The source file shouldn't be changed while it's referenced.
+
+        :type f: file | None
+        :type source_file: str | None
+        :type file_name: str | None
+        """
+
+        if f is not None:
+            # TODO: check if csv file
+            self._data = f.read()
+            self.source_file = None
+            self.file_name = None
+        else:
+            assert source_file is not None and file_name is not None
+            self._data = None
+            self.source_file = source_file
+            self.file_name = file_name
+
+    @property
+    def data(self):
+        """
+        :rtype: str
+        """
+
+        if self._data is None:
+            with ZipFile(self.source_file) as zip_file:
+                self._data = zip_file.read(self.file_name)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        """
+        :type value: str
+        """
+
+        self._data = value
+        self.source_file = None
+        self.file_name = None
+
+    def open(self):
+        """
+        Opens the content of the file for reading, streaming it from the source file if it wasn't read yet.
+
+        :rtype: file
+        """
+
+        if self._data is not None:
+            return BytesIO(self._data)
+
+        with ZipFile(self.source_file) as zip_file:
+            return zip_file.open(self.file_name)
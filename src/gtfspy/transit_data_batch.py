@@ -0,0 +1,152 @@
+from collections import Counter
+
+from gtfspy.data_objects import BaseRoute, BaseStop, BaseTrip, FareAttribute, Service, Shape
+
+# the collections that should be validated when a file changes: the file's own collection and the collections that
+# reference its objects
+VALIDATED_COLLECTIONS = {"agency.txt": ["agencies", "routes", "fare_attributes"],
+                         "routes.txt": ["routes", "trips", "fare_rules"],
+                         "shapes.txt": ["shapes", "trips"],
+                         "calendar.txt": ["calendar", "trips"],
+                         "calendar_dates.txt": ["calendar"],
+                         "trips.txt": ["trips"],
+                         "stop_times.txt": ["trips"],
+                         "stops.txt": ["stops", "trips"],
+                         "fare_attributes.txt": ["fare_attributes", "fare_rules"],
+                         "fare_rules.txt": ["fare_rules"]}
+
+
+class TransitDataBatch(object):
+    """
+    The changes made to a transit data object inside TransitData.batch.
+
+    The batch collects the GTFS files changed inside it and the objects that may have become unused by the removals
+    (e.g. the route, service and shape of a removed trip). When the batch ends, only these objects are cleaned (with the
+    same rules as TransitData.clean), the derived indexes of the changed files are invalidated once, and only the
+    collections affected by the changed files are validated.
+    """
+
+    def __init__(self, transit_data):
+        """
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        """
+
+        self._transit_data = transit_data
+        self._was_validated = transit_data.is_validated
+
+        self.changed_files = set()
+        self.touched_objects = set()
+
+    def touch(self, objects):
+        """
+        :type objects: collections.Iterable
+        """
+
+        self.touched_objects.update(obj for obj in objects if obj is not None)
+
+    def clean(self):
+        """
+        Removes the touched objects that became unused, and the objects that became unused by their removal.
+        """
+
+        td = self._transit_data
+
+        for trip in self._pop_touched(BaseTrip):
+            if _contains(td.trips, trip) and len(trip.stop_times) == 0:
+                td.trips.remove(trip, clean_after=False)
+
+        stops = self._pop_touched(BaseStop)
+        self._clean_stops(stops)
+        removed_stops = [stop for stop in stops + self._pop_touched(BaseStop) if not _contains(td.stops, stop)]
+
+        for shape in self._pop_touched(Shape):
+            if _contains(td.shapes, shape) and len(shape.trips) == 0:
+                td.shapes.remove(shape, clean_after=False)
+
+        for service in self._pop_touched(Service):
+            if _contains(td.calendar, service) and len(service.trips) == 0:
+                td.calendar.remove(service, clean_after=False)
+
+        removed_routes = set()
+        for route in self._pop_touched(BaseRoute):
+            if _contains(td.routes, route) and len(route.trips) == 0:
+                td.routes.remove(route, clean_after=False)
+            if not _contains(td.routes, route):
+                removed_routes.add(route)
+
+        for agency in {route.agency for route in removed_routes}:
+            if _contains(td.agencies, agency) and \
+                    next((route for line in agency.lines for route in line.routes), None) is None:
+                td.agencies.remove(agency, clean_after=False)
+
+        self._clean_fare_rules(removed_routes, removed_stops)
+
+        for fare_attribute in self._pop_touched(FareAttribute):
+            if _contains(td.fare_attributes, fare_attribute) and \
+                    len(td.fare_rules.get_by_fare_id(fare_attribute.id)) == 0:
+                td.fare_attributes.remove(fare_attribute, clean_after=False)
+
+        self.touched_objects.clear()
+
+    def _clean_stops(self, stops):
+        td = self._transit_data
+
+        # a stop without stop times is kept while it's the parent station of another stop
+        to_check = [stop for stop in stops if _contains(td.stops, stop) and len(stop.stop_times) == 0]
+        if len(to_check) == 0:
+            return
+
+        children_count = Counter(stop.parent_station.id for stop in td.stops if stop.parent_station is not None)
+        while len(to_check) > 0:
+            stop = to_check.pop()
+            if _contains(td.stops, stop) and len(stop.stop_times) == 0 and children_count[stop.id] == 0:
+                td.stops.remove(stop, clean_after=False)
+                if stop.parent_station is not None:
+                    children_count[stop.parent_station.id] -= 1
+                    to_check.append(stop.parent_station)
+
+    def _clean_fare_rules(self, removed_routes, removed_stops):
+        td = self._transit_data
+
+        fare_rules_to_clean = set()
+        for route in removed_routes:
+            fare_rules_to_clean.update(td.fare_rules.get_by_route(route))
+
+        # the fare rules of the removed stops' zones, by zone id
+        zones_fare_rules = {}
+        for zone_id in {stop.zone_id for stop in removed_stops if stop.zone_id is not None}:
+            zone_fare_rules = td.fare_rules.get_by_origin_id(zone_id) + \
+                              td.fare_rules.get_by_destination_id(zone_id) + \
+                              td.fare_rules.get_by_contains_id(zone_id)
+            if len(zone_fare_rules) > 0:
+                zones_fare_rules[zone_id] = zone_fare_rules
+        if len(zones_fare_rules) > 0:
+            zone_ids = {stop.zone_id for stop in td.stops}
+            for zone_id, zone_fare_rules in zones_fare_rules.iteritems():
+                if zone_id not in zone_ids:
+                    fare_rules_to_clean.update(zone_fare_rules)
+
+        for fare_rule in fare_rules_to_clean:
+            td.fare_rules.remove(fare_rule, clean_after=False)
+
+    def validate(self):
+        td = self._transit_data
+
+        if None in self.changed_files or not self._was_validated:
+            td.validate(force=True)
+            return
+
+        collections_names = {collection_name for file_name in self.changed_files
+                             for collection_name in VALIDATED_COLLECTIONS.get(file_name, [])}
+        for collection_name in collections_names:
+            getattr(td, collection_name).validate()
+        td.is_validated = True
+
+    def _pop_touched(self, objects_type):
+        objects = [obj for obj in self.touched_objects if isinstance(obj, objects_type)]
+        self.touched_objects.difference_update(objects)
+        return objects
+
+
+def _contains(collection, obj):
+    return collection._objects.get(obj.id) is obj
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+import gtfspy
+from gtfspy import transit_data_snapshot
+from gtfspy.transit_data_filter import TransitDataFilter
+
+CACHE_FILE_SUFFIX = ".snapshot"
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class TransitDataCache(object):
+    """
+    An on-disk cache of parsed GTFS files, stored as snapshot files.
+
+    Every entry is keyed by the content of the GTFS zip file, the partial loading spec and the library and snapshot
+    versions, so a changed feed or a different spec never hits a stale entry. Entries older than max_age (seconds or
+    timedelta, counted from the time they were written) are evicted, and then the least recently used entries are
+    evicted until the total size of the cache is at most max_size bytes.
+    """
+
+    def __init__(self, cache_dir, max_size=None, max_age=None):
+        """
+        :type cache_dir: str
+        :type max_size: int | None
+        :type max_age: timedelta | int | float | None
+        """
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age.total_seconds() if isinstance(max_age, timedelta) else max_age
+
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(self, gtfs_file, partial=None, rows_filter=None):
+        """
+        :type gtfs_file: str | file
+        :type partial: dict[int, list[str]] | dict[int, None] | None
+        :param rows_filter: the filter of the load (instead of partial)
+        :type rows_filter: TransitDataFilter | None
+        :rtype: str
+        """
+
+        if rows_filter is None:
+            rows_filter = TransitDataFilter(partial=partial)
+
+        hasher = hashlib.sha1()
+        hasher.update("%s\0%d\0" % (gtfspy.__version__, transit_data_snapshot.SNAPSHOT_VERSION))
+        hasher.update(rows_filter.get_key())
+        hasher.update("\0")
+
+        if isinstance(gtfs_file, str):
+            with open(gtfs_file, "rb") as f:
+                _update_hash(hasher, f)
+        else:
+            position = gtfs_file.tell()
+            _update_hash(hasher, gtfs_file)
+            gtfs_file.seek(position)
+
+        return hasher.hexdigest()
+
+    def load(self, transit_data, key, validate=True):
+        """
+        Loads the cache entry into the transit data object, if exists.
+
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type key: str
+        :type validate: bool
+        :return: whether the entry was found in the cache
+        :rtype: bool
+        """
+
+        file_path = self._get_file_path(key)
+        if not os.path.exists(file_path) or self._is_expired(file_path, time.time()):
+            self.misses += 1
+            return False
+
+        transit_data.load_snapshot(file_path, validate=validate)
+        os.utime(file_path, (time.time(), os.path.getmtime(file_path)))
+        self.hits += 1
+        return True
+
+    def store(self, transit_data, key):
+        """
+        :type transit_data: gtfspy.transit_data_object.TransitData
+        :type key: str
+        """
+
+        fd, temp_file_path = tempfile.mkstemp(suffix=CACHE_FILE_SUFFIX + ".tmp", dir=self.cache_dir)
+        os.close(fd)
+        try:
+            transit_data.save_snapshot(temp_file_path, validate=False)
+            os.rename(temp_file_path, self._get_file_path(key))
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the expired entries, and then the least recently used entries until the cache fits its maximum size.
+        """
+
+        now = time.time()
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(CACHE_FILE_SUFFIX):
+                continue
+
+            file_path = os.path.join(self.cache_dir, file_name)
+            if self._is_expired(file_path, now):
+                os.remove(file_path)
+            else:
+                stat = os.stat(file_path)
+                entries.append((stat.st_atime, stat.st_size, file_path))
+
+        if self.max_size is not None:
+            total_size = sum(size for _, size, _ in entries)
+            entries.sort()
+            while total_size > self.max_size and len(entries) > 0:
+                _, size, file_path = entries.pop(0)
+                os.remove(file_path)
+                total_size -= size
+
+    def clear(self):
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(CACHE_FILE_SUFFIX):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def _get_file_path(self, key):
+        return os.path.join(self.cache_dir, key + CACHE_FILE_SUFFIX)
+
+    def _is_expired(self, file_path, now):
+        return self.max_age is not None and now - os.path.getmtime(file_path) > self.max_age
+
+
+def _update_hash(hasher, f):
+    data = f.read(_HASH_CHUNK_SIZE)
+    while data:
+        hasher.update(data)
+        data = f.read(_HASH_CHUNK_SIZE)
@@ -0,0 +1,372 @@
+from datetime import datetime
+
+from gtfspy.data_objects import Service
+from gtfspy.utils.geo import get_bounding_box, is_in_bounding_box, is_in_polygon
+from gtfspy.utils.time import parse_time_seconds
+from gtfspy.utils.validating import not_none_or_empty
+
+
+class TransitDataFilter(object):
+    """
+    Selects the rows of the GTFS files that a filtered load keeps, by their raw CSV fields.
+
+    The files are filtered in the order they are loaded, and the ids kept from each file are collected up front to
+    filter the files that reference it, so no object (or exception) is created for a rejected row. Files that are
+    referenced by files loaded after them (shapes, calendar and stops by the trips and stop times, fare attributes by
+    the fare rules) are filtered only after the rows that reference them were selected.
+
+    The rows can be filtered by a partial spec (agencies and lines), a date range (services that have no active day in
+    it and their trips are dropped), a time range (trips that have no stop time in it are dropped) and an area, given as
+    a bounding box or a polygon (trips that have no stop in it are dropped). When trips are dropped by the date range,
+    the time range or the area, the result is the same as loading the selected lines and cleaning them: the trips
+    without stop times are dropped, and so are the routes and agencies left without trips. The time range is compared
+    with the stop times' arrival and departure times as they are written in the file, i.e. relative to the service day
+    and possibly passing 24:00:00.
+    """
+
+    def __init__(self, partial=None, date_range=None, time_range=None, bounding_box=None, polygon=None,
+                 clip_stop_times=False):
+        """
+        :type partial: dict[int, list[str]] | dict[int, None] | None
+        :param date_range: the first and last dates of the loaded service (inclusive)
+        :type date_range: (date, date) | None
+        :param time_range: the first and last times of the loaded trips (inclusive), as GTFS times, seconds or timedelta
+        :type time_range: (str | int | timedelta, str | int | timedelta) | None
+        :param bounding_box: the minimum latitude, minimum longitude, maximum latitude and maximum longitude of the area
+        :type bounding_box: (float, float, float, float) | None
+        :param polygon: the (latitude, longitude) vertices of the area
+        :type polygon: list[(float, float)] | None
+        :param clip_stop_times: keep only the stop times of the trips' stops in the area
+        :type clip_stop_times: bool
+        """
+
+        if date_range is not None:
+            assert date_range[0] <= date_range[1]
+        if time_range is not None:
+            time_range = (parse_time_seconds(time_range[0]), parse_time_seconds(time_range[1]))
+            assert time_range[0] <= time_range[1]
+
+        if polygon is not None:
+            assert len(polygon) >= 3
+            polygon = [(float(lat), float(lon)) for lat, lon in polygon]
+        if bounding_box is not None:
+            bounding_box = tuple(float(value) for value in bounding_box)
+            assert len(bounding_box) == 4
+        assert not clip_stop_times or bounding_box is not None or polygon is not None
+
+        self.partial = partial
+        self.date_range = date_range
+        self.time_range = time_range
+        self.bounding_box = bounding_box
+        self.polygon = polygon
+        self.clip_stop_times = clip_stop_times
+
+        self.agency_ids = set()
+        self.active_service_ids = None
+        self.area_stop_ids = None
+        self.route_ids = set()
+        self.trip_ids = set()
+        self.service_ids = set()
+        self.shape_ids = set()
+        self.stop_ids = set()
+        self.zone_ids = set()
+        self.fare_ids = set()
+
+    def filter_agencies(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        result = []
+        for row in rows:
+            agency_id = int(row["agency_id"])
+            if self.partial is None or agency_id in self.partial:
+                self.agency_ids.add(agency_id)
+                result.append(row)
+        return result
+
+    def filter_routes(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        result = []
+        for row in rows:
+            agency_id = int(row["agency_id"])
+            if agency_id in self.agency_ids:
+                line_numbers = None if self.partial is None else self.partial[agency_id]
+                if line_numbers is None or row["route_short_name"] in line_numbers:
+                    self.route_ids.add(row["route_id"])
+                    result.append(row)
+        return result
+
+    def filter_active_services(self, rows, calendar_dates_rows=()):
+        """
+        Collects the ids of the services that are active in the date range, with the exceptions of calendar_dates.txt
+        (so a service that is added on a date in the range is active, and a service that is removed on all its dates in
+        the range isn't). Should be called before filter_trips, but the calendar itself is loaded with filter_calendar,
+        after the trips were selected.
+
+        :type rows: collections.Iterable[dict]
+        :type calendar_dates_rows: collections.Iterable[dict]
+        """
+
+        if self.date_range is None:
+            return
+
+        calendar_dates = {}
+        for row in calendar_dates_rows:
+            calendar_dates.setdefault(int(row["service_id"]), []).append(row)
+        self.active_service_ids = {int(row["service_id"]) for row in rows
+                                   if self._is_service_active(row, calendar_dates.get(int(row["service_id"]), ()))}
+
+    def filter_trips(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        active_service_ids = self.active_service_ids
+        result = []
+        for row in rows:
+            if row["route_id"] in self.route_ids and \
+                    (active_service_ids is None or int(row["service_id"]) in active_service_ids):
+                self.trip_ids.add(row["trip_id"])
+                result.append(row)
+        return result
+
+    def filter_area_stops(self, rows):
+        """
+        Collects the ids of the stops in the area. Should be called before filter_stop_times, but the stops themselves
+        are loaded with filter_stops, after the stop times were selected.
+
+        :type rows: collections.Iterable[dict]
+        """
+
+        if self.bounding_box is None and self.polygon is None:
+            return
+
+        bounding_box = self.bounding_box
+        if self.polygon is not None:
+            polygon_bounding_box = get_bounding_box(self.polygon)
+            bounding_box = polygon_bounding_box if bounding_box is None else \
+                (max(bounding_box[0], polygon_bounding_box[0]), max(bounding_box[1], polygon_bounding_box[1]),
+                 min(bounding_box[2], polygon_bounding_box[2]), min(bounding_box[3], polygon_bounding_box[3]))
+
+        self.area_stop_ids = set()
+        for row in rows:
+            lat = float(row["stop_lat"])
+            lon = float(row["stop_lon"])
+            if is_in_bounding_box(lat, lon, bounding_box) and \
+                    (self.polygon is None or is_in_polygon(lat, lon, self.polygon)):
+                self.area_stop_ids.add(int(row["stop_id"]))
+
+    def filter_stop_times(self, rows):
+        """
+        Selects the stop times of the selected trips. When the filter drops trips, the trips that have no stop times
+        (or, with a time range or an area, no stop time in them) are dropped from the selected trips with all their stop
+        times, so filter_trips_by_stop_times should be called before the trips are loaded.
+
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        trip_ids = self.trip_ids
+        result = [row for row in rows if row["trip_id"] in trip_ids]
+        if self.drops_trips:
+            self.trip_ids = {row["trip_id"] for row in result}
+
+        if self.time_range is not None:
+            self.trip_ids = {row["trip_id"] for row in result if self._is_in_time_range(row)}
+            trip_ids = self.trip_ids
+            result = [row for row in result if row["trip_id"] in trip_ids]
+
+        if self.area_stop_ids is not None:
+            area_stop_ids = self.area_stop_ids
+            area_rows = [row for row in result if int(row["stop_id"]) in area_stop_ids]
+            self.trip_ids = {row["trip_id"] for row in area_rows}
+            trip_ids = self.trip_ids
+            result = area_rows if self.clip_stop_times else [row for row in result if row["trip_id"] in trip_ids]
+
+        self.stop_ids.update(int(row["stop_id"]) for row in result)
+        return result
+
+    def filter_trips_by_stop_times(self, trips_rows):
+        """
+        Selects the trips that are still selected after filter_stop_times, and collects their services and shapes.
+        When the filter drops trips, also drops the selected routes that are left without trips.
+
+        :type trips_rows: list[dict]
+        :rtype: list[dict]
+        """
+
+        trip_ids = self.trip_ids
+        route_ids = set()
+        result = []
+        for row in trips_rows:
+            if row["trip_id"] in trip_ids:
+                route_ids.add(row["route_id"])
+                self.service_ids.add(int(row["service_id"]))
+                if not_none_or_empty(row.get("shape_id")):
+                    self.shape_ids.add(int(row["shape_id"]))
+                result.append(row)
+
+        if self.drops_trips:
+            self.route_ids = route_ids
+        return result
+
+    def filter_used_routes(self, routes_rows):
+        """
+        Selects the routes that are still selected after filter_trips_by_stop_times. When the filter drops trips, also
+        drops the selected agencies that are left without routes.
+
+        :type routes_rows: list[dict]
+        :rtype: list[dict]
+        """
+
+        route_ids = self.route_ids
+        result = [row for row in routes_rows if row["route_id"] in route_ids]
+        if self.drops_trips:
+            self.agency_ids = {int(row["agency_id"]) for row in result}
+        return result
+
+    def filter_used_agencies(self, agencies_rows):
+        """
+        Selects the agencies that are still selected after filter_used_routes.
+
+        :type agencies_rows: list[dict]
+        :rtype: list[dict]
+        """
+
+        agency_ids = self.agency_ids
+        return [row for row in agencies_rows if int(row["agency_id"]) in agency_ids]
+
+    def filter_shapes(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: collections.Iterable[dict]
+        """
+
+        shape_ids = self.shape_ids
+        return (row for row in rows if int(row["shape_id"]) in shape_ids)
+
+    def filter_calendar(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: collections.Iterable[dict]
+        """
+
+        service_ids = self.service_ids
+        return (row for row in rows if int(row["service_id"]) in service_ids)
+
+    def filter_stops(self, rows):
+        """
+        Selects the stops of the selected stop times and their parent stations.
+
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        rows = list(rows)
+        parents = {int(row["stop_id"]): int(row["parent_station"]) for row in rows
+                   if not_none_or_empty(row.get("parent_station"))}
+
+        stop_ids = self.stop_ids
+        for stop_id in list(stop_ids):
+            while stop_id in parents and parents[stop_id] not in stop_ids:
+                stop_id = parents[stop_id]
+                stop_ids.add(stop_id)
+
+        result = []
+        for row in rows:
+            if int(row["stop_id"]) in stop_ids:
+                if not_none_or_empty(row.get("zone_id")):
+                    self.zone_ids.add(int(row["zone_id"]))
+                result.append(row)
+        return result
+
+    def filter_fare_attributes(self, rows):
+        """
+        Selects the fare attributes of the selected agencies. They should be filtered again by filter_unused_fares after
+        the fare rules are filtered.
+
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        result = []
+        for row in rows:
+            if not not_none_or_empty(row.get("agency_id")) or int(row["agency_id"]) in self.agency_ids:
+                self.fare_ids.add(row["fare_id"])
+                result.append(row)
+        return result
+
+    def filter_fare_rules(self, rows):
+        """
+        :type rows: collections.Iterable[dict]
+        :rtype: list[dict]
+        """
+
+        result = []
+        for row in rows:
+            if row["fare_id"] in self.fare_ids and \
+                    (not not_none_or_empty(row.get("route_id")) or row["route_id"] in self.route_ids) and \
+                    self._in_zones(row.get("origin_id")) and \
+                    self._in_zones(row.get("destination_id")) and \
+                    self._in_zones(row.get("contains_id")):
+                result.append(row)
+
+        self.fare_ids = {row["fare_id"] for row in result}
+        return result
+
+    def filter_unused_fares(self, fare_attributes_rows):
+        """
+        :type fare_attributes_rows: collections.Iterable[dict]
+        :rtype: collections.Iterable[dict]
+        """
+
+        fare_ids = self.fare_ids
+        return (row for row in fare_attributes_rows if row["fare_id"] in fare_ids)
+
+    @property
+    def drops_trips(self):
+        """
+        Whether the filter drops trips of the selected lines (by the date range, the time range or the area).
+
+        :rtype: bool
+        """
+
+        return self.date_range is not None or self.time_range is not None or self.bounding_box is not None or \
+               self.polygon is not None
+
+    def get_key(self):
+        """
+        :return: a canonical representation of the filter, to key the loaded data by
+        :rtype: str
+        """
+
+        partial = None
+        if self.partial is not None:
+            partial = sorted((agency_id, None if line_numbers is None else sorted(line_numbers))
+                             for agency_id, line_numbers in self.partial.iteritems())
+        return repr((partial, self.date_range, self.time_range, self.bounding_box, self.polygon, self.clip_stop_times))
+
+    def _is_service_active(self, row, calendar_dates_rows):
+        service = Service(**row)
+        for calendar_date_row in calendar_dates_rows:
+            service._set_calendar_date(datetime.strptime(calendar_date_row["date"], "%Y%m%d").date(),
+                                       int(calendar_date_row["exception_type"]) == 1)
+        return service.count_active_days(self.date_range[0], self.date_range[1]) > 0
+
+    def _is_in_time_range(self, stop_time_row):
+        from_time, to_time = self.time_range
+        for field in ("arrival_time", "departure_time"):
+            if not_none_or_empty(stop_time_row.get(field)) and \
+                    from_time <= parse_time_seconds(stop_time_row[field]) <= to_time:
+                return True
+        return False
+
+    def _in_zones(self, zone_id):
+        return not not_none_or_empty(zone_id) or int(zone_id) in self.zone_ids
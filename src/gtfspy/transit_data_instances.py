@@ -0,0 +1,187 @@
+from binascii import unhexlify
+from datetime import date
+
+import numpy as np
+
+from gtfspy.utils.time import SECONDS_IN_DAY
+
+TRIP_INSTANCE_DTYPE = np.dtype([("trip_index", np.int32),
+                                ("service_date", "datetime64[D]")])
+STOP_EVENT_DTYPE = np.dtype([("instance_index", np.int32),
+                             ("trip_index", np.int32),
+                             ("service_date", "datetime64[D]"),
+                             ("stop_index", np.int32),
+                             ("stop_sequence", np.int32),
+                             ("arrival_local_seconds", np.int64),
+                             ("departure_local_seconds", np.int64)])
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class TripInstances(object):
+    """
+    The dated instances of the trips of a transit data object in a date range, as NumPy structured arrays.
+
+    instances has a row for every trip and service date it runs on (TRIP_INSTANCE_DTYPE), ordered by the service date
+    and then by the trip. stop_events has a row for every stop time of every instance (STOP_EVENT_DTYPE), ordered by
+    the instance and then by the stop sequence. The trip and stop indexes refer to the trips and stops lists. The
+    arrival and departure local seconds are the agency's local (wall clock) times, counted in seconds since 1970-01-01
+    00:00:00 of the same local time. They aren't absolute (UTC) epoch seconds, since no time zone conversion is made, as
+    with the datetimes of Trip.get_trip_calendar.
+    """
+
+    def __init__(self, trips, stops, instances, stop_events):
+        """
+        :type trips: list[gtfspy.data_objects.Trip]
+        :type stops: list[gtfspy.data_objects.Stop]
+        :type instances: np.ndarray
+        :type stop_events: np.ndarray
+        """
+
+        self.trips = trips
+        self.stops = stops
+        self.instances = instances
+        self.stop_events = stop_events
+
+    def __len__(self):
+        return len(self.instances)
+
+
+def materialize_instances(transit_data, start_date, end_date):
+    """
+    Expands every trip into its dated instances between start_date and end_date (inclusive).
+
+    The services' compiled calendars are unpacked into a services by days matrix of active days, the stop times are read
+    into columns (directly from the columnar stop times table when there is one), and the instances and their stop
+    events are built from them with vectorised operations, so there is no Python loop over trips, days and stop times.
+
+    :type transit_data: gtfspy.transit_data_object.TransitData
+    :type start_date: date
+    :type end_date: date
+    :rtype: TripInstances
+    """
+
+    assert start_date <= end_date
+
+    trips = list(transit_data.trips)
+    stops, stop_index, stop_sequence, arrival_time, departure_time, counts = _get_stop_times_columns(transit_data,
+                                                                                                    trips)
+
+    services = list({trip.service for trip in trips})
+    services_indices = {service: i for i, service in enumerate(services)}
+    days_count = (end_date - start_date).days + 1
+    active_days = np.zeros((len(services), days_count), dtype=np.bool_)
+    for i, service in enumerate(services):
+        active_days[i] = _get_active_days_array(service, start_date, end_date)
+
+    trips_services = np.fromiter((services_indices[trip.service] for trip in trips), dtype=np.intp, count=len(trips))
+    # the transposed matrix orders the instances by the service date and then by the trip
+    days_indices, trips_indices = np.nonzero(active_days[trips_services].T)
+
+    first_day = np.datetime64(start_date, "D")
+    instances = np.empty(len(trips_indices), dtype=TRIP_INSTANCE_DTYPE)
+    instances["trip_index"] = trips_indices
+    instances["service_date"] = first_day + days_indices
+
+    # every instance repeats the stop times columns' slice of its trip
+    trips_offsets = np.zeros(len(trips), dtype=np.intp)
+    np.cumsum(counts[:-1], out=trips_offsets[1:])
+    instances_counts = counts[trips_indices]
+    instances_offsets = np.zeros(len(instances_counts), dtype=np.intp)
+    np.cumsum(instances_counts[:-1], out=instances_offsets[1:])
+
+    events_instances = np.repeat(np.arange(len(instances_counts), dtype=np.intp), instances_counts)
+    events_rows = np.repeat(trips_offsets[trips_indices] - instances_offsets, instances_counts) + \
+                  np.arange(len(events_instances), dtype=np.intp)
+    days_seconds = (np.arange(days_count, dtype=np.int64) + (start_date.toordinal() - _EPOCH_ORDINAL)) * SECONDS_IN_DAY
+    events_days_seconds = np.repeat(days_seconds[days_indices], instances_counts)
+
+    stop_events = np.empty(len(events_instances), dtype=STOP_EVENT_DTYPE)
+    stop_events["instance_index"] = events_instances
+    stop_events["trip_index"] = np.repeat(trips_indices, instances_counts)
+    stop_events["service_date"] = np.repeat(instances["service_date"], instances_counts)
+    stop_events["stop_index"] = stop_index[events_rows]
+    stop_events["stop_sequence"] = stop_sequence[events_rows]
+    stop_events["arrival_local_seconds"] = events_days_seconds + arrival_time[events_rows]
+    stop_events["departure_local_seconds"] = events_days_seconds + departure_time[events_rows]
+
+    return TripInstances(trips, stops, instances, stop_events)
+
+
+def _get_stop_times_columns(transit_data, trips):
+    """
+    :return: the stops, the stop times' stop index, stop sequence, arrival time and departure time columns (ordered by
+    the trip and then by the stop sequence) and the number of stop times of every trip
+    :rtype: (list[gtfspy.data_objects.Stop], np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray)
+    """
+
+    counts = np.fromiter((len(trip.stop_times) for trip in trips), dtype=np.intp, count=len(trips))
+
+    table = transit_data.stop_times_table
+    if table is not None:
+        # the table's columns are viewed without copying, and only the rows of the trips are gathered from them
+        rows = np.concatenate([_view_column(trip.stop_times._rows) for trip in trips] +
+                              [np.empty(0, dtype=np.intc)]).astype(np.intp)
+        # the table may still index removed stops until it's compacted, so only the stops of the rows are kept
+        stops_indices, stop_index = np.unique(_view_column(table.stop_index)[rows], return_inverse=True)
+        return ([table._stops[i] for i in stops_indices], stop_index, _view_column(table.stop_sequence)[rows],
+                _view_column(table.arrival_time)[rows], _view_column(table.departure_time)[rows], counts)
+
+    stops = []
+    stops_indices = {}
+    total_count = int(counts.sum())
+    stop_index = np.empty(total_count, dtype=np.int32)
+    stop_sequence = np.empty(total_count, dtype=np.int32)
+    arrival_time = np.empty(total_count, dtype=np.int32)
+    departure_time = np.empty(total_count, dtype=np.int32)
+
+    row = 0
+    for trip in trips:
+        for stop_time in trip.stop_times:
+            index = stops_indices.get(stop_time.stop)
+            if index is None:
+                index = len(stops)
+                stops.append(stop_time.stop)
+                stops_indices[stop_time.stop] = index
+            stop_index[row] = index
+            stop_sequence[row] = stop_time.stop_sequence
+            arrival_time[row] = stop_time.arrival_seconds
+            departure_time[row] = stop_time.departure_seconds
+            row += 1
+
+    return stops, stop_index, stop_sequence, arrival_time, departure_time, counts
+
+
+def _view_column(column):
+    """
+    :type column: array.array
+    :rtype: np.ndarray
+    """
+
+    if len(column) == 0:
+        return np.empty(0, dtype=np.intc)
+    return np.frombuffer(column, dtype=np.intc)
+
+
+def _get_active_days_array(service, start_date, end_date):
+    """
+    Unpacks the service's compiled calendar into an array of its active days between start_date and end_date.
+
+    :type service: gtfspy.data_objects.Service
+    :type start_date: date
+    :type end_date: date
+    :rtype: np.ndarray
+    """
+
+    days_count = (end_date - start_date).days + 1
+    first_ordinal, active_days = service._get_active_days_in_range(start_date, end_date)
+    offset = start_date.toordinal() - first_ordinal
+    active_days = active_days >> offset if offset >= 0 else active_days << -offset
+
+    result = np.zeros(days_count, dtype=np.bool_)
+    if active_days != 0:
+        hex_string = "%x" % (active_days,)
+        # the bytes are big endian, so the unpacked bits are reversed to put the first day first
+        bits = np.unpackbits(np.frombuffer(unhexlify("0" * (len(hex_string) % 2) + hex_string), dtype=np.uint8))[::-1]
+        result[:min(len(bits), days_count)] = bits[:days_count]
+    return result
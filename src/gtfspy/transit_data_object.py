@@ -1,14 +1,49 @@
+import csv
 import os
 import shutil
 import tempfile
 import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from cStringIO import StringIO
 from zipfile import ZipFile
 
+from gtfspy import transit_data_snapshot
 from gtfspy.data_objects import *
+from gtfspy.transit_data_batch import TransitDataBatch
+from gtfspy.transit_data_cache import TransitDataCache
+from gtfspy.transit_data_filter import TransitDataFilter
+from gtfspy.utils.csv_readers import ZipCsvReader, ParallelZipCsvReader
+from gtfspy.utils.csv_schema import CsvSchema
+from gtfspy.utils.zip_writer import DEFAULT_BUFFER_SIZE, ZipMemberWriter, copy_zip_member
+
+_COLLECTIONS_NAMES = ["agencies", "routes", "shapes", "calendar", "trips", "stops", "fare_attributes", "fare_rules"]
+
+KNOWN_FILES = ["agency.txt", "routes.txt", "shapes.txt", "calendar.txt", "trips.txt", "stops.txt", "stop_times.txt",
+               "translations.txt", "fare_attributes.txt", "fare_rules.txt"]
 
 
 class TransitData(object):
-    def __init__(self, gtfs_file=None, validate=True):
+    def __init__(self, gtfs_file=None, validate=True, columnar_stop_times=False, integer_times=False,
+                 compact_objects=False):
+        """
+        :type gtfs_file: str | file | None
+        :type validate: bool
+        :type columnar_stop_times: bool
+        :param integer_times: keep the stop times' arrival and departure times as seconds since the service day
+        midnight (int) instead of timedelta objects
+        :type integer_times: bool
+        :param compact_objects: create the compact (slots based) variants of the trips, stop times, stops, shape points
+        and routes
+        :type compact_objects: bool
+        """
+
+        self.integer_times = integer_times
+        self.compact_objects = compact_objects
+        self.stop_times_table = StopTimeTable(self) if columnar_stop_times else None
+        self._stop_times_csv_schema = CsvSchema(["trip_id", "arrival_time", "departure_time", "stop_id",
+                                                 "stop_sequence"])
+
         self.agencies = AgencyCollection(self)
         self.routes = RouteCollection(self)
         self.shapes = ShapeCollection(self)
@@ -26,163 +61,529 @@ class TransitData(object):
         self.has_changed = False
         self.is_validated = True
 
+        self._source_file = None
+        self._source_file_stat = None
+        self._changed_files = set()
+
+        self._batch = None
+        self._derived_indexes = []
+
         if gtfs_file is not None:
             self.load_gtfs_file(gtfs_file, validate=validate)
 
-    def _changed(self):
+    def _changed(self, file_name=None):
+        """
+        :param file_name: the GTFS file affected by the change, None if it may affect any of them
+        :type file_name: str | None
+        """
+
         self.has_changed = True
         self.is_validated = False
 
-    def load_gtfs_file(self, gtfs_file, validate=True, partial=None):
+        if file_name is None:
+            self._source_file = None
+        else:
+            self._changed_files.add(file_name)
+
+        if self._batch is not None:
+            self._batch.changed_files.add(file_name)
+        else:
+            self._invalidate_derived_indexes({file_name})
+
+    def _touched(self, *objects):
+        """
+        Reports objects that may have become unused by a removal, so the current batch will clean them when it ends.
+        """
+
+        if self._batch is not None:
+            self._batch.touch(objects)
+
+    def _clean_after_remove(self):
+        # inside a batch the touched objects are cleaned once, when it ends
+        if self._batch is None:
+            self.clean()
+
+    def _register_derived_index(self, file_names, invalidate):
+        """
+        Registers an index derived from the data of some GTFS files, to be invalidated whenever any of them changes.
+
+        :type file_names: collections.Iterable[str]
+        :type invalidate: () -> None
+        """
+
+        self._derived_indexes.append((frozenset(file_names), invalidate))
+
+    def _invalidate_derived_indexes(self, file_names):
+        """
+        :param file_names: the changed GTFS files, may contain None if any of them may have changed
+        :type file_names: set[str | None]
+        """
+
+        for index_file_names, invalidate in self._derived_indexes:
+            if None in file_names or not index_file_names.isdisjoint(file_names):
+                invalidate()
+
+    @contextmanager
+    def batch(self, clean=True, validate=False):
+        """
+        Defers the consequences of the changes made inside the with block to its end.
+
+        Inside a batch the removals don't clean the transit data (regardless of clean_after), and the derived indexes
+        aren't invalidated. When the batch ends, only the objects that may have become unused by the removals are
+        cleaned (with the same rules as clean), the derived indexes of the changed files are invalidated once and, if
+        validate is set, only the collections affected by the changed files are validated. Nested batches are part of
+        the outermost one.
+
+        :type clean: bool
+        :type validate: bool
+        :rtype: TransitDataBatch
+        """
+
+        if self._batch is not None:
+            yield self._batch
+            return
+
+        batch = self._batch = TransitDataBatch(self)
+        try:
+            yield batch
+            if clean:
+                batch.clean()
+        finally:
+            self._batch = None
+            self._invalidate_derived_indexes(batch.changed_files)
+
+        if validate:
+            batch.validate()
+
+    def mark_changed(self, *file_names):
+        """
+        Marks GTFS files as changed, so save won't copy them from the source file.
+
+        The collections report the objects added to and removed from them, and the objects report the changes made
+        through their setters and attributes to the transit data of the collection that owns them, so this is only
+        needed for changes that bypass both (e.g. adding a point directly to a shape's sorted points). Without file
+        names all the files are marked as changed.
+
+        :type file_names: str
+        """
+
+        if len(file_names) == 0:
+            self._changed()
+        for file_name in file_names:
+            self._changed(file_name)
+
+    def _copy_objects(self, source):
+        """
+        Copies the objects of another transit data into this transit data, which should have none of them.
+
+        :type source: TransitData
+        """
+
+        for agency in source.agencies:
+            self.agencies.add_object(agency)
+        for service in source.calendar:
+            self.calendar.add_object(service)
+        for shape in source.shapes:
+            self.shapes.add_object(shape)
+
+        for stop in source.stops:
+            self._copy_stop(stop)
+
+        route_class = CompactRoute if self.compact_objects else Route
+        for route in source.routes:
+            self.routes._add(route._copy(self, route_class))
+
+        trip_class = CompactTrip if self.compact_objects else Trip
+        for trip in source.trips:
+            self.trips._add(trip._copy(self, trip_class))
+            for stop_time in trip.stop_times:
+                self._adopt_stop_time(stop_time)
+
+        for fare_attribute in source.fare_attributes:
+            self.fare_attributes.add_object(fare_attribute)
+        for fare_rule in source.fare_rules:
+            self.fare_rules.add_object(fare_rule)
+
+    def _copy_stop(self, stop):
+        """
+        Copies a stop of another transit data, and its parent stations that aren't in this transit data yet.
+
+        :type stop: Stop
+        :return: the stops that were copied, parents first
+        :rtype: list[Stop]
+        """
+
+        stops_to_copy = [stop]
+        while stops_to_copy[-1].parent_station is not None and \
+                stops_to_copy[-1].parent_station.id not in self.stops._objects:
+            stops_to_copy.append(stops_to_copy[-1].parent_station)
+
+        stop_class = CompactStop if self.compact_objects else Stop
+        copied_stops = []
+        for stop_to_copy in reversed(stops_to_copy):
+            if stop_to_copy.id not in self.stops._objects:
+                copied_stops.append(self.stops._add(stop_to_copy._copy(self, stop_class)))
+        return copied_stops
+
+    def _set_source_file(self, gtfs_file):
+        """
+        :type gtfs_file: str | file
+        """
+
+        if isinstance(gtfs_file, str):
+            self._source_file = gtfs_file
+            self._source_file_stat = _get_file_stat(gtfs_file)
+            self._changed_files = set()
+
+    def _open_source_file(self):
+        """
+        :rtype: ZipFile | None
+        """
+
+        if self._source_file is None or not os.path.exists(self._source_file) or \
+                _get_file_stat(self._source_file) != self._source_file_stat:
+            return None
+
+        return ZipFile(self._source_file)
+
+    def load_gtfs_file(self, gtfs_file, validate=True, partial=None, workers=None, cache=None, date_range=None,
+                       time_range=None, bounding_box=None, polygon=None, clip_stop_times=False):
+        """
+        :type gtfs_file: str | file
+        :type validate: bool
+        :type partial: dict[int, list[str]] | dict[int, None] | None
+        :type workers: int | None
+        :type cache: str | TransitDataCache | None
+        :param date_range: load only the services that are active on a day in the range (first and last dates,
+        inclusive), and their trips, stop times, shapes and stops
+        :type date_range: (date, date) | None
+        :param time_range: load only the trips that have a stop time in the range (first and last service day times,
+        inclusive), and their stop times, shapes and stops
+        :type time_range: (str | int | timedelta, str | int | timedelta) | None
+        :param bounding_box: load only the trips that have a stop in the box (minimum latitude, minimum longitude,
+        maximum latitude and maximum longitude), and their routes, agencies, stop times, shapes and stops
+        :type bounding_box: (float, float, float, float) | None
+        :param polygon: load only the trips that have a stop in the polygon ((latitude, longitude) vertices), and their
+        routes, agencies, stop times, shapes and stops
+        :type polygon: list[(float, float)] | None
+        :param clip_stop_times: load only the stop times of the stops in the bounding box or polygon
+        :type clip_stop_times: bool
+        """
+
         assert not self.has_changed
 
+        rows_filter = None
+        if partial is not None or date_range is not None or time_range is not None or bounding_box is not None or \
+                polygon is not None:
+            rows_filter = TransitDataFilter(partial=partial, date_range=date_range, time_range=time_range,
+                                            bounding_box=bounding_box, polygon=polygon, clip_stop_times=clip_stop_times)
+
+        if cache is not None:
+            if not isinstance(cache, TransitDataCache):
+                cache = TransitDataCache(cache)
+            cache_key = cache.get_key(gtfs_file, rows_filter=rows_filter)
+            if cache.load(self, cache_key, validate=validate):
+                if rows_filter is None:
+                    self._set_source_file(gtfs_file)
+                return
+
         with ZipFile(gtfs_file) as zip_file:
             zip_files_list = zip_file.namelist()
 
-            with zip_file.open("agency.txt", "r") as agency_file:
-                if partial is None:
-                    self.agencies._load_file(agency_file)
-                else:
-                    self.agencies._load_file(agency_file, filter=lambda agency: agency.id in partial)
-
-            with zip_file.open("routes.txt", "r") as routes_file:
-                if partial is None:
-                    self.routes._load_file(routes_file)
-                else:
-                    self.routes._load_file(routes_file,
-                                           ignore_errors=True,
-                                           filter=lambda route: partial[route.agency.id] is None or
-                                                                route.line.line_number in partial[route.agency.id])
-                    for agency in self.agencies:
-                        agency.lines.clean()
-
-            with zip_file.open("shapes.txt", "r") as shapes_file:
-                self.shapes._load_file(shapes_file, ignore_errors=partial is not None)
-
-            with zip_file.open("calendar.txt", "r") as calendar_file:
-                self.calendar._load_file(calendar_file, ignore_errors=partial is not None)
-
-            with zip_file.open("trips.txt", "r") as trips_file:
-                self.trips._load_file(trips_file, ignore_errors=partial is not None)
-                if partial is not None:
-                    self.shapes.clean()
-                    self.calendar.clean()
-
-            with zip_file.open("stops.txt", "r") as stops_file:
-                self.stops._load_file(stops_file, ignore_errors=partial is not None)
-
-            with zip_file.open("stop_times.txt", "r") as stop_times_file:
-                reader = csv.DictReader(stop_times_file)
-                for row in reader:
-                    try:
-                        stop_time = StopTime(transit_data=self, **row)
-                        stop_time.trip.stop_times.add(stop_time)
-                        stop_time.stop.stop_times.append(stop_time)
-                    except:
-                        if partial is None:
-                            raise
-
-                if partial is not None:
-                    self.stops.clean()
-
-            if "translations.txt" in zip_files_list:
-                with zip_file.open("translations.txt", "r") as translation_file:
-                    self.translator._load_file(translation_file)
-
-            if "fare_attributes.txt" in zip_files_list and "fare_rules.txt" in zip_files_list:
-                with zip_file.open("fare_attributes.txt", "r") as fare_attributes_file:
-                    self.fare_attributes._load_file(fare_attributes_file, ignore_errors=partial is not None)
-                with zip_file.open("fare_rules.txt", "r") as fare_rules_file:
-                    if partial is None:
-                        self.fare_rules._load_file(fare_rules_file)
-                    else:
-                        zone_ids = {stop.zone_id for stop in self.stops}
-                        self.fare_rules._load_file(fare_rules_file,
-                                                   ignore_errors=True,
-                                                   filter=lambda fare_rule:
-                                                   (fare_rule.origin_id is None or fare_rule.origin_id in zone_ids) and
-                                                   (fare_rule.destination_id is None or fare_rule.destination_id in zone_ids) and
-                                                   (fare_rule.contains_id is None or fare_rule.contains_id in zone_ids))
-
-                if partial is not None:
-                    self.fare_attributes.clean()
+            if workers is None:
+                reader = ZipCsvReader(zip_file)
             else:
-                assert "fare_attributes.txt" in zip_files_list
-                assert "fare_rules.txt" in zip_files_list
+                # a filtered load selects the services by their exceptions too
+                read_files = KNOWN_FILES if rows_filter is None else KNOWN_FILES + ["calendar_dates.txt"]
+                reader = ParallelZipCsvReader(gtfs_file, zip_file,
+                                              [file_name for file_name in read_files if file_name in zip_files_list],
+                                              workers)
+
+            try:
+                self._load_known_files(reader, zip_files_list, rows_filter)
+            finally:
+                reader.close()
 
             for inner_file in zip_file.filelist:
-                # TODO: collect this known files list on reading
-                if inner_file.filename not in ["agency.txt", "routes.txt", "shapes.txt", "calendar.txt", "trips.txt",
-                                               "stops.txt", "stop_times.txt", "translations.txt", "fare_attributes.txt",
-                                               "fare_rules.txt"]:
-                    with zip_file.open(inner_file, "r") as f:
-                        self.unknown_files[inner_file.filename] = UnknownFile(f)
+                if inner_file.filename not in KNOWN_FILES:
+                    if isinstance(gtfs_file, str):
+                        self.unknown_files[inner_file.filename] = UnknownFile(source_file=gtfs_file,
+                                                                              file_name=inner_file.filename)
+                    else:
+                        with zip_file.open(inner_file, "r") as f:
+                            self.unknown_files[inner_file.filename] = UnknownFile(f)
 
-        if validate:
-            self.validate()
+        self._load_calendar_dates()
+        # the loaders create the objects without reporting them as changes
+        self._invalidate_derived_indexes({None})
 
-    def save(self, file_path, compression=zipfile.ZIP_DEFLATED, validate=True):
         if validate:
             self.validate()
 
-        tempdir = tempfile.mkdtemp()
-        temp_gtfs_file_path = tempfile.mktemp(suffix=".zip")
+        if rows_filter is None:
+            self._set_source_file(gtfs_file)
 
-        try:
-            with open(os.path.join(tempdir, "agency.txt"), "wb") as f:
-                self.agencies.save(f)
+        if cache is not None:
+            cache.store(self, cache_key)
 
-            with open(os.path.join(tempdir, "routes.txt"), "wb") as f:
-                self.routes.save(f)
+    def _load_known_files(self, reader, zip_files_list, rows_filter):
+        """
+        :type reader: ZipCsvReader | ParallelZipCsvReader
+        :type zip_files_list: list[str]
+        :type rows_filter: TransitDataFilter | None
+        """
+
+        if rows_filter is not None:
+            self._load_filtered_files(reader, zip_files_list, rows_filter)
+            return
 
-            with open(os.path.join(tempdir, "shapes.txt"), "wb") as f:
-                self.shapes.save(f)
+        self.agencies._load_rows(reader.read_rows("agency.txt"))
+        self.routes._load_rows(reader.read_rows("routes.txt"))
+        self.shapes._load_rows(reader.read_rows("shapes.txt"))
+        self.calendar._load_rows(reader.read_rows("calendar.txt"))
+        self.trips._load_rows(reader.read_rows("trips.txt"))
+        self.stops._load_rows(reader.read_rows("stops.txt"))
+        self._load_stop_times(reader.read_rows("stop_times.txt"))
 
-            with open(os.path.join(tempdir, "calendar.txt"), "wb") as f:
-                self.calendar.save(f)
+        if "translations.txt" in zip_files_list:
+            self.translator._load_data(reader.read_rows("translations.txt"))
 
-            with open(os.path.join(tempdir, "trips.txt"), "wb") as f:
-                self.trips.save(f)
+        if "fare_attributes.txt" in zip_files_list and "fare_rules.txt" in zip_files_list:
+            self.fare_attributes._load_rows(reader.read_rows("fare_attributes.txt"))
+            self.fare_rules._load_rows(reader.read_rows("fare_rules.txt"))
+        else:
+            assert "fare_attributes.txt" in zip_files_list
+            assert "fare_rules.txt" in zip_files_list
+
+    def _load_filtered_files(self, reader, zip_files_list, rows_filter):
+        """
+        Loads only the rows selected by the filter. The rows of each file are selected before the files it references
+        are loaded, so every loaded row references only loaded objects.
+
+        :type reader: ZipCsvReader | ParallelZipCsvReader
+        :type zip_files_list: list[str]
+        :type rows_filter: TransitDataFilter
+        """
+
+        agencies_rows = rows_filter.filter_agencies(reader.read_rows("agency.txt"))
+        routes_rows = rows_filter.filter_routes(reader.read_rows("routes.txt"))
+        calendar_rows = list(reader.read_rows("calendar.txt"))
+        calendar_dates_rows = reader.read_rows("calendar_dates.txt") if "calendar_dates.txt" in zip_files_list else ()
+        rows_filter.filter_active_services(calendar_rows, calendar_dates_rows)
+        trips_rows = rows_filter.filter_trips(reader.read_rows("trips.txt"))
+        stops_rows = list(reader.read_rows("stops.txt"))
+        rows_filter.filter_area_stops(stops_rows)
+        stop_times_rows = rows_filter.filter_stop_times(reader.read_rows("stop_times.txt"))
+        trips_rows = rows_filter.filter_trips_by_stop_times(trips_rows)
+        routes_rows = rows_filter.filter_used_routes(routes_rows)
+        agencies_rows = rows_filter.filter_used_agencies(agencies_rows)
+
+        self.agencies._load_rows(agencies_rows)
+        self.routes._load_rows(routes_rows)
+        self.shapes._load_rows(rows_filter.filter_shapes(reader.read_rows("shapes.txt")))
+        self.calendar._load_rows(rows_filter.filter_calendar(calendar_rows))
+        self.trips._load_rows(trips_rows)
+        self.stops._load_rows(rows_filter.filter_stops(stops_rows))
+        del agencies_rows, routes_rows, calendar_rows, trips_rows, stops_rows
+
+        self._load_stop_times(stop_times_rows)
+        del stop_times_rows
+
+        if "translations.txt" in zip_files_list:
+            self.translator._load_data(reader.read_rows("translations.txt"))
+
+        if "fare_attributes.txt" in zip_files_list and "fare_rules.txt" in zip_files_list:
+            fare_attributes_rows = rows_filter.filter_fare_attributes(reader.read_rows("fare_attributes.txt"))
+            fare_rules_rows = rows_filter.filter_fare_rules(reader.read_rows("fare_rules.txt"))
+            self.fare_attributes._load_rows(rows_filter.filter_unused_fares(fare_attributes_rows))
+            self.fare_rules._load_rows(fare_rules_rows)
+        else:
+            assert "fare_attributes.txt" in zip_files_list
+            assert "fare_rules.txt" in zip_files_list
+
+    def _load_calendar_dates(self):
+        """
+        Folds the exceptions of calendar_dates.txt, if exists, into the services. The file itself is kept as an unknown
+        file, and written again from the services when their exceptions change (see _update_calendar_dates_file).
+        """
+
+        calendar_dates_file = self.unknown_files.get("calendar_dates.txt")
+        if calendar_dates_file is not None:
+            f = calendar_dates_file.open()
+            try:
+                self.calendar._load_calendar_dates(csv.DictReader(f))
+            finally:
+                f.close()
+
+    def _update_calendar_dates_file(self):
+        """
+        Writes the services' exceptions to the calendar_dates.txt unknown file, if they were changed since it was read.
+        The rows of services that aren't in the calendar are kept as they are.
+        """
+
+        if "calendar_dates.txt" not in self._changed_files:
+            return
 
-            with open(os.path.join(tempdir, "stops.txt"), "wb") as f:
-                self.stops.save(f)
+        field_names = ["service_id", "date", "exception_type"]
+        other_rows = []
+        calendar_dates_file = self.unknown_files.get("calendar_dates.txt")
+        if calendar_dates_file is not None:
+            f = calendar_dates_file.open()
+            try:
+                reader = csv.DictReader(f)
+                other_rows = [row for row in reader if int(row["service_id"]) not in self.calendar._objects]
+                field_names += [field for field in reader.fieldnames or [] if field not in field_names]
+            finally:
+                f.close()
+        elif all(len(service._calendar_dates) == 0 for service in self.calendar):
+            return
 
-            fields = []
-            for trip in self.trips:
-                for stop_time in trip.stop_times:
-                    fields += (field for field in stop_time.get_csv_fields() if field not in fields)
-            with open(os.path.join(tempdir, "stop_times.txt"), "wb") as f:
-                writer = csv.DictWriter(f, fieldnames=fields, restval=None)
-                writer.writeheader()
-                for trip in self.trips:
-                    for stop_time in trip.stop_times:
-                        writer.writerow(stop_time.to_csv_line())
-
-            if self.translator.has_data():
-                with open(os.path.join(tempdir, "translations.txt"), "wb") as f:
-                    self.translator.save(f)
-
-            if self.fare_rules.has_data():
-                with open(os.path.join(tempdir, "fare_attributes.txt"), "wb") as f:
-                    self.fare_attributes.save(f)
-
-                with open(os.path.join(tempdir, "fare_rules.txt"), "wb") as f:
-                    self.fare_rules.save(f)
-
-            for file_name, file_data in self.unknown_files.iteritems():
-                with open(os.path.join(tempdir, file_name), "wb") as f:
-                    f.write(file_data.data)
-
-            with ZipFile(temp_gtfs_file_path, mode="w", compression=compression) as zip_file:
-                for file_name in os.listdir(tempdir):
-                    zip_file.write(os.path.join(tempdir, file_name), arcname=file_name)
+        csv_file = StringIO()
+        writer = csv.DictWriter(csv_file, field_names)
+        writer.writeheader()
+        writer.writerows(other_rows)
+        for service in self.calendar:
+            for day, is_active in sorted(service._calendar_dates.iteritems()):
+                writer.writerow(dict(service_id=service.id, date=day.strftime("%Y%m%d"),
+                                     exception_type=1 if is_active else 2))
+        self.unknown_files["calendar_dates.txt"] = UnknownFile(StringIO(csv_file.getvalue()))
+
+    def save(self, file_path, compression=zipfile.ZIP_DEFLATED, validate=True, passthrough=False):
+        """
+        :type file_path: str
+        :type compression: int
+        :type validate: bool
+        :param passthrough: copy the files that weren't changed since the data was loaded from the source zip file as
+        is, without parsing and compressing them again (see mark_changed)
+        :type passthrough: bool
+        """
+
+        if validate:
+            self.validate()
+        self._update_calendar_dates_file()
+
+        temp_gtfs_file_fd, temp_gtfs_file_path = tempfile.mkstemp(suffix=".zip",
+                                                                  dir=os.path.dirname(os.path.abspath(file_path)))
+        os.close(temp_gtfs_file_fd)
+
+        source_zip_file = self._open_source_file() if passthrough else None
+        try:
+            with ZipFile(temp_gtfs_file_path, mode="w", compression=compression, allowZip64=True) as zip_file:
+                self._save_file(zip_file, source_zip_file, "agency.txt", self.agencies.save)
+                self._save_file(zip_file, source_zip_file, "routes.txt", self.routes.save)
+                self._save_file(zip_file, source_zip_file, "shapes.txt", self.shapes.save)
+                self._save_file(zip_file, source_zip_file, "calendar.txt", self.calendar.save)
+                self._save_file(zip_file, source_zip_file, "trips.txt", self.trips.save)
+                self._save_file(zip_file, source_zip_file, "stops.txt", self.stops.save)
+                self._save_file(zip_file, source_zip_file, "stop_times.txt", self._save_stop_times)
+
+                if self.translator.has_data():
+                    # the translator doesn't report its changes, so its file is always saved
+                    self._save_file(zip_file, None, "translations.txt", self.translator.save)
+
+                if self.fare_rules.has_data():
+                    self._save_file(zip_file, source_zip_file, "fare_attributes.txt", self.fare_attributes.save)
+                    self._save_file(zip_file, source_zip_file, "fare_rules.txt", self.fare_rules.save)
+
+                for file_name, file_data in self.unknown_files.iteritems():
+                    if source_zip_file is not None and file_data.source_file == self._source_file and \
+                            file_data.file_name == file_name:
+                        self._copy_source_member(zip_file, source_zip_file, file_name)
+                    else:
+                        with file_data.open() as source_file, ZipMemberWriter(zip_file, file_name) as f:
+                            shutil.copyfileobj(source_file, f, DEFAULT_BUFFER_SIZE)
+
+            # mkstemp creates the file readable only by its owner
+            os.chmod(temp_gtfs_file_path, _get_default_file_mode())
             shutil.move(temp_gtfs_file_path, file_path)
         finally:
-            if os.path.exists(tempdir) and os.path.isdir(tempdir):
-                shutil.rmtree(tempdir)
-            if os.path.exists(temp_gtfs_file_path) and not os.path.isdir(temp_gtfs_file_path):
+            if source_zip_file is not None:
+                source_zip_file.close()
+            if os.path.exists(temp_gtfs_file_path):
                 os.remove(temp_gtfs_file_path)
 
+    def _save_file(self, zip_file, source_zip_file, file_name, save_function):
+        """
+        :type zip_file: ZipFile
+        :type source_zip_file: ZipFile | None
+        :type file_name: str
+        """
+
+        if source_zip_file is not None and file_name not in self._changed_files and \
+                file_name in source_zip_file.NameToInfo:
+            self._copy_source_member(zip_file, source_zip_file, file_name)
+        else:
+            with ZipMemberWriter(zip_file, file_name) as f:
+                save_function(f)
+
+    @staticmethod
+    def _copy_source_member(zip_file, source_zip_file, file_name):
+        """
+        Copies an unchanged member of the source file as is, or re-encodes it if it's compressed with another method
+        than the one the zip file is saved with.
+
+        :type zip_file: ZipFile
+        :type source_zip_file: ZipFile
+        :type file_name: str
+        """
+
+        zip_info = source_zip_file.getinfo(file_name)
+        if zip_info.compress_type == zip_file.compression:
+            copy_zip_member(source_zip_file, zip_info, zip_file)
+        else:
+            with source_zip_file.open(zip_info) as source_file, ZipMemberWriter(zip_file, file_name) as f:
+                shutil.copyfileobj(source_file, f, DEFAULT_BUFFER_SIZE)
+
+    def _save_stop_times(self, csv_file):
+        # attributes can be set on the stop times after they were added, so make sure they are in the schema
+        for trip in self.trips:
+            for stop_time in trip.stop_times:
+                self._stop_times_csv_schema.update(stop_time.attributes)
+
+        self._stop_times_csv_schema.write(csv_file, (stop_time.to_csv_line()
+                                                     for trip in self.trips for stop_time in trip.stop_times))
+
+    def save_snapshot(self, file_path, validate=True):
+        """
+        :type file_path: str
+        :type validate: bool
+        """
+
+        if validate:
+            self.validate()
+        self._update_calendar_dates_file()
+
+        transit_data_snapshot.save_snapshot(self, file_path)
+
+    def load_snapshot(self, file_path, validate=True):
+        """
+        :type file_path: str
+        :type validate: bool
+        """
+
+        assert not self.has_changed
+
+        transit_data_snapshot.load_snapshot(self, file_path)
+        self._load_calendar_dates()
+        self._invalidate_derived_indexes({None})
+
+        if validate:
+            self.validate()
+
+    def materialize_instances(self, start_date, end_date):
+        """
+        Expands every trip into its dated instances between start_date and end_date (inclusive), as NumPy arrays.
+
+        :type start_date: date
+        :type end_date: date
+        :rtype: gtfspy.transit_data_instances.TripInstances
+        """
+
+        # numpy is only needed for the materialized instances, so it's imported on demand
+        from gtfspy import transit_data_instances
+
+        return transit_data_instances.materialize_instances(self, start_date, end_date)
+
     def add_object(self, obj, recursive=False):
         if isinstance(obj, Agency):
             self.agencies.add_object(obj, recursive=recursive)
@@ -190,32 +591,86 @@ class TransitData(object):
             self.fare_attributes.add_object(obj, recursive=recursive)
         elif isinstance(obj, FareRule):
             self.fare_rules.add_object(obj, recursive=recursive)
-        elif isinstance(obj, Route):
+        elif isinstance(obj, BaseRoute):
             self.routes.add_object(obj, recursive=recursive)
         elif isinstance(obj, Service):
             self.calendar.add_object(obj, recursive=recursive)
         elif isinstance(obj, Shape):
             self.shapes.add_object(obj, recursive=recursive)
-        elif isinstance(obj, Stop):
+        elif isinstance(obj, BaseStop):
             self.stops.add_object(obj, recursive=recursive)
-        elif isinstance(obj, StopTime):
+        elif isinstance(obj, BaseStopTime):
             self.add_stop_time_object(obj, recursive=recursive)
-        elif isinstance(obj, Trip):
+        elif isinstance(obj, BaseTrip):
             self.trips.add_object(obj, recursive=recursive)
         else:
             raise ValueError("Unknown object type '%s'" % (type(obj),))
 
     def add_stop_time(self, **kwargs):
-        stop_time = StopTime(transit_data=self, **kwargs)
-
+        if self.stop_times_table is not None:
+            trip = self.trips[kwargs["trip_id"]]
+            stop_sequence = int(kwargs["stop_sequence"])
+            assert stop_sequence not in (st.stop_sequence for st in trip.stop_times)
+            self._changed("stop_times.txt")
+            stop_time = self.stop_times_table.add(**kwargs)
+            self._stop_times_csv_schema.update(stop_time.attributes)
+            return stop_time
+
+        stop_time_class = CompactStopTime if self.compact_objects else StopTime
+        return self._add_stop_time(stop_time_class(transit_data=self, **kwargs))
+
+    def _add_stop_time(self, stop_time):
         assert stop_time.stop_sequence not in (st.stop_sequence for st in stop_time.trip.stop_times)
-        self._changed()
+        self._changed("stop_times.txt")
         stop_time.trip.stop_times.add(stop_time)
         stop_time.stop.stop_times.append(stop_time)
+        self._stop_times_csv_schema.update(stop_time.attributes)
+        return stop_time
+
+    def _create_stop_time(self, **kwargs):
+        if self.stop_times_table is not None:
+            stop_time = self.stop_times_table.add(**kwargs)
+        else:
+            stop_time_class = CompactStopTime if self.compact_objects else StopTime
+            stop_time = stop_time_class(transit_data=self, **kwargs)
+            stop_time.trip.stop_times.add(stop_time)
+            stop_time.stop.stop_times.append(stop_time)
+
+        self._stop_times_csv_schema.update(stop_time.attributes)
         return stop_time
 
+    def _load_stop_times(self, rows):
+        """
+        Creates the stop times of the rows. The stop times of every trip are buffered, and added to the trip in a single
+        bulk update of its sorted stop times (which costs a single pass when the rows are in sequence order) instead of
+        inserting them one by one. The columnar table appends the rows of a trip that are in sequence order anyway.
+
+        :type rows: collections.Iterable[dict]
+        """
+
+        if self.stop_times_table is not None:
+            for row in rows:
+                self._create_stop_time(**row)
+            return
+
+        stop_time_class = CompactStopTime if self.compact_objects else StopTime
+        csv_schema = self._stop_times_csv_schema
+
+        trips_stop_times = OrderedDict()
+        for row in rows:
+            stop_time = stop_time_class(transit_data=self, **row)
+            trip_stop_times = trips_stop_times.get(stop_time.trip)
+            if trip_stop_times is None:
+                trip_stop_times = trips_stop_times[stop_time.trip] = []
+            trip_stop_times.append(stop_time)
+            stop_time.stop.stop_times.append(stop_time)
+            csv_schema.update(stop_time.attributes)
+
+        for trip, trip_stop_times in trips_stop_times.iteritems():
+            trip.stop_times.update(trip_stop_times)
+
     def add_stop_time_object(self, stop_time, recursive=False):
-        assert isinstance(stop_time, StopTime)
+        assert isinstance(stop_time, BaseStopTime)
 
         if recursive:
             self.trips.add_object(stop_time.trip, recursive=True)
@@ -223,7 +678,15 @@ class TransitData(object):
         else:
             assert stop_time.trip in self.trips
             assert stop_time.stop in self.stops
-        return self.add_stop_time(**stop_time.to_csv_line())
+        return self._adopt_stop_time(stop_time)
+
+    def _adopt_stop_time(self, stop_time):
+        if self.stop_times_table is not None:
+            return self.add_stop_time(trip_id=stop_time.trip.id, arrival_time=stop_time.arrival_seconds,
+                                      departure_time=stop_time.departure_seconds, stop_id=stop_time.stop.id,
+                                      stop_sequence=stop_time.stop_sequence, **stop_time.attributes)
+
+        return self._add_stop_time(stop_time._copy(self, CompactStopTime if self.compact_objects else StopTime))
 
     def clean(self):
         self.trips.clean()
@@ -270,3 +733,20 @@ class TransitData(object):
 
     def __ne__(self, other):
         return not (self == other)
+
+
+def _get_file_stat(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+
+def _get_default_file_mode():
+    """
+    :return: the mode of a new file that is created with open, under the current umask
+    :rtype: int
+    """
+
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0666 & ~umask
+
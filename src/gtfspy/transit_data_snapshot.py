@@ -0,0 +1,319 @@
+import marshal
+import mmap
+import struct
+import sys
+from array import array
+from cStringIO import StringIO
+from datetime import date
+
+import gtfspy
+from gtfspy.data_objects import UnknownFile
+
+SNAPSHOT_MAGIC = "GTFSPYSS"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIBQ")
+_MARSHAL_VERSION = 2
+_COLUMNS_ALIGNMENT = 8
+_NONE_INDEX = -1
+_NONE_CODE = -1
+
+
+def save_snapshot(transit_data, file_path):
+    """
+    Writes the transit data into a binary snapshot file.
+
+    The file starts with a fixed header (magic, format version, byte order and the metadata length), followed by a
+    marshal encoded metadata block and by the raw typed arrays of the shape points and the stop times. Objects refer to
+    each other by their index in the metadata tables, and every column is aligned to 8 bytes, so the file can be
+    memory mapped and the columns copied into arrays without parsing.
+
+    :type transit_data: gtfspy.transit_data_object.TransitData
+    :type file_path: str
+    """
+
+    agencies = list(transit_data.agencies)
+    agencies_indices = {agency.id: i for i, agency in enumerate(agencies)}
+    routes = list(transit_data.routes)
+    routes_indices = {route.id: i for i, route in enumerate(routes)}
+    shapes = list(transit_data.shapes)
+    shapes_indices = {shape.id: i for i, shape in enumerate(shapes)}
+    services = list(transit_data.calendar)
+    services_indices = {service.id: i for i, service in enumerate(services)}
+    trips = list(transit_data.trips)
+    stops = _sort_stops_by_parents(transit_data.stops)
+    stops_indices = {stop.id: i for i, stop in enumerate(stops)}
+    fare_attributes = list(transit_data.fare_attributes)
+    fare_attributes_indices = {fare_attribute.id: i for i, fare_attribute in enumerate(fare_attributes)}
+
+    meta = {"agencies": [(agency.id, agency.agency_name, agency.agency_url, agency.agency_timezone,
+                          dict(agency.attributes))
+                         for agency in agencies],
+            "routes": [(route.id, route.route_short_name, route.route_long_name, route.route_type,
+                        agencies_indices[route.agency.id], dict(route.attributes))
+                       for route in routes],
+            "shapes": [shape.id for shape in shapes],
+            "services": [(service.id, service.start_date.toordinal(), service.end_date.toordinal(),
+                          tuple(service.days_relevance), dict(service.attributes))
+                         for service in services],
+            "trips": [(trip.id, routes_indices[trip.route.id], services_indices[trip.service.id],
+                       _NONE_INDEX if trip.shape is None else shapes_indices[trip.shape.id],
+                       _without_keys(trip.attributes, "shape_id"))
+                      for trip in trips],
+            "stops": [(stop.id, stop.stop_name, stop.stop_lat, stop.stop_lon,
+                       _NONE_INDEX if stop.parent_station is None else stops_indices[stop.parent_station.id],
+                       _without_keys(stop.attributes, "parent_station"))
+                      for stop in stops],
+            "fare_attributes": [(fare_attribute.id, fare_attribute.price, fare_attribute.currency_type,
+                                 fare_attribute.payment_method, fare_attribute.transfers,
+                                 _NONE_INDEX if fare_attribute.agency is None
+                                 else agencies_indices[fare_attribute.agency.id],
+                                 _without_keys(fare_attribute.attributes, "agency_id"))
+                                for fare_attribute in fare_attributes],
+            "fare_rules": [(fare_attributes_indices[fare_rule.fare.id],
+                            _NONE_INDEX if fare_rule.route is None else routes_indices[fare_rule.route.id],
+                            _without_keys(fare_rule.attributes, "route_id"))
+                           for fare_rule in transit_data.fare_rules],
+            "translations": {language: dict(translations)
+                             for language, translations in transit_data.translator._words.iteritems()},
+            "unknown_files": {file_name: unknown_file.data
+                              for file_name, unknown_file in transit_data.unknown_files.iteritems()}}
+
+    columns = {}
+
+    shape_points_columns = {"shape_index": array("i"), "latitude": array("d"), "longitude": array("d"),
+                            "sequence": array("i"), "shape_dist_traveled": array("d")}
+    shape_points_attributes = {}
+    for shape_index, shape in enumerate(shapes):
+        for shape_point in shape.shape_points:
+            row = len(shape_points_columns["shape_index"])
+            shape_points_columns["shape_index"].append(shape_index)
+            shape_points_columns["latitude"].append(shape_point.latitude)
+            shape_points_columns["longitude"].append(shape_point.longitude)
+            shape_points_columns["sequence"].append(shape_point.sequence)
+            shape_points_columns["shape_dist_traveled"].append(_float_or_nan(shape_point.shape_dist_traveled))
+            attributes = _without_keys(shape_point.attributes, "shape_dist_traveled")
+            if len(attributes) > 0:
+                shape_points_attributes[row] = attributes
+    meta["shape_points_attributes"] = shape_points_attributes
+    columns.update(("shape_points." + name, column) for name, column in shape_points_columns.iteritems())
+
+    stop_times_columns = {"trip_index": array("i"), "stop_index": array("i"), "arrival_time": array("i"),
+                          "departure_time": array("i"), "stop_sequence": array("i"), "pickup_type": array("b"),
+                          "drop_off_type": array("b"), "timepoint": array("b"), "shape_dist_traveled": array("d"),
+                          "stop_headsign": array("i")}
+    stop_times_attributes = {}
+    headsigns = []
+    headsigns_indices = {}
+    for trip_index, trip in enumerate(trips):
+        for stop_time in trip.stop_times:
+            row = len(stop_times_columns["trip_index"])
+            attributes = dict(stop_time.attributes)
+            stop_times_columns["trip_index"].append(trip_index)
+            stop_times_columns["stop_index"].append(stops_indices[stop_time.stop.id])
+            stop_times_columns["arrival_time"].append(stop_time.arrival_seconds)
+            stop_times_columns["departure_time"].append(stop_time.departure_seconds)
+            stop_times_columns["stop_sequence"].append(stop_time.stop_sequence)
+            stop_times_columns["pickup_type"].append(attributes.pop("pickup_type", _NONE_CODE))
+            stop_times_columns["drop_off_type"].append(attributes.pop("drop_off_type", _NONE_CODE))
+            stop_times_columns["timepoint"].append(attributes.pop("timepoint", _NONE_CODE))
+            stop_times_columns["shape_dist_traveled"].append(
+                _float_or_nan(attributes.pop("shape_dist_traveled", None)))
+            headsign = attributes.pop("stop_headsign", None)
+            if headsign is None:
+                stop_times_columns["stop_headsign"].append(_NONE_INDEX)
+            else:
+                if headsign not in headsigns_indices:
+                    headsigns_indices[headsign] = len(headsigns)
+                    headsigns.append(headsign)
+                stop_times_columns["stop_headsign"].append(headsigns_indices[headsign])
+            if len(attributes) > 0:
+                stop_times_attributes[row] = attributes
+    meta["stop_times_attributes"] = stop_times_attributes
+    meta["stop_headsigns"] = headsigns
+    columns.update(("stop_times." + name, column) for name, column in stop_times_columns.iteritems())
+
+    columns_layout = {}
+    offset = 0
+    for name in sorted(columns):
+        column = columns[name]
+        columns_layout[name] = (column.typecode, offset, len(column))
+        offset += _align(len(column) * column.itemsize)
+    meta["columns"] = columns_layout
+
+    meta_data = marshal.dumps(meta, _MARSHAL_VERSION)
+
+    with open(file_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "little", len(meta_data)))
+        f.write(meta_data)
+        f.write("\0" * (_align(_HEADER.size + len(meta_data)) - _HEADER.size - len(meta_data)))
+        for name in sorted(columns):
+            data = columns[name].tostring()
+            f.write(data)
+            f.write("\0" * (_align(len(data)) - len(data)))
+
+
+def load_snapshot(transit_data, file_path):
+    """
+    Loads a snapshot file that was written by save_snapshot into an empty transit data object.
+
+    :type transit_data: gtfspy.transit_data_object.TransitData
+    :type file_path: str
+    """
+
+    with open(file_path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError("'%s' is not a gtfs.py snapshot file" % (file_path,))
+        magic, version, is_little_endian, meta_size = _HEADER.unpack(header)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("'%s' is not a gtfs.py snapshot file" % (file_path,))
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported snapshot version %d (expected %d)" % (version, SNAPSHOT_VERSION))
+
+        meta = marshal.loads(f.read(meta_size))
+        data_offset = _align(_HEADER.size + meta_size)
+        swap_bytes = bool(is_little_endian) != (sys.byteorder == "little")
+
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            columns = {name: _read_column(buf, data_offset, typecode, offset, length, swap_bytes)
+                       for name, (typecode, offset, length) in meta["columns"].iteritems()}
+        finally:
+            buf.close()
+
+    agencies_ids = []
+    for agency_id, agency_name, agency_url, agency_timezone, attributes in meta["agencies"]:
+        transit_data.agencies.add(agency_id=agency_id, agency_name=agency_name, agency_url=agency_url,
+                                  agency_timezone=agency_timezone, **attributes)
+        agencies_ids.append(agency_id)
+
+    routes_ids = []
+    for route_id, route_short_name, route_long_name, route_type, agency_index, attributes in meta["routes"]:
+        transit_data.routes.add(route_id=route_id, route_short_name=route_short_name,
+                                route_long_name=route_long_name, route_type=route_type,
+                                agency_id=agencies_ids[agency_index], **attributes)
+        routes_ids.append(route_id)
+
+    shapes_ids = meta["shapes"]
+    shape_points_attributes = meta["shape_points_attributes"]
+    transit_data.shapes._load_rows(
+        dict(shape_id=shapes_ids[shape_index],
+             shape_pt_lat=columns["shape_points.latitude"][row],
+             shape_pt_lon=columns["shape_points.longitude"][row],
+             shape_pt_sequence=columns["shape_points.sequence"][row],
+             shape_dist_traveled=_nan_to_none(columns["shape_points.shape_dist_traveled"][row]),
+             **shape_points_attributes.get(row, {}))
+        for row, shape_index in enumerate(columns["shape_points.shape_index"]))
+
+    services_ids = []
+    for service_id, start_date, end_date, days_relevance, attributes in meta["services"]:
+        sunday, monday, tuesday, wednesday, thursday, friday, saturday = days_relevance
+        transit_data.calendar.add(service_id=service_id, start_date=date.fromordinal(start_date),
+                                  end_date=date.fromordinal(end_date), sunday=sunday, monday=monday,
+                                  tuesday=tuesday, wednesday=wednesday, thursday=thursday, friday=friday,
+                                  saturday=saturday, **attributes)
+        services_ids.append(service_id)
+
+    trips = []
+    for trip_id, route_index, service_index, shape_index, attributes in meta["trips"]:
+        trips.append(transit_data.trips.add(trip_id=trip_id, route_id=routes_ids[route_index],
+                                            service_id=services_ids[service_index],
+                                            shape_id=None if shape_index == _NONE_INDEX else shapes_ids[shape_index],
+                                            **attributes))
+
+    stops = []
+    for stop_id, stop_name, stop_lat, stop_lon, parent_index, attributes in meta["stops"]:
+        stops.append(transit_data.stops.add(stop_id=stop_id, stop_name=stop_name, stop_lat=stop_lat,
+                                            stop_lon=stop_lon,
+                                            parent_station=None if parent_index == _NONE_INDEX
+                                            else stops[parent_index].id,
+                                            **attributes))
+
+    stop_times_columns = {name[len("stop_times."):]: column for name, column in columns.iteritems()
+                          if name.startswith("stop_times.")}
+    stop_headsign = stop_times_columns.pop("stop_headsign")
+    headsigns = meta["stop_headsigns"]
+    stop_times_columns["stop_headsign"] = [None if i == _NONE_INDEX else headsigns[i] for i in stop_headsign]
+    stop_times_columns["extra_attributes"] = meta["stop_times_attributes"]
+    if transit_data.stop_times_table is not None:
+        transit_data.stop_times_table._load_columns(trips, stops, **stop_times_columns)
+    else:
+        _load_stop_times_objects(transit_data, trips, stops, **stop_times_columns)
+
+    for language, translations in meta["translations"].iteritems():
+        for expression, translation in translations.iteritems():
+            transit_data.translator.add_translate(language, expression, translation)
+
+    for fare_id, price, currency_type, payment_method, transfers, agency_index, attributes in \
+            meta["fare_attributes"]:
+        transit_data.fare_attributes.add(fare_id=fare_id, price=price, currency_type=currency_type,
+                                         payment_method=payment_method, transfers=transfers,
+                                         agency_id=None if agency_index == _NONE_INDEX
+                                         else agencies_ids[agency_index],
+                                         **attributes)
+
+    fare_ids = [fare_attribute[0] for fare_attribute in meta["fare_attributes"]]
+    for fare_index, route_index, attributes in meta["fare_rules"]:
+        transit_data.fare_rules.add(fare_id=fare_ids[fare_index],
+                                    route_id=None if route_index == _NONE_INDEX else routes_ids[route_index],
+                                    **attributes)
+
+    for file_name, data in meta["unknown_files"].iteritems():
+        transit_data.unknown_files[file_name] = UnknownFile(StringIO(data))
+
+
+def _load_stop_times_objects(transit_data, trips, stops, trip_index, stop_index, arrival_time, departure_time,
+                             stop_sequence, pickup_type, drop_off_type, timepoint, shape_dist_traveled, stop_headsign,
+                             extra_attributes):
+    transit_data._load_stop_times(dict(trip_id=trips[trip_index[row]].id,
+                                       arrival_time=arrival_time[row],
+                                       departure_time=departure_time[row],
+                                       stop_id=stops[stop_index[row]].id,
+                                       stop_sequence=stop_sequence[row],
+                                       pickup_type=None if pickup_type[row] == _NONE_CODE else pickup_type[row],
+                                       drop_off_type=None if drop_off_type[row] == _NONE_CODE
+                                       else drop_off_type[row],
+                                       shape_dist_traveled=_nan_to_none(shape_dist_traveled[row]),
+                                       stop_headsign=stop_headsign[row],
+                                       timepoint=None if timepoint[row] == _NONE_CODE else timepoint[row],
+                                       **extra_attributes.get(row, {}))
+                                  for row in xrange(len(trip_index)))
+
+
+def _read_column(buf, data_offset, typecode, offset, length, swap_bytes):
+    column = array(typecode)
+    start = data_offset + offset
+    column.fromstring(buffer(buf, start, length * column.itemsize))
+    if swap_bytes:
+        column.byteswap()
+    return column
+
+
+def _sort_stops_by_parents(stops):
+    result = []
+    visited = set()
+    for stop in stops:
+        chain = []
+        while stop is not None and stop.id not in visited:
+            visited.add(stop.id)
+            chain.append(stop)
+            stop = stop.parent_station
+        result.extend(reversed(chain))
+    return result
+
+
+def _without_keys(attributes, *keys):
+    return {k: v for k, v in attributes.iteritems() if k not in keys}
+
+
+def _float_or_nan(value):
+    return float("nan") if value is None else float(value)
+
+
+def _nan_to_none(value):
+    return None if value != value else value
+
+
+def _align(size):
+    return (size + _COLUMNS_ALIGNMENT - 1) // _COLUMNS_ALIGNMENT * _COLUMNS_ALIGNMENT
@@ -1,40 +1,28 @@
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
 from cStringIO import StringIO
+from multiprocessing import Pool
 
-from gtfspy.data_objects import UnknownFile
+from gtfspy.data_objects import CompactRoute, CompactTrip, Route, Trip, UnknownFile
 from gtfspy.transit_data_object import TransitData
 
 
 def clone_transit_data(transit_data):
     """
-    :rtype: TransitData
     :type transit_data: TransitData
+    :rtype: TransitData
     """
 
-    new_transit_data = TransitData()
-    for service in transit_data.calendar:
-        new_transit_data.calendar.add_object(service, recursive=False)
-    for shape in transit_data.shapes:
-        new_transit_data.shapes.add_object(shape)
-    for stop in transit_data.stops:
-        new_transit_data.stops.add_object(stop, recursive=False)
-    for agency in transit_data.agencies:
-        new_transit_data.agencies.add_object(agency, recursive=False)
-    for route in transit_data.routes:
-        new_transit_data.routes.add_object(route, recursive=False)
-    for trip in transit_data.trips:
-        new_transit_data.trips.add_object(trip, recursive=False)
-        for stop_time in trip.stop_times:
-            new_transit_data.add_stop_time_object(stop_time, recursive=False)
-    for fare_attribute in transit_data.fare_attributes:
-        new_transit_data.fare_attributes.add_object(fare_attribute, recursive=False)
-    for fare_rule in transit_data.fare_rules:
-        new_transit_data.fare_rules.add_object(fare_rule, recursive=False)
+    new_transit_data = TransitData(columnar_stop_times=transit_data.stop_times_table is not None,
+                                   integer_times=transit_data.integer_times,
+                                   compact_objects=transit_data.compact_objects)
+    new_transit_data._copy_objects(transit_data)
+    new_transit_data.translator = transit_data.translator._copy()
 
     for file_name, file_data in transit_data.unknown_files.iteritems():
-        dome_file = StringIO()
-        dome_file.write(file_data.data)
-        new_transit_data.unknown_files[file_name] = UnknownFile(dome_file)
-        dome_file.close()
+        new_transit_data.unknown_files[file_name] = UnknownFile(StringIO(file_data.data))
 
     return new_transit_data
 
@@ -47,41 +35,137 @@ def create_partial_transit_data(transit_data, lines, add_unknown_files=True):
     :type add_unknown_files: bool
     """
 
-    new_transit_data = TransitData()
-
-    for agency_id, line_numbers in lines.iteritems():
-        agency = transit_data.agencies[agency_id]
-        new_transit_data.agencies.add_object(agency, recursive=False)
-        for line in transit_data.agencies[agency_id].lines:
-            if line_numbers is None or line.line_number in line_numbers:
-                for route in line.routes.itervalues():
-                    new_transit_data.routes.add_object(route, recursive=False)
-                    for trip in route.trips:
-                        new_transit_data.calendar.add_object(trip.service)
-                        if trip.shape is not None:
-                            new_transit_data.shapes.add_object(trip.shape)
-                        new_transit_data.trips.add_object(trip)
-                        for stop_time in trip.stop_times:
-                            stop = stop_time.stop
-                            new_transit_data.stops.add_object(stop, recursive=True)
-                            new_transit_data.add_stop_time_object(stop_time)
-
-    for fare_rule in transit_data.fare_rules:
-        zone_ids = {stop.zone_id for stop in new_transit_data.stops}
-        if (fare_rule.route is None or fare_rule.route.id in new_transit_data.routes) and \
-                (fare_rule.origin_id is None or fare_rule.origin_id in zone_ids) and \
-                (fare_rule.destination_id is None or fare_rule.destination_id in zone_ids) and \
-                (fare_rule.contains_id is None or fare_rule.contains_id in zone_ids):
-            new_transit_data.fare_rules.add_object(fare_rule, recursive=True)
-
-    if add_unknown_files:
-        for file_name, file_data in transit_data.unknown_files.iteritems():
-            dome_file = StringIO()
-            dome_file.write(file_data.data)
-            new_transit_data.unknown_files[file_name] = UnknownFile(dome_file)
-            dome_file.close()
+    return create_partial_transit_datas(transit_data, [lines], add_unknown_files=add_unknown_files)[0]
 
-    return new_transit_data
+
+def create_partial_transit_datas(transit_data, lines_list, add_unknown_files=True, workers=None):
+    """
+    Creates a partial transit data for each of the lines specs (as in create_partial_transit_data) in a single traversal
+    of the transit data.
+
+    Each line is visited once: its routes, trips and stop times are traversed a single time, and every one of them is
+    copied into all the partial transit datas that contain the line. The zones of each partial transit data are
+    collected while its stops are copied, and the fare rules are filtered against them in a single pass.
+
+    :type transit_data: TransitData
+    :type lines_list: list[dict[int, list[str]] | dict[int, None]]
+    :type add_unknown_files: bool
+    :param workers: split the partial transit datas between this number of worker processes, which inherit the transit
+    data by forking and send the partial transit datas back as snapshots
+    :type workers: int | None
+    :rtype: list[TransitData]
+    """
+
+    if workers is not None and len(lines_list) > 1:
+        return _create_partial_transit_datas_in_pool(transit_data, lines_list, add_unknown_files, workers)
+
+    new_transit_datas = [TransitData(columnar_stop_times=transit_data.stop_times_table is not None,
+                                     integer_times=transit_data.integer_times,
+                                     compact_objects=transit_data.compact_objects)
+                         for _ in lines_list]
+    zones_ids = [set() for _ in lines_list]
+
+    # the partial transit datas (by their index) that contain each of the lines, in the order they were requested
+    lines_subsets = OrderedDict()
+    for i, lines in enumerate(lines_list):
+        for agency_id, line_numbers in lines.iteritems():
+            agency = transit_data.agencies[agency_id]
+            new_transit_datas[i].agencies.add_object(agency)
+            for line in agency.lines:
+                if line_numbers is None or line.line_number in line_numbers:
+                    lines_subsets.setdefault(line, []).append(i)
+
+    for line, subsets in lines_subsets.iteritems():
+        targets = [(new_transit_datas[i], zones_ids[i]) for i in subsets]
+        for route in line.routes.itervalues():
+            _copy_route(targets, route)
+
+    for i, new_transit_data in enumerate(new_transit_datas):
+        for fare_rule in transit_data.fare_rules:
+            if (fare_rule.route is None or fare_rule.route.id in new_transit_data.routes) and \
+                    (fare_rule.origin_id is None or fare_rule.origin_id in zones_ids[i]) and \
+                    (fare_rule.destination_id is None or fare_rule.destination_id in zones_ids[i]) and \
+                    (fare_rule.contains_id is None or fare_rule.contains_id in zones_ids[i]):
+                new_transit_data.fare_rules.add_object(fare_rule, recursive=True)
+
+        if add_unknown_files:
+            for file_name, file_data in transit_data.unknown_files.iteritems():
+                new_transit_data.unknown_files[file_name] = UnknownFile(StringIO(file_data.data))
+
+    return new_transit_datas
+
+
+def _copy_route(targets, route):
+    """
+    Copies a route with its trips, their services, shapes, stops and stop times into partial transit datas, traversing
+    the route's trips and stop times once for all of them.
+
+    :param targets: the partial transit datas, each with the zones of its stops (updated with the zones of the copied
+    stops)
+    :type targets: list[(TransitData, set[str])]
+    :type route: gtfspy.data_objects.Route
+    """
+
+    for new_transit_data, _ in targets:
+        route_class = CompactRoute if new_transit_data.compact_objects else Route
+        new_transit_data.routes._add(route._copy(new_transit_data, route_class))
+
+    for trip in route.trips:
+        for new_transit_data, _ in targets:
+            if trip.service.id not in new_transit_data.calendar:
+                new_transit_data.calendar.add_object(trip.service)
+            if trip.shape is not None and trip.shape.id not in new_transit_data.shapes:
+                new_transit_data.shapes.add_object(trip.shape)
+            trip_class = CompactTrip if new_transit_data.compact_objects else Trip
+            new_transit_data.trips._add(trip._copy(new_transit_data, trip_class))
+
+        for stop_time in trip.stop_times:
+            stop = stop_time.stop
+            for new_transit_data, zone_ids in targets:
+                if stop.id not in new_transit_data.stops:
+                    for copied_stop in new_transit_data._copy_stop(stop):
+                        zone_ids.add(copied_stop.zone_id)
+                new_transit_data._adopt_stop_time(stop_time)
+
+
+_pool_transit_data = None
+
+
+def _create_partial_transit_datas_in_pool(transit_data, lines_list, add_unknown_files, workers):
+    global _pool_transit_data
+
+    temp_dir = tempfile.mkdtemp()
+    # the workers are forked while the transit data is set, so they inherit it without pickling
+    _pool_transit_data = transit_data
+    pool = Pool(processes=min(workers, len(lines_list)))
+    try:
+        snapshots_paths = pool.map(_create_partial_transit_data_snapshot,
+                                   [(lines, add_unknown_files, os.path.join(temp_dir, "%d.snapshot" % (i,)))
+                                    for i, lines in enumerate(lines_list)])
+    finally:
+        pool.close()
+        pool.join()
+        _pool_transit_data = None
+
+    try:
+        new_transit_datas = []
+        for snapshot_path in snapshots_paths:
+            new_transit_data = TransitData(columnar_stop_times=transit_data.stop_times_table is not None,
+                                           integer_times=transit_data.integer_times,
+                                           compact_objects=transit_data.compact_objects)
+            new_transit_data.load_snapshot(snapshot_path, validate=False)
+            new_transit_datas.append(new_transit_data)
+        return new_transit_datas
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def _create_partial_transit_data_snapshot(args):
+    lines, add_unknown_files, snapshot_path = args
+
+    new_transit_data = create_partial_transit_data(_pool_transit_data, lines, add_unknown_files=add_unknown_files)
+    new_transit_data.save_snapshot(snapshot_path, validate=False)
+    return snapshot_path
 
 
 def load_partial_transit_data(gtfs_file, lines):
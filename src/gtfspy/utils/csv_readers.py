@@ -0,0 +1,118 @@
+import csv
+from array import array
+from cStringIO import StringIO
+from itertools import islice
+from multiprocessing import Pool
+from zipfile import ZipFile
+
+from gtfspy.utils.zip_writer import decompress_raw_zip_member, read_raw_zip_member
+
+
+class ZipCsvReader(object):
+    """
+    Reads the csv members of a GTFS zip file one after another, in the current process.
+    """
+
+    def __init__(self, zip_file):
+        """
+        :type zip_file: ZipFile
+        """
+
+        self._zip_file = zip_file
+
+    def read_rows(self, file_name):
+        """
+        :type file_name: str
+        :rtype: collections.Iterable[dict]
+        """
+
+        with self._zip_file.open(file_name, "r") as f:
+            for row in csv.DictReader(f):
+                yield row
+
+    def close(self):
+        pass
+
+
+class ParallelZipCsvReader(object):
+    """
+    Tokenizes the csv members of a GTFS zip file in a pool of worker processes.
+
+    All the requested members are submitted to the pool as soon as the reader is created, and read_rows blocks only
+    until the requested member was tokenized, so members are consumed in dependency order while the rest of them are
+    still being parsed.
+
+    A worker decompresses its member itself: it opens the zip file by its path, or gets the member's data as it's stored
+    (without decompressing it) when the zip file is a file object. It sends the member's fields back as a single string,
+    with the fields separated by NUL characters (which csv files can't contain), and an array of the rows' lengths, so
+    the rows cost two objects to transfer instead of an object per field.
+    """
+
+    def __init__(self, gtfs_file, zip_file, file_names, workers):
+        """
+        :type gtfs_file: str | file
+        :type zip_file: ZipFile
+        :type file_names: list[str]
+        :type workers: int
+        """
+
+        self._pool = Pool(processes=workers)
+        self._results = {}
+        for file_name in file_names:
+            if isinstance(gtfs_file, str):
+                args = (gtfs_file, file_name, None, None)
+            else:
+                zip_info = zip_file.getinfo(file_name)
+                args = (None, file_name, read_raw_zip_member(zip_file, zip_info), zip_info.compress_type)
+            self._results[file_name] = self._pool.apply_async(_tokenize_zip_member, args)
+
+    def read_rows(self, file_name):
+        """
+        :type file_name: str
+        :rtype: collections.Iterable[dict]
+        """
+
+        field_names, fields, rows_lengths = self._results.pop(file_name).get()
+        fields = iter(fields.split("\0")) if len(fields) > 0 or len(rows_lengths) > 0 else iter(())
+        rows_lengths = array("i", rows_lengths)
+        for row_length in rows_lengths:
+            if row_length == 0:
+                continue
+            row = list(islice(fields, row_length))
+            result = dict(zip(field_names, row))
+            if len(field_names) > row_length:
+                for key in field_names[row_length:]:
+                    result[key] = None
+            elif len(field_names) < row_length:
+                result[None] = row[len(field_names):]
+            yield result
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+
+def _tokenize_zip_member(gtfs_file_path, file_name, data, compress_type):
+    if data is not None:
+        return _tokenize_csv_file(StringIO(decompress_raw_zip_member(data, compress_type)))
+
+    with ZipFile(gtfs_file_path) as zip_file:
+        with zip_file.open(file_name, "r") as f:
+            return _tokenize_csv_file(f)
+
+
+def _tokenize_csv_file(f):
+    """
+    :return: the header's field names, the fields of the rows joined by NUL characters, and the rows' lengths (as the
+    string of an int array, which is pickled as is)
+    :rtype: (list[str], str, str)
+    """
+
+    reader = csv.reader(f)
+    field_names = next(reader, [])
+    fields = []
+    rows_lengths = array("i")
+    for row in reader:
+        rows_lengths.append(len(row))
+        fields.extend(row)
+    return field_names, "\0".join(fields), rows_lengths.tostring()
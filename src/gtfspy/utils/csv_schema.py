@@ -0,0 +1,58 @@
+import csv
+
+
+class CsvSchema(object):
+    """
+    The ordered columns of a CSV file, maintained incrementally as rows are added, in the order they were first seen.
+    """
+
+    def __init__(self, fields=()):
+        """
+        :type fields: collections.Iterable[str]
+        """
+
+        self.fields = []
+        self._fields_set = set()
+        self.update(fields)
+
+    def update(self, fields):
+        """
+        :type fields: collections.Iterable[str]
+        """
+
+        fields_set = self._fields_set
+        if fields_set.issuperset(fields):
+            return
+
+        for field in fields:
+            if field not in fields_set:
+                fields_set.add(field)
+                self.fields.append(field)
+
+    def write(self, csv_file, rows):
+        """
+        Writes the header and the rows (dicts of the schema's fields) with a positional csv writer. Like csv.DictWriter,
+        raises ValueError for a row with a field that isn't in the schema, instead of dropping its value.
+
+        :type csv_file: file
+        :type rows: collections.Iterable[dict]
+        """
+
+        fields = self.fields
+        fields_set = self._fields_set
+        writer = csv.writer(csv_file)
+        writer.writerow(fields)
+        for row in rows:
+            if not fields_set.issuperset(row):
+                raise ValueError("dict contains fields not in the schema: %s" %
+                                 (", ".join(repr(field) for field in row if field not in fields_set),))
+            writer.writerow(map(row.get, fields))
+
+    def __contains__(self, item):
+        return item in self._fields_set
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        return iter(self.fields)
@@ -0,0 +1,47 @@
+# the mean radius of the earth, in meters
+EARTH_RADIUS = 6371008.8
+
+
+def is_in_bounding_box(lat, lon, bounding_box):
+    """
+    :type lat: float
+    :type lon: float
+    :param bounding_box: the minimum latitude, minimum longitude, maximum latitude and maximum longitude of the box
+    :type bounding_box: (float, float, float, float)
+    :rtype: bool
+    """
+
+    min_lat, min_lon, max_lat, max_lon = bounding_box
+    return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+
+def is_in_polygon(lat, lon, polygon):
+    """
+    Checks whether a point is inside a polygon, treating the coordinates as planar (ray casting).
+
+    :type lat: float
+    :type lon: float
+    :param polygon: the (latitude, longitude) vertices of the polygon, in order
+    :type polygon: list[(float, float)]
+    :rtype: bool
+    """
+
+    result = False
+    prev_lat, prev_lon = polygon[-1]
+    for vertex_lat, vertex_lon in polygon:
+        if (vertex_lat > lat) != (prev_lat > lat) and \
+                lon < (prev_lon - vertex_lon) * (lat - vertex_lat) / (prev_lat - vertex_lat) + vertex_lon:
+            result = not result
+        prev_lat, prev_lon = vertex_lat, vertex_lon
+    return result
+
+
+def get_bounding_box(polygon):
+    """
+    :type polygon: list[(float, float)]
+    :rtype: (float, float, float, float)
+    """
+
+    lats = [lat for lat, _ in polygon]
+    lons = [lon for _, lon in polygon]
+    return min(lats), min(lons), max(lats), max(lons)
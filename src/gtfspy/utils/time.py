@@ -1,12 +1,15 @@
 from datetime import timedelta
 
+SECONDS_IN_DAY = 24 * 60 * 60
+
 
 def parse_timedelta(time_string):
     if isinstance(time_string, timedelta):
         return time_string
+    if isinstance(time_string, (int, long)):
+        return timedelta(seconds=time_string)
 
-    hours, minutes, seconds = map(int, time_string.split(':'))
-    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+    return timedelta(seconds=parse_time_seconds(time_string))
 
 
 def str_timedelta(time_delta):
@@ -15,8 +18,32 @@ def str_timedelta(time_delta):
     :type time_delta: timedelta
     """
 
-    total_seconds = time_delta.total_seconds()
-    hours = total_seconds // (60 * 60)
-    minutes = (total_seconds % (60 * 60)) // 60
-    seconds = total_seconds % 60
-    return "%02d:%02d:%02d" % (hours, minutes, seconds)
+    return str_time_seconds(time_delta.days * SECONDS_IN_DAY + time_delta.seconds)
+
+
+def parse_time_seconds(time_string):
+    """
+    Parses a GTFS time (HH:MM:SS, where the hours may pass 24) into seconds since the service day midnight.
+
+    :rtype: int
+    :type time_string: str | int | timedelta
+    """
+
+    if isinstance(time_string, (int, long)):
+        return time_string
+    if isinstance(time_string, timedelta):
+        return time_string.days * SECONDS_IN_DAY + time_string.seconds
+
+    first_colon = time_string.index(':')
+    second_colon = time_string.index(':', first_colon + 1)
+    return int(time_string[:first_colon]) * 3600 + int(time_string[first_colon + 1:second_colon]) * 60 + \
+           int(time_string[second_colon + 1:])
+
+
+def str_time_seconds(seconds):
+    """
+    :rtype: str
+    :type seconds: int
+    """
+
+    return "%02d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
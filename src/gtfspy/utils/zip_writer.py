@@ -0,0 +1,211 @@
+import struct
+import zipfile
+import zlib
+from datetime import datetime
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+# the version needed to extract a member with ZIP64 extensions
+ZIP64_VERSION = 45
+
+
+class ZipMemberWriter(object):
+    """
+    A writable file like object that streams its data into a new member of a zip file opened for writing.
+
+    The written data is compressed in chunks of at most buffer_size bytes straight into the zip file, so a member of
+    any size is written in a single pass without a temporary file. The member's sizes and CRC are written after its
+    data (in a data descriptor), and it is registered in the zip file's central directory when it's closed. The size
+    isn't known in advance, so when the zip file allows ZIP64 every member is written with a ZIP64 extra field in its
+    local header (and 8 bytes sizes in its data descriptor). Only one member can be written at a time, and the zip file
+    shouldn't be written by other means until it's closed.
+    """
+
+    def __init__(self, zip_file, file_name, compress_type=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        :type zip_file: zipfile.ZipFile
+        :type file_name: str
+        :type compress_type: int | None
+        :type buffer_size: int
+        """
+
+        assert zip_file.mode in ("w", "a")
+
+        self._zip_file = zip_file
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._buffered_size = 0
+        self.closed = False
+
+        zip_info = zipfile.ZipInfo(filename=file_name, date_time=datetime.now().timetuple()[:6])
+        zip_info.compress_type = zip_file.compression if compress_type is None else compress_type
+        zip_info.external_attr = 0600 << 16
+        zip_info.flag_bits |= 0x08
+        zip_info.file_size = 0
+        zip_info.compress_size = 0
+        zip_info.CRC = 0
+        zip_info.header_offset = zip_file.fp.tell()
+        zip_file._writecheck(zip_info)
+        zip_file._didModify = True
+        self._zip_info = zip_info
+        self._zip64 = zip_file._allowZip64
+        if self._zip64:
+            zip_info.extract_version = max(ZIP64_VERSION, zip_info.extract_version)
+            zip_info.create_version = max(ZIP64_VERSION, zip_info.create_version)
+
+        if zip_info.compress_type == zipfile.ZIP_DEFLATED:
+            self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        else:
+            self._compressor = None
+
+        zip_file.fp.write(zip_info.FileHeader(zip64=self._zip64))
+
+    def write(self, data):
+        """
+        :type data: str
+        """
+
+        assert not self.closed
+
+        self._buffer.append(data)
+        self._buffered_size += len(data)
+        if self._buffered_size >= self._buffer_size:
+            self.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        if len(self._buffer) == 0:
+            return
+
+        data = "".join(self._buffer)
+        self._buffer = []
+        self._buffered_size = 0
+
+        zip_info = self._zip_info
+        zip_info.CRC = zlib.crc32(data, zip_info.CRC) & 0xffffffff
+        zip_info.file_size += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._write_compressed(data)
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.flush()
+        if self._compressor is not None:
+            self._write_compressed(self._compressor.flush())
+        self.closed = True
+
+        zip_info = self._zip_info
+        if not self._zip64 and \
+                (zip_info.file_size > zipfile.ZIP64_LIMIT or zip_info.compress_size > zipfile.ZIP64_LIMIT):
+            raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+        fmt = "<LLQQ" if self._zip64 else "<LLLL"
+        self._zip_file.fp.write(struct.pack(fmt, zipfile._DD_SIGNATURE, zip_info.CRC, zip_info.compress_size,
+                                            zip_info.file_size))
+        self._zip_file.fp.flush()
+        self._zip_file.filelist.append(zip_info)
+        self._zip_file.NameToInfo[zip_info.filename] = zip_info
+
+    def _write_compressed(self, data):
+        self._zip_info.compress_size += len(data)
+        self._zip_file.fp.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def copy_zip_member(source_zip_file, zip_info, zip_file, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Copies a member of a zip file into a zip file opened for writing as is, without decompressing and recompressing
+    its data.
+
+    :type source_zip_file: zipfile.ZipFile
+    :type zip_info: zipfile.ZipInfo
+    :type zip_file: zipfile.ZipFile
+    :type buffer_size: int
+    """
+
+    assert zip_file.mode in ("w", "a")
+
+    source_fp = _seek_member_data(source_zip_file, zip_info)
+
+    new_zip_info = zipfile.ZipInfo(filename=zip_info.filename, date_time=zip_info.date_time)
+    for attribute in ["compress_type", "comment", "create_system", "create_version", "extract_version", "flag_bits",
+                      "internal_attr", "external_attr", "CRC", "compress_size", "file_size"]:
+        setattr(new_zip_info, attribute, getattr(zip_info, attribute))
+    new_zip_info.flag_bits &= ~0x08
+    new_zip_info.header_offset = zip_file.fp.tell()
+
+    zip64 = new_zip_info.file_size > zipfile.ZIP64_LIMIT or new_zip_info.compress_size > zipfile.ZIP64_LIMIT
+    if zip64 and not zip_file._allowZip64:
+        raise zipfile.LargeZipFile("Filesize would require ZIP64 extensions")
+    zip_file._writecheck(new_zip_info)
+    zip_file._didModify = True
+
+    zip_file.fp.write(new_zip_info.FileHeader(zip64))
+    remaining_size = new_zip_info.compress_size
+    while remaining_size > 0:
+        data = source_fp.read(min(buffer_size, remaining_size))
+        if not data:
+            raise zipfile.BadZipfile("Truncated file '%s'" % (zip_info.filename,))
+        zip_file.fp.write(data)
+        remaining_size -= len(data)
+    zip_file.fp.flush()
+
+    zip_file.filelist.append(new_zip_info)
+    zip_file.NameToInfo[new_zip_info.filename] = new_zip_info
+
+
+def read_raw_zip_member(zip_file, zip_info):
+    """
+    Reads the data of a member of a zip file as it's stored, without decompressing it.
+
+    :type zip_file: zipfile.ZipFile
+    :type zip_info: zipfile.ZipInfo
+    :rtype: str
+    """
+
+    data = _seek_member_data(zip_file, zip_info).read(zip_info.compress_size)
+    if len(data) != zip_info.compress_size:
+        raise zipfile.BadZipfile("Truncated file '%s'" % (zip_info.filename,))
+    return data
+
+
+def decompress_raw_zip_member(data, compress_type):
+    """
+    :param data: the data of a zip file member as it's stored (see read_raw_zip_member)
+    :type data: str
+    :type compress_type: int
+    :rtype: str
+    """
+
+    if compress_type == zipfile.ZIP_STORED:
+        return data
+    if compress_type == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(data, -15)
+    raise NotImplementedError("compression method %d is not supported" % (compress_type,))
+
+
+def _seek_member_data(zip_file, zip_info):
+    """
+    Seeks the zip file to the data of the member, after its local header.
+
+    :type zip_file: zipfile.ZipFile
+    :type zip_info: zipfile.ZipInfo
+    :rtype: file
+    """
+
+    fp = zip_file.fp
+    fp.seek(zip_info.header_offset)
+    file_header = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))
+    if file_header[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipfile("Bad magic number for file header")
+    fp.seek(file_header[zipfile._FH_FILENAME_LENGTH] + file_header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+    return fp
@@ -1,4 +1,5 @@
 import os
+import re
 
 from setuptools import setup, find_packages
 
@@ -8,9 +9,13 @@ with open(os.path.join("..", "README.md"), "r") as readme_file:
         .replace("](examples)", "](https://github.com/WYishai/gtfs.py/blob/master/examples)") \
         .replace("](LICENSE)", "](https://github.com/WYishai/gtfs.py/blob/master/LICENSE)")
 
+# the version is read from the package without importing it, since its dependencies may not be installed yet
+with open(os.path.join("gtfspy", "__init__.py"), "r") as init_file:
+    version = re.search(r'^__version__ = "([^"]+)"', init_file.read(), re.MULTILINE).group(1)
+
 setup(
     name="gtfs.py",
-    version="0.1",
+    version=version,
     packages=find_packages(),
 
     author="Yishai Wiesner",
@@ -19,6 +24,8 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=["sortedcontainers"],
+    # numpy is only needed for TransitData.materialize_instances and the stops' spatial queries
+    extras_require={"numpy": ["numpy"]},
     url="https://github.com/WYishai/gtfs.py",
     classifiers=[
         "Development Status :: 4 - Beta",
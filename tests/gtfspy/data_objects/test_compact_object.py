@@ -0,0 +1,105 @@
+import copy
+import pickle
+import unittest
+
+import constants
+from gtfspy import TransitData
+from gtfspy.data_objects import CompactRoute, CompactShapePoint, CompactStop, CompactStopTime, CompactTrip
+from test_utils.create_gtfs_object import create_full_transit_data
+from test_utils.test_case_utils import test_attribute, test_property
+
+
+class TestCompactObject(unittest.TestCase):
+    def test_compact_types(self):
+        td = create_full_transit_data(compact_objects=True)
+
+        self.assertTrue(all(isinstance(route, CompactRoute) for route in td.routes))
+        self.assertTrue(all(isinstance(shape_point, CompactShapePoint)
+                            for shape in td.shapes for shape_point in shape.shape_points))
+        self.assertTrue(all(isinstance(stop, CompactStop) for stop in td.stops))
+        self.assertTrue(all(isinstance(trip, CompactTrip) for trip in td.trips))
+        self.assertTrue(all(isinstance(stop_time, CompactStopTime)
+                            for trip in td.trips for stop_time in trip.stop_times))
+
+        for obj in [next(iter(td.routes)), next(iter(td.shapes)).shape_points[0], next(iter(td.stops)),
+                    next(iter(td.trips)), next(iter(td.trips)).stop_times[0]]:
+            self.assertFalse(hasattr(obj, "__dict__"))
+
+    def test_regular_objects_attributes(self):
+        td = create_full_transit_data()
+
+        # the regular objects keep accepting arbitrary attributes
+        for obj in [next(iter(td.routes)), next(iter(td.shapes)).shape_points[0], next(iter(td.stops)),
+                    next(iter(td.trips)), next(iter(td.trips)).stop_times[0]]:
+            obj.my_tag = 1
+            self.assertEqual(1, obj.my_tag)
+            self.assertIsInstance(obj.attributes, dict)
+
+    def test_equal_to_regular_objects(self):
+        td1 = create_full_transit_data()
+        td2 = create_full_transit_data(compact_objects=True)
+
+        self.assertEqual(td1, td2)
+        for trip in td1.trips:
+            self.assertDictEqual(trip.to_csv_line(), td2.trips[trip.id].to_csv_line())
+            self.assertItemsEqual(trip.get_csv_fields(), td2.trips[trip.id].get_csv_fields())
+        for stop in td1.stops:
+            self.assertDictEqual(stop.to_csv_line(), td2.stops[stop.id].to_csv_line())
+
+    def test_load_files(self):
+        td1 = TransitData(constants.GTFS_SAMPLE_FILE)
+        td2 = TransitData(constants.GTFS_SAMPLE_FILE, compact_objects=True)
+
+        self.assertEqual(td1, td2)
+        for shape in td1.shapes:
+            for shape_point, compact_shape_point in zip(shape.shape_points, td2.shapes[shape.id].shape_points):
+                self.assertEqual(shape_point.shape_dist_traveled, compact_shape_point.shape_dist_traveled)
+        for trip in td1.trips:
+            compact_trip = td2.trips[trip.id]
+            self.assertEqual(trip.shape, compact_trip.shape)
+            self.assertEqual(trip.bikes_allowed, compact_trip.bikes_allowed)
+            for stop_time, compact_stop_time in zip(trip.stop_times, compact_trip.stop_times):
+                for property_name in ["pickup_type", "drop_off_type", "shape_dist_traveled", "stop_headsign",
+                                      "is_exact_time"]:
+                    self.assertEqual(getattr(stop_time, property_name), getattr(compact_stop_time, property_name))
+
+    def test_attributes(self):
+        td = create_full_transit_data(compact_objects=True)
+        stop = td.stops[10000]
+
+        self.assertDictEqual(dict(stop.attributes), dict(create_full_transit_data().stops[10000].attributes))
+        self.assertIn("test_attribute", stop.attributes)
+        self.assertNotIn("stop_url", stop.attributes)
+
+        test_property(self, stop, property_name="stop_url", new_value="http://new.stop.com/")
+        test_property(self, stop, property_name="zone_id", new_value=5)
+        test_attribute(self, stop, attribute_name="new_attribute", new_value="new test data")
+
+        del stop.attributes["stop_url"]
+        del stop.attributes["test_attribute"]
+        del stop.attributes["new_attribute"]
+        self.assertNotIn("stop_url", stop.attributes)
+        self.assertIsNone(stop.stop_url)
+        self.assertFalse(hasattr(stop, "_extra_attributes"))
+        self.assertRaises(KeyError, stop.attributes.__delitem__, "stop_url")
+        self.assertRaises(KeyError, stop.attributes.__getitem__, "test_attribute")
+
+    def test_pickle(self):
+        for compact_objects in [False, True]:
+            td = create_full_transit_data(compact_objects=compact_objects)
+            # the stop and the shape point don't reference trips, whose sorted stop times can't be pickled
+            for obj in [td.stops[10000], next(iter(td.shapes)).shape_points[0]]:
+                for protocol in xrange(pickle.HIGHEST_PROTOCOL + 1):
+                    unpickled_obj = pickle.loads(pickle.dumps(obj, protocol))
+                    self.assertIs(type(obj), type(unpickled_obj))
+                    self.assertEqual(obj, unpickled_obj)
+                    self.assertDictEqual(dict(obj.attributes), dict(unpickled_obj.attributes))
+
+            for obj in [next(iter(td.routes)), next(iter(td.trips)), next(iter(td.trips)).stop_times[0]]:
+                copied_obj = copy.copy(obj)
+                self.assertEqual(obj, copied_obj)
+                self.assertDictEqual(dict(obj.attributes), dict(copied_obj.attributes))
+
+
+if __name__ == '__main__':
+    unittest.main()
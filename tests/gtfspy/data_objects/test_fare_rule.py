@@ -149,4 +149,29 @@ class TestFareRuleCollection(unittest.TestCase):
         td.fare_rules.clean()
         self.assertNotIn(trip, td.fare_rules)
 
+    def test_indexes(self):
+        td = create_full_transit_data()
+        fare_rule = td.fare_rules.add(**FULL_FARE_RULE_CSV_ROW)
+        self.assertIn(fare_rule, td.fare_rules.get_by_fare_id("1"))
+        self.assertIn(fare_rule, td.fare_rules.get_by_route(td.routes["1001"]))
+        self.assertIn(fare_rule, td.fare_rules.get_by_origin_id(7))
+        self.assertIn(fare_rule, td.fare_rules.get_by_destination_id(8))
+        self.assertIn(fare_rule, td.fare_rules.get_by_contains_id(8))
+
+        fare_rule.fare = td.fare_attributes["2"]
+        fare_rule.route = td.routes["1002"]
+        fare_rule.origin_id = 9
+        self.assertNotIn(fare_rule, td.fare_rules.get_by_fare_id("1"))
+        self.assertNotIn(fare_rule, td.fare_rules.get_by_route(td.routes["1001"]))
+        self.assertListEqual([], td.fare_rules.get_by_origin_id(7))
+        self.assertIn(fare_rule, td.fare_rules.get_by_fare_id("2"))
+        self.assertIn(fare_rule, td.fare_rules.get_by_route(td.routes["1002"]))
+        self.assertListEqual([fare_rule], td.fare_rules.get_by_origin_id(9))
+
+        td.fare_rules.remove(fare_rule)
+        self.assertNotIn(fare_rule, td.fare_rules.get_by_fare_id("2"))
+        self.assertNotIn(fare_rule, td.fare_rules.get_by_route(td.routes["1002"]))
+        self.assertListEqual([], td.fare_rules.get_by_origin_id(9))
+        self.assertListEqual([], td.fare_rules.get_by_contains_id(8))
+
     # TODO: test load from file
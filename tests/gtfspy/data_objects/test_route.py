@@ -1,5 +1,9 @@
 import unittest
+from datetime import date
+from itertools import islice
 
+import constants
+from gtfspy import TransitData
 from test_utils.create_gtfs_object import create_full_transit_data
 from test_utils.test_case_utils import test_property, test_attribute
 
@@ -131,6 +135,25 @@ class TestRoute(unittest.TestCase):
         edited_route.attributes["test_attribute2"] = "new test data"
         self.assertNotEqual(original_route, edited_route)
 
+    def test_get_trips_calendar(self):
+        td = TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE)
+        from_date, to_date = date(2018, 3, 1), date(2018, 3, 31)
+        route = max(td.routes, key=lambda r: len(r.trips))
+        for obj in [route, route.line]:
+            expected = sorted(obj.get_trips_calendar(from_date, to_date=to_date, sort=False))
+            self.assertNotEqual(0, len(expected))
+
+            calendar = obj.get_trips_calendar(from_date, to_date=to_date)
+            self.assertListEqual([t for t, _ in expected], [t for t, _ in calendar])
+            self.assertItemsEqual(expected, calendar)
+
+            stream = obj.get_trips_calendar(from_date, to_date=to_date, stream=True)
+            self.assertNotIsInstance(stream, list)
+            self.assertListEqual([t for t, _ in expected[:5]], [t for t, _ in islice(stream, 5)])
+            self.assertListEqual([t for t, _ in expected[5:]], [t for t, _ in stream])
+
+        self.assertListEqual([], route.get_trips_calendar(date(2000, 1, 1)))
+
 
 class TestRouteCollection(unittest.TestCase):
     def test_add(self):
@@ -145,6 +145,30 @@ class TestService(unittest.TestCase):
         edited_service.attributes["test_attribute2"] = "new test data"
         self.assertNotEqual(original_service, edited_service)
 
+    def test_active_days(self):
+        td = TransitData()
+        # 2018-07-01 is a sunday
+        service = td.calendar.add(service_id=1, start_date="20180703", end_date="20180830", sunday=1, monday=0,
+                                  tuesday=1, wednesday=0, thursday=0, friday=0, saturday=1)
+        td.calendar.set_calendar_date(service, date(2018, 7, 1), True)
+        td.calendar.set_calendar_date(service, date(2018, 7, 10), False)
+        td.calendar.set_calendar_date(service, date(2018, 9, 5), True)
+        td.calendar.set_calendar_date(service, date(2018, 9, 8), False)
+
+        days = [date(2018, 6, 20) + timedelta(days=i) for i in xrange(100)]
+        expected_dates = [day for day in days
+                          if service.calendar_dates.get(day, date(2018, 7, 3) <= day <= date(2018, 8, 30) and
+                                                        day.isoweekday() in (7, 2, 6))]
+        self.assertListEqual(expected_dates, [day for day in days if service.is_active_on(day)])
+        self.assertListEqual(expected_dates, list(service.get_active_dates(days[0], days[-1])))
+        self.assertListEqual(expected_dates[3:7], list(service.get_active_dates(expected_dates[3], expected_dates[6])))
+        self.assertEqual(len(expected_dates), service.count_active_days(days[0], days[-1]))
+        self.assertEqual(0, service.count_active_days(days[-1], days[0]))
+
+        service.monday = True
+        self.assertFalse(service.is_active_on(date(2018, 7, 2)))
+        self.assertTrue(service.is_active_on(date(2018, 7, 9)))
+
 
 class TestServiceCollection(unittest.TestCase):
     def test_add(self):
@@ -188,6 +212,20 @@ class TestServiceCollection(unittest.TestCase):
             source_service.saturday = not source_service.saturday
             self.assertRaises(Exception, dest_td.calendar.add_object, source_service)
 
+    def test_get_services_on(self):
+        td = TransitData()
+        service1 = td.calendar.add(**FULL_SERVICE_CSV_ROW)
+        self.assertListEqual([service1], td.calendar.get_services_on(TOMORROW_DATE))
+
+        row = dict(FULL_SERVICE_CSV_ROW, service_id=2, start_date=TOMORROW_DATE_STR)
+        service2 = td.calendar.add(**row)
+        self.assertListEqual([service1], td.calendar.get_services_on(TODAY_DATE))
+        self.assertItemsEqual([service1, service2], td.calendar.get_services_on(TOMORROW_DATE))
+        self.assertListEqual([], td.calendar.get_services_on(TOMORROW_DATE + timedelta(days=1)))
+
+        td.calendar._load_calendar_dates([dict(service_id="2", date=TOMORROW_DATE_STR, exception_type="2")])
+        self.assertListEqual([service1], td.calendar.get_services_on(TOMORROW_DATE))
+
     def test_remove(self):
         td = TransitData()
         service = td.calendar.add(**FULL_SERVICE_CSV_ROW)
@@ -170,6 +170,18 @@ class TestShapeCollection(unittest.TestCase):
             source_shape.shape_points[-1].sequence += 1
             self.assertRaises(Exception, dest_td.shapes.add_object, source_shape)
 
+    def test_load_rows(self):
+        for rows in ALL_CSV_ROWS:
+            td1 = TransitData()
+            for row in rows:
+                td1.shapes.add(**row)
+
+            td2 = TransitData()
+            td2.shapes._load_rows(dict(row) for row in reversed(rows))
+            self.assertEqual(td1.shapes, td2.shapes)
+            self.assertListEqual([row["shape_pt_sequence"] for row in rows],
+                                 [shape_point.sequence for shape_point in td2.shapes[rows[0]["shape_id"]].shape_points])
+
     def test_remove(self):
         td = TransitData()
         for row in FULL_SHAPE_CSV_ROWS:
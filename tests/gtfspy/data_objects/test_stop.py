@@ -1,8 +1,16 @@
+import math
 import unittest
+from datetime import date, timedelta
 
+import constants
 from gtfspy import TransitData
 from test_utils.test_case_utils import test_property
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 MINI_STOP_CSV_ROWS = [dict(stop_id=1, stop_name="stop name", stop_lat=31.789467, stop_lon=35.203715)]
 FULL_STOP_CSV_ROWS = [dict(stop_id=1, stop_name="parent stop name", stop_lat=-31.789467, stop_lon=-35.203715,
                            location_type=1),
@@ -13,6 +21,12 @@ FULL_STOP_CSV_ROWS = [dict(stop_id=1, stop_name="parent stop name", stop_lat=-31
 ALL_CSV_ROWS = [MINI_STOP_CSV_ROWS, FULL_STOP_CSV_ROWS]
 
 
+def _haversine_distance(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+
 class TestStop(unittest.TestCase):
     def test_minimum_properties(self):
         td = TransitData()
@@ -263,4 +277,74 @@ class TestStopCollection(unittest.TestCase):
         td.stops.clean()
         self.assertEqual(len(td.stops), 0)
 
+    def test_get_departures(self):
+        day = date(2018, 3, 11)
+        for columnar_stop_times in [False, True]:
+            td = TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE, columnar_stop_times=columnar_stop_times)
+            stops = sorted(td.stops, key=lambda s: -len(s.stop_times))[:5]
+            td.stops.build_departure_boards(stops[:2])
+
+            for stop in stops:
+                expected = sorted((stop_time.departure_seconds - days * 24 * 3600, stop_time.trip.id)
+                                  for days in (0, 1)
+                                  for stop_time in stop.stop_times
+                                  if stop_time.trip.service.is_active_on(day - timedelta(days=days)) and
+                                  6 * 3600 <= stop_time.departure_seconds - days * 24 * 3600 <= 12 * 3600)
+                departures = td.stops.get_departures(stop, day, "06:00:00", "12:00:00")
+                self.assertListEqual(expected, [(t, stop_time.trip.id) for t, stop_time in departures])
+                self.assertListEqual(expected[:3], [(t, stop_time.trip.id) for t, stop_time in
+                                                    td.stops.get_departures(stop.id, day, 6 * 3600, 12 * 3600,
+                                                                            limit=3)])
+
+            stop = stops[0]
+            departures = td.stops.get_departures(stop, day, 0)
+            trip = departures[0][1].trip
+            td.trips.remove(trip, recursive=True, clean_after=False)
+            self.assertNotIn(trip, [stop_time.trip for _, stop_time in td.stops.get_departures(stop, day, 0)])
+
+            other_trip = next(stop_time.trip for t, stop_time in departures[1:] if t == stop_time.departure_seconds)
+            td.add_stop_time(trip_id=other_trip.id, arrival_time="05:00:00", departure_time="05:00:00",
+                             stop_id=stop.id, stop_sequence=1000)
+            departures = td.stops.get_departures(stop, day, "05:00:00", "05:00:00")
+            self.assertListEqual([(5 * 3600, other_trip)], [(t, stop_time.trip) for t, stop_time in departures])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_spatial_queries(self):
+        td = TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE)
+
+        def get_distances(lat, lon):
+            return sorted((_haversine_distance(lat, lon, stop.stop_lat, stop.stop_lon), stop.id) for stop in td.stops)
+
+        stop = min(td.stops, key=lambda s: s.id)
+        for lat, lon in [(stop.stop_lat + 0.001, stop.stop_lon), (32.08, 34.78), (31.25, 34.79), (40.0, -70.0)]:
+            distances = get_distances(lat, lon)
+            self.assertListEqual([stop_id for _, stop_id in distances[:5]],
+                                 [stop.id for _, stop in td.stops.get_nearest_stops(lat, lon, k=5)])
+            self.assertListEqual([stop_id for _, stop_id in distances[:1]],
+                                 [stop.id for _, stop in td.stops.get_nearest_stops(lat, lon)])
+            for radius in [400, 5000]:
+                result = td.stops.get_stops_in_radius(lat, lon, radius)
+                self.assertListEqual([stop_id for distance, stop_id in distances if distance <= radius],
+                                     [stop.id for _, stop in result])
+                for distance, stop in result:
+                    self.assertAlmostEqual(_haversine_distance(lat, lon, stop.stop_lat, stop.stop_lon), distance,
+                                           places=3)
+
+        bounding_box = (31.0, 34.6, 31.4, 35.0)
+        self.assertSetEqual({stop.id for stop in td.stops
+                             if 31.0 <= stop.stop_lat <= 31.4 and 34.6 <= stop.stop_lon <= 35.0},
+                            {stop.id for stop in td.stops.get_stops_in_bounding_box(bounding_box)})
+
+        # the index is updated in place when stops are added and removed
+        spatial_index = td.stops._spatial_index
+        new_stop = td.stops.add(stop_id=1, stop_name="test stop", stop_lat=32.0801, stop_lon=34.7801)
+        self.assertEqual(new_stop, td.stops.get_nearest_stops(32.08, 34.78)[0][1])
+        nearest_stop = td.stops.get_nearest_stops(32.08, 34.78, k=2)[1][1]
+        td.stops.remove(new_stop)
+        self.assertEqual(nearest_stop, td.stops.get_nearest_stops(32.08, 34.78)[0][1])
+        self.assertIs(spatial_index, td.stops._spatial_index)
+        self.assertEqual(len(td.stops), len(spatial_index))
+
+        self.assertListEqual([], TransitData().stops.get_nearest_stops(32.08, 34.78))
+
     # TODO: test load from file
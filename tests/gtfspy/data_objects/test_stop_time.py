@@ -146,3 +146,17 @@ class TestStopTime(unittest.TestCase):
         edited_stop_time = new_td.add_stop_time(**FULL_STOP_TIME_CSV_ROW)
         edited_stop_time.attributes["test_attribute2"] = "new test data"
         self.assertNotEqual(original_stop_time, edited_stop_time)
+
+    def test_integer_times(self):
+        for columnar_stop_times in [False, True]:
+            for row in ALL_CSV_ROWS:
+                td = create_full_transit_data(integer_times=True, columnar_stop_times=columnar_stop_times)
+                stop_time = td.add_stop_time(**row)
+                self.assertEqual(stop_time.arrival_time, stop_time.arrival_seconds)
+                self.assertIsInstance(stop_time.departure_time, int)
+                self.assertDictEqual(stop_time.to_csv_line(), row)
+
+                self.assertEqual(create_full_transit_data().add_stop_time(**row), stop_time)
+
+                test_property(self, stop_time, property_name="arrival_time", new_value=25 * 60 * 60)
+                self.assertEqual(stop_time.to_csv_line()["arrival_time"], "25:00:00")
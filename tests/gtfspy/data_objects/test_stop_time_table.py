@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+import constants
+from gtfspy import TransitData
+from gtfspy.data_objects import StopTimeView
+from test_utils.create_gtfs_object import create_full_transit_data
+from test_utils.test_case_utils import test_property, test_attribute
+
+MINI_STOP_TIME_CSV_ROW = dict(trip_id="1001_1", arrival_time="01:00:00", departure_time="01:00:00", stop_id=10001,
+                              stop_sequence=3)
+FULL_STOP_TIME_CSV_ROW = dict(trip_id="1001_1", arrival_time="01:00:00", departure_time="02:00:00", stop_id=10001,
+                              stop_sequence=3, pickup_type=1, drop_off_type=0, shape_dist_traveled=0,
+                              stop_headsign="stop headsign", timepoint=0, test_attribute="test data")
+ALL_CSV_ROWS = [MINI_STOP_TIME_CSV_ROW, FULL_STOP_TIME_CSV_ROW]
+
+
+class TestStopTimeTable(unittest.TestCase):
+    def test_properties(self):
+        for row in ALL_CSV_ROWS:
+            td = create_full_transit_data(columnar_stop_times=True)
+            stop_time = td.add_stop_time(**row)
+            self.assertIsInstance(stop_time, StopTimeView)
+
+            test_property(self, stop_time, property_name="trip", new_value=td.trips["1001_2"])
+            test_property(self, stop_time, property_name="arrival_time", new_value=timedelta(hours=2))
+            test_property(self, stop_time, property_name="departure_time", new_value=timedelta(hours=3))
+            test_property(self, stop_time, property_name="stop", new_value=td.stops[20000])
+            test_property(self, stop_time, property_name="stop_sequence", new_value=1)
+            test_property(self, stop_time, property_name="pickup_type", new_value=2)
+            test_property(self, stop_time, property_name="drop_off_type", new_value=2)
+            test_property(self, stop_time, property_name="shape_dist_traveled", new_value=1)
+            test_property(self, stop_time, property_name="stop_headsign", new_value="new headsign")
+            test_property(self, stop_time, property_name="is_exact_time", new_value=not stop_time.is_exact_time)
+            test_attribute(self, stop_time, attribute_name="test_attribute", new_value="new test data")
+
+    def test_get_csv_line(self):
+        for row in ALL_CSV_ROWS:
+            td = create_full_transit_data(columnar_stop_times=True)
+            stop_time = td.add_stop_time(**row)
+            self.assertDictEqual(stop_time.to_csv_line(), row)
+            self.assertListEqual(sorted(stop_time.get_csv_fields()), sorted(row.iterkeys()))
+
+    def test_equal_to_objects(self):
+        for row in ALL_CSV_ROWS:
+            td1 = create_full_transit_data()
+            td2 = create_full_transit_data(columnar_stop_times=True)
+            self.assertEqual(td1.add_stop_time(**row), td2.add_stop_time(**row))
+            self.assertEqual(td1, td2)
+
+    def test_stop_times_order(self):
+        td = create_full_transit_data(columnar_stop_times=True)
+        td.add_stop_time(trip_id="1003_1", arrival_time="26:30:00", departure_time="26:30:00", stop_id=10001,
+                         stop_sequence=5)
+        td.add_stop_time(trip_id="1003_1", arrival_time="26:00:00", departure_time="26:00:00", stop_id=20000,
+                         stop_sequence=4)
+        trip = td.trips["1003_1"]
+        self.assertListEqual([stop_time.stop_sequence for stop_time in trip.stop_times], [0, 1, 2, 4, 5])
+        self.assertEqual(trip.stop_times[-1].stop.id, 10001)
+        self.assertEqual(trip.stop_times[-1].arrival_time, timedelta(hours=26, minutes=30))
+        self.assertEqual(len(td.stops[10001].stop_times), 8)
+
+    def test_remove(self):
+        td = create_full_transit_data(columnar_stop_times=True)
+        td.trips.remove("1003_1", recursive=True)
+        self.assertNotIn("1003_1", td.trips)
+        self.assertNotIn("1003", td.routes)
+
+        td1 = create_full_transit_data()
+        td1.trips.remove("1003_1", recursive=True)
+        self.assertEqual(td1, td)
+
+    def test_views_survive_clean(self):
+        td = create_full_transit_data(columnar_stop_times=True)
+        kept_trip = td.trips["1003_1"]
+        held = [(stop_time, stop_time.to_csv_line()) for stop_time in kept_trip.stop_times]
+        for trip in list(td.trips):
+            if trip is not kept_trip:
+                td.trips.remove(trip, recursive=True, clean_after=False)
+        td.clean()
+
+        # clean doesn't renumber the rows, so the held views still read their own stop times
+        self.assertGreater(len(td.stop_times_table), len(kept_trip.stop_times))
+        for stop_time, csv_line in held:
+            self.assertDictEqual(stop_time.to_csv_line(), csv_line)
+
+    def test_compact(self):
+        td1 = create_full_transit_data()
+        td2 = create_full_transit_data(columnar_stop_times=True)
+        table = td2.stop_times_table
+        for td in [td1, td2]:
+            for trip in sorted(td.trips, key=lambda t: t.id)[::2]:
+                td.trips.remove(trip, recursive=True)
+        self.assertEqual(td1, td2)
+
+        # the removed rows stay in the table until it's compacted explicitly
+        self.assertGreater(len(table), sum(len(trip.stop_times) for trip in td2.trips))
+        table.compact()
+        self.assertEqual(sum(len(trip.stop_times) for trip in td2.trips), len(table))
+        self.assertEqual(len(table), sum(len(stop.stop_times) for stop in td2.stops))
+        self.assertSetEqual({trip.id for trip in td2.trips}, {trip.id for trip in table._trips})
+        self.assertSetEqual({stop.id for stop in td2.stops if len(stop.stop_times) > 0},
+                            {stop.id for stop in table._stops})
+        self.assertEqual(td1, td2)
+
+        td2.add_stop_time(trip_id=next(iter(td2.trips)).id, arrival_time="30:00:00", departure_time="30:00:00",
+                          stop_id=next(iter(td2.stops)).id, stop_sequence=1000)
+        td1.add_stop_time(trip_id=next(iter(td2.trips)).id, arrival_time="30:00:00", departure_time="30:00:00",
+                          stop_id=next(iter(td2.stops)).id, stop_sequence=1000)
+        self.assertEqual(td1, td2)
+
+    def test_load_real_file(self):
+        self.assertEqual(TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE, columnar_stop_times=True),
+                         TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE))
+
+    def test_load_and_save(self):
+        temp_file_path = tempfile.mktemp() + ".zip"
+        try:
+            td1 = TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE, columnar_stop_times=True)
+            self.assertEqual(td1, TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE))
+            td1.save(temp_file_path)
+            td2 = TransitData(temp_file_path)
+            self.assertEqual(td1, td2)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -207,4 +207,23 @@ class TestTripCollection(unittest.TestCase):
         td.trips.clean()
         self.assertNotIn(trip, td.trips)
 
+    def test_reverse_indexes(self):
+        td = create_full_transit_data()
+        trip = td.trips.add(**FULL_TRIP_CSV_ROW)
+        self.assertIn(trip, td.calendar[1].trips)
+        self.assertIn(trip, td.shapes[1].trips)
+
+        trip.service = td.calendar[2]
+        trip.shape = td.shapes[2]
+        self.assertNotIn(trip, td.calendar[1].trips)
+        self.assertNotIn(trip, td.shapes[1].trips)
+        self.assertIn(trip, td.calendar[2].trips)
+        self.assertIn(trip, td.shapes[2].trips)
+
+        trip.shape = None
+        self.assertNotIn(trip, td.shapes[2].trips)
+
+        td.trips.remove(trip)
+        self.assertNotIn(trip, td.calendar[2].trips)
+
     # TODO: test load from file
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from cStringIO import StringIO
+from zipfile import ZipFile
+
+import constants
+from gtfspy import TransitData
+from gtfspy.data_objects import UnknownFile
+
+
+class TestUnknownFile(unittest.TestCase):
+    def test_data(self):
+        unknown_file = UnknownFile(StringIO("a,b\r\n1,2\r\n"))
+        self.assertEqual(unknown_file.data, "a,b\r\n1,2\r\n")
+        with unknown_file.open() as f:
+            self.assertEqual(f.read(), "a,b\r\n1,2\r\n")
+        self.assertIsNone(unknown_file.source_file)
+
+    def test_lazy_data(self):
+        with ZipFile(constants.GTFS_SAMPLE_FILE) as zip_file:
+            data = zip_file.read("unknown.txt")
+
+        unknown_file = UnknownFile(source_file=constants.GTFS_SAMPLE_FILE, file_name="unknown.txt")
+        self.assertIsNone(unknown_file._data)
+        with unknown_file.open() as f:
+            self.assertEqual(f.read(), data)
+        self.assertIsNone(unknown_file._data)
+        self.assertEqual(unknown_file.data, data)
+
+        unknown_file.data = "new data"
+        self.assertIsNone(unknown_file.source_file)
+        with unknown_file.open() as f:
+            self.assertEqual(f.read(), "new data")
+
+    def test_load_save(self):
+        temp_file_path = tempfile.mktemp() + ".zip"
+        try:
+            td = TransitData(constants.GTFS_SAMPLE_FILE)
+            unknown_file = td.unknown_files["unknown.txt"]
+            self.assertEqual(unknown_file.source_file, constants.GTFS_SAMPLE_FILE)
+            self.assertIsNone(unknown_file._data)
+
+            for passthrough in [False, True]:
+                td.save(temp_file_path, passthrough=passthrough)
+                self.assertIsNone(unknown_file._data)
+                with ZipFile(temp_file_path) as saved_zip, ZipFile(constants.GTFS_SAMPLE_FILE) as source_zip:
+                    self.assertEqual(saved_zip.read("unknown.txt"), source_zip.read("unknown.txt"))
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+import constants
+from gtfspy import TransitData
+from test_utils.create_gtfs_object import create_full_transit_data
+
+
+class TestTransitDataBatch(unittest.TestCase):
+    def test_clean(self):
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            td1 = TransitData(gtfs_file=file_path)
+            td2 = TransitData(gtfs_file=file_path)
+
+            stop_ids = sorted(stop.id for stop in td1.stops)[::2]
+            for stop_id in stop_ids:
+                td1.stops.remove(stop_id, recursive=True, clean_after=False)
+            td1.clean()
+
+            routes_num = len(td2.routes)
+            with td2.batch():
+                for stop_id in stop_ids:
+                    td2.stops.remove(stop_id, recursive=True)
+                self.assertEqual(routes_num, len(td2.routes))
+
+            self.assertEqual(td1, td2)
+
+    def test_clean_all(self):
+        td = create_full_transit_data()
+        with td.batch():
+            for trip in list(td.trips):
+                td.trips.remove(trip, recursive=True)
+
+        self.assertEqual(0, len(td.agencies))
+        self.assertEqual(0, len(td.routes))
+        self.assertEqual(0, len(td.trips))
+        self.assertEqual(0, len(td.shapes))
+        self.assertEqual(0, len(td.calendar))
+        self.assertEqual(0, len(td.stops))
+        self.assertEqual(0, len(td.fare_attributes))
+        self.assertEqual(0, len(td.fare_rules))
+
+    def test_without_clean(self):
+        td = create_full_transit_data()
+        routes_num = len(td.routes)
+        with td.batch(clean=False):
+            for trip in list(td.trips):
+                td.trips.remove(trip, recursive=True)
+
+        self.assertEqual(0, len(td.trips))
+        self.assertEqual(routes_num, len(td.routes))
+
+    def test_derived_indexes(self):
+        td = create_full_transit_data()
+        invalidations = []
+        td._register_derived_index(["stops.txt"], lambda: invalidations.append("stops"))
+        td._register_derived_index(["fare_attributes.txt"], lambda: invalidations.append("fare_attributes"))
+
+        with td.batch(clean=False):
+            for stop in list(td.stops):
+                td.stops.remove(stop, recursive=True)
+            self.assertListEqual([], invalidations)
+        self.assertListEqual(["stops"], invalidations)
+
+        td.stops.add(stop_id=1, stop_name="test stop", stop_lat=0, stop_lon=0)
+        self.assertListEqual(["stops", "stops"], invalidations)
+
+    def test_validate(self):
+        td = create_full_transit_data()
+        td.validate()
+
+        with td.batch(validate=True):
+            td.trips.remove(iter(td.trips).next(), recursive=True)
+            self.assertFalse(td.is_validated)
+        self.assertTrue(td.is_validated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import constants
+from gtfspy import TransitData, TransitDataCache
+
+
+class TestTransitDataCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_hit_and_miss(self):
+        cache = TransitDataCache(self.cache_dir)
+
+        td1 = TransitData()
+        td1.load_gtfs_file(constants.GTFS_SAMPLE_FILE, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        td2 = TransitData()
+        td2.load_gtfs_file(constants.GTFS_SAMPLE_FILE, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(td1, td2)
+        self.assertEqual(td1, TransitData(constants.GTFS_SAMPLE_FILE))
+
+        with open(constants.GTFS_SAMPLE_FILE, "rb") as f:
+            td3 = TransitData()
+            td3.load_gtfs_file(f, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertEqual(td1, td3)
+
+    def test_key(self):
+        cache = TransitDataCache(self.cache_dir)
+        key = cache.get_key(constants.GTFS_SAMPLE_FILE)
+        self.assertEqual(key, cache.get_key(constants.GTFS_SAMPLE_FILE))
+        self.assertNotEqual(key, cache.get_key(constants.GTFS_MINI_REAL_FILE))
+        self.assertNotEqual(key, cache.get_key(constants.GTFS_SAMPLE_FILE, partial={15: None}))
+        self.assertEqual(cache.get_key(constants.GTFS_SAMPLE_FILE, partial={15: ["58", "358"]}),
+                         cache.get_key(constants.GTFS_SAMPLE_FILE, partial={15: ["358", "58"]}))
+
+    def test_eviction(self):
+        cache = TransitDataCache(self.cache_dir)
+        td = TransitData()
+        td.load_gtfs_file(constants.GTFS_SAMPLE_FILE, cache=cache)
+        td = TransitData()
+        td.load_gtfs_file(constants.GTFS_SAMPLE_FILE, partial={15: None}, cache=cache)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        cache.max_size = 1
+        cache.evict()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 0)
+
+        cache = TransitDataCache(self.cache_dir, max_age=60)
+        td = TransitData()
+        td.load_gtfs_file(constants.GTFS_SAMPLE_FILE, cache=cache)
+        file_path = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        os.utime(file_path, (time.time() - 120, time.time() - 120))
+        cache.evict()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+from datetime import date, timedelta
+
+import constants
+from gtfspy import TransitData, create_partial_transit_data
+from gtfspy.transit_data_filter import TransitDataFilter
+
+
+class TestTransitDataFilter(unittest.TestCase):
+    def test_filter_rows(self):
+        rows_filter = TransitDataFilter({1: ["10"]})
+
+        self.assertListEqual(["1"], [row["agency_id"] for row in
+                                     rows_filter.filter_agencies([dict(agency_id="1"), dict(agency_id="2")])])
+        self.assertListEqual(["1001"], [row["route_id"] for row in rows_filter.filter_routes(
+            [dict(route_id="1001", agency_id="1", route_short_name="10"),
+             dict(route_id="1002", agency_id="1", route_short_name="11"),
+             dict(route_id="1003", agency_id="2", route_short_name="10")])])
+        trips_rows = rows_filter.filter_trips([dict(trip_id="1", route_id="1001", service_id="1", shape_id="5"),
+                                               dict(trip_id="2", route_id="1002", service_id="2", shape_id="6")])
+        self.assertListEqual(["1"], [row["trip_id"] for row in trips_rows])
+
+        self.assertListEqual(["1"], [row["stop_id"] for row in rows_filter.filter_stop_times(
+            [dict(trip_id="1", stop_id="1"), dict(trip_id="2", stop_id="2")])])
+        self.assertListEqual(["1"], [row["trip_id"] for row in rows_filter.filter_trips_by_stop_times(trips_rows)])
+        self.assertSetEqual({1}, rows_filter.service_ids)
+        self.assertSetEqual({5}, rows_filter.shape_ids)
+        self.assertListEqual(["1", "3"], [row["stop_id"] for row in rows_filter.filter_stops(
+            [dict(stop_id="1", parent_station="3", zone_id="7"), dict(stop_id="2", zone_id="8"),
+             dict(stop_id="3", location_type="1")])])
+        self.assertSetEqual({7}, rows_filter.zone_ids)
+
+        fare_attributes_rows = rows_filter.filter_fare_attributes([dict(fare_id="a"), dict(fare_id="b", agency_id="2"),
+                                                                   dict(fare_id="c")])
+        self.assertListEqual(["a"], [row["fare_id"] for row in rows_filter.filter_fare_rules(
+            [dict(fare_id="a", origin_id="7"), dict(fare_id="b", origin_id="7"), dict(fare_id="c", origin_id="8"),
+             dict(fare_id="c", route_id="1002")])])
+        self.assertListEqual(["a"], [row["fare_id"] for row in rows_filter.filter_unused_fares(fare_attributes_rows)])
+
+    def test_load_partial(self):
+        partial = {15: ["58", "358"]}
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            td = TransitData()
+            td.load_gtfs_file(file_path, partial=partial)
+            self.assertEqual(create_partial_transit_data(TransitData(gtfs_file=file_path), partial), td)
+
+    def test_load_date_range(self):
+        date_range = (date(2018, 3, 10), date(2018, 3, 11))
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            full_td = TransitData(gtfs_file=file_path)
+            td = TransitData()
+            td.load_gtfs_file(file_path, date_range=date_range)
+
+            days = [date_range[0] + timedelta(days=i) for i in xrange((date_range[1] - date_range[0]).days + 1)]
+            self.assertSetEqual({trip.id for trip in full_td.trips
+                                 if any(trip.service.start_date <= day <= trip.service.end_date and
+                                        trip.service.is_active_on(day) for day in days)},
+                                {trip.id for trip in td.trips})
+            self._assert_no_orphans(td)
+
+            td = TransitData()
+            td.load_gtfs_file(file_path, date_range=(date(2000, 1, 1), date(2000, 12, 31)))
+            self.assertEqual(0, len(td.trips))
+            self.assertEqual(0, len(td.stops))
+            self.assertEqual(0, len(td.routes))
+            self.assertEqual(0, len(td.agencies))
+
+    def test_load_time_range(self):
+        time_range = ("07:00:00", "08:30:00")
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            full_td = TransitData(gtfs_file=file_path)
+            td = TransitData()
+            td.load_gtfs_file(file_path, time_range=time_range, partial={15: None})
+
+            from_time, to_time = 7 * 3600, 8 * 3600 + 30 * 60
+            expected_trips = [trip for trip in full_td.trips if trip.route.agency.id == 15 and
+                              any(from_time <= stop_time.arrival_seconds <= to_time or
+                                  from_time <= stop_time.departure_seconds <= to_time
+                                  for stop_time in trip.stop_times)]
+            self.assertSetEqual({trip.id for trip in expected_trips}, {trip.id for trip in td.trips})
+            for trip in expected_trips:
+                self.assertEqual(len(trip.stop_times), len(td.trips[trip.id].stop_times))
+            self._assert_no_orphans(td)
+
+            td = TransitData()
+            td.load_gtfs_file(file_path, time_range=("03:00:00", "03:30:00"))
+            self._assert_no_orphans(td)
+
+    def test_load_area(self):
+        bounding_box = (31.0, 34.6, 31.4, 35.0)
+        polygon = [(31.0, 34.6), (31.4, 34.6), (31.4, 35.0), (31.0, 35.0)]
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            full_td = TransitData(gtfs_file=file_path)
+            area_stop_ids = {stop.id for stop in full_td.stops
+                             if 31.0 <= stop.stop_lat <= 31.4 and 34.6 <= stop.stop_lon <= 35.0}
+            expected_trips = [trip for trip in full_td.trips
+                              if any(stop_time.stop.id in area_stop_ids for stop_time in trip.stop_times)]
+
+            td = TransitData()
+            td.load_gtfs_file(file_path, bounding_box=bounding_box)
+            self.assertSetEqual({trip.id for trip in expected_trips}, {trip.id for trip in td.trips})
+            self.assertSetEqual({trip.route.id for trip in expected_trips}, {route.id for route in td.routes})
+            self.assertSetEqual({trip.route.agency.id for trip in expected_trips},
+                                {agency.id for agency in td.agencies})
+            for trip in expected_trips:
+                self.assertEqual(len(trip.stop_times), len(td.trips[trip.id].stop_times))
+            self._assert_no_orphans(td)
+
+            polygon_td = TransitData()
+            polygon_td.load_gtfs_file(file_path, polygon=polygon)
+            self.assertEqual(td, polygon_td)
+
+            td = TransitData()
+            td.load_gtfs_file(file_path, bounding_box=bounding_box, clip_stop_times=True)
+            self.assertSetEqual({trip.id for trip in expected_trips}, {trip.id for trip in td.trips})
+            for trip in td.trips:
+                self.assertTrue(all(stop_time.stop.id in area_stop_ids for stop_time in trip.stop_times))
+            self._assert_no_orphans(td)
+
+    def _assert_no_orphans(self, td):
+        for agency in td.agencies:
+            self.assertTrue(any(len(line.routes) > 0 for line in agency.lines))
+        for route in td.routes:
+            self.assertNotEqual(0, len(route.trips))
+        for trip in td.trips:
+            self.assertNotEqual(0, len(trip.stop_times))
+        parent_stations = {stop.parent_station for stop in td.stops}
+        for stop in td.stops:
+            self.assertTrue(len(stop.stop_times) > 0 or stop in parent_stations)
+        for shape in td.shapes:
+            self.assertNotEqual(0, len(shape.trips))
+        for service in td.calendar:
+            self.assertNotEqual(0, len(service.trips))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from datetime import date, datetime
+
+import constants
+from gtfspy import TransitData
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if numpy is not None:
+    from gtfspy.transit_data_instances import STOP_EVENT_DTYPE, TRIP_INSTANCE_DTYPE
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestTransitDataInstances(unittest.TestCase):
+    def test_materialize_instances(self):
+        start_date, end_date = date(2018, 3, 8), date(2018, 3, 21)
+        for file_path in constants.GTFS_TEST_FILES:
+            for columnar_stop_times in [False, True]:
+                print "testing '%s' (columnar stop times: %s)" % (file_path, columnar_stop_times)
+
+                td = TransitData(gtfs_file=file_path, columnar_stop_times=columnar_stop_times)
+                instances = td.materialize_instances(start_date, end_date)
+                self.assertEqual(TRIP_INSTANCE_DTYPE, instances.instances.dtype)
+                self.assertEqual(STOP_EVENT_DTYPE, instances.stop_events.dtype)
+
+                # the instances are ordered by the service date and then by the trip's index
+                expected_instances = [(day.date(), trip.id) for trip in instances.trips
+                                      for day in trip.get_trip_calendar(start_date, to_date=end_date)]
+                expected_instances.sort(key=lambda (service_date, _): service_date)
+                self.assertListEqual(expected_instances,
+                                     [(service_date.astype(date), instances.trips[trip_index].id)
+                                      for trip_index, service_date in instances.instances])
+
+                expected_events = []
+                for service_date, trip_id in expected_instances:
+                    day_seconds = int((datetime.combine(service_date, datetime.min.time()) - EPOCH).total_seconds())
+                    for stop_time in td.trips[trip_id].stop_times:
+                        expected_events.append((trip_id, service_date, stop_time.stop.id, stop_time.stop_sequence,
+                                                day_seconds + stop_time.arrival_seconds,
+                                                day_seconds + stop_time.departure_seconds))
+                self.assertListEqual(expected_events,
+                                     [(instances.trips[event["trip_index"]].id, event["service_date"].astype(date),
+                                       instances.stops[event["stop_index"]].id, event["stop_sequence"],
+                                       event["arrival_local_seconds"], event["departure_local_seconds"])
+                                      for event in instances.stop_events])
+                self.assertListEqual([instances.instances[i]["trip_index"]
+                                      for i in instances.stop_events["instance_index"]],
+                                     list(instances.stop_events["trip_index"]))
+
+                self.assertEqual(0, len(td.materialize_instances(date(2000, 1, 1), date(2000, 1, 31))))
+
+
+if __name__ == '__main__':
+    unittest.main()
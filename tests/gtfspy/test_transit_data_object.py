@@ -1,6 +1,9 @@
 import os
+import stat
 import tempfile
 import unittest
+from datetime import date, timedelta
+from zipfile import ZIP_STORED, ZipFile
 
 import constants
 from gtfspy import TransitData
@@ -19,6 +22,87 @@ class TestTransitDataLoad(unittest.TestCase):
 
             self.assertEqual(td1, td2)
 
+    def test_parallel_load(self):
+        td1 = TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE)
+        td2 = TransitData()
+        td2.load_gtfs_file(constants.GTFS_SAMPLE_FILE, workers=2)
+        self.assertEqual(td1, td2)
+
+        with open(constants.GTFS_SAMPLE_FILE, "rb") as f:
+            td3 = TransitData()
+            td3.load_gtfs_file(f, workers=2)
+        self.assertEqual(td1, td3)
+
+    def test_parallel_load_real_file(self):
+        td = TransitData()
+        td.load_gtfs_file(constants.GTFS_MINI_REAL_FILE, workers=2)
+        self.assertEqual(TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE), td)
+
+    def test_load_unordered_stop_times(self):
+        td1 = create_full_transit_data()
+        rows = [stop_time.to_csv_line() for trip in td1.trips for stop_time in trip.stop_times]
+        for trip in td1.trips:
+            for stop_time in list(trip.stop_times):
+                trip.stop_times.remove(stop_time)
+        for stop in td1.stops:
+            del stop.stop_times[:]
+
+        td2 = create_full_transit_data()
+        td1._load_stop_times(reversed(rows))
+        self.assertEqual(td2, td1)
+        for trip in td1.trips:
+            self.assertListEqual(sorted(stop_time.stop_sequence for stop_time in trip.stop_times),
+                                 [stop_time.stop_sequence for stop_time in trip.stop_times])
+
+    def test_load_calendar_dates(self):
+        fd, file_path = tempfile.mkstemp(suffix=".zip")
+        os.close(fd)
+        try:
+            with ZipFile(constants.GTFS_SAMPLE_FILE) as source_zip_file, ZipFile(file_path, "w") as zip_file:
+                for file_name in source_zip_file.namelist():
+                    zip_file.writestr(file_name, source_zip_file.read(file_name))
+                zip_file.writestr("calendar_dates.txt", "service_id,date,exception_type\r\n"
+                                                        "1,20180728,1\r\n"
+                                                        "1,20180730,2\r\n"
+                                                        "3,20180727,2\r\n")
+
+            td = TransitData(gtfs_file=file_path)
+            service = td.calendar[1]
+            self.assertDictEqual({date(2018, 7, 28): True, date(2018, 7, 30): False}, service.calendar_dates)
+            self.assertTrue(service.is_active_on(date(2018, 7, 28)))
+            self.assertFalse(service.is_active_on(date(2018, 7, 30)))
+            self.assertIn("calendar_dates.txt", td.unknown_files)
+
+            # the date range selects the services with their exceptions
+            for day, added_service_id, removed_service_id in [(date(2018, 7, 28), 1, None),
+                                                              (date(2018, 7, 27), None, 3)]:
+                filtered_td = TransitData()
+                filtered_td.load_gtfs_file(file_path, date_range=(day, day))
+                service_ids = {trip.service.id for trip in filtered_td.trips}
+                self.assertSetEqual({service.id for service in td.calendar
+                                     if service.is_active_on(day) and len(service.trips) > 0}, service_ids)
+                self.assertTrue(added_service_id is None or added_service_id in service_ids)
+                self.assertNotIn(removed_service_id, service_ids)
+
+            # the changed exceptions are saved with the transit data
+            td.calendar.set_calendar_date(2, date(2018, 7, 28), True)
+            self.assertTrue(td.calendar[2].is_active_on(date(2018, 7, 28)))
+            self.assertIn(td.calendar[2], td.calendar.get_services_on(date(2018, 7, 28)))
+            for passthrough in [False, True]:
+                td.save(file_path, passthrough=passthrough)
+                saved_td = TransitData(gtfs_file=file_path)
+                self.assertDictEqual({date(2018, 7, 28): True}, saved_td.calendar[2].calendar_dates)
+                self.assertDictEqual(service.calendar_dates, saved_td.calendar[1].calendar_dates)
+                self.assertEqual(td, saved_td)
+
+            td.save_snapshot(file_path)
+            snapshot_td = TransitData()
+            snapshot_td.load_snapshot(file_path)
+            self.assertDictEqual({date(2018, 7, 28): True}, snapshot_td.calendar[2].calendar_dates)
+            self.assertDictEqual(service.calendar_dates, snapshot_td.calendar[1].calendar_dates)
+        finally:
+            os.remove(file_path)
+
     def test_import_export(self):
         for file_path in constants.GTFS_TEST_FILES:
             print "testing '%s'" % (file_path,)
@@ -30,11 +114,132 @@ class TestTransitDataLoad(unittest.TestCase):
                 td2 = TransitData(temp_file_path)
                 self.assertEqual(td1, td2)
 
+                # the saved file gets the mode of a new file, like one created with open
+                umask = os.umask(0)
+                os.umask(umask)
+                self.assertEqual(0666 & ~umask, stat.S_IMODE(os.stat(temp_file_path).st_mode))
+
                 compare_gtfs_files(file_path, temp_file_path, self)
             finally:
                 if os.path.exists(temp_file_path):
                     os.remove(temp_file_path)
 
+    def test_save_passthrough(self):
+        temp_file_path = tempfile.mktemp() + ".zip"
+        try:
+            td1 = TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE)
+            td1.save(temp_file_path, passthrough=True)
+            self.assertEqual(td1, TransitData(temp_file_path))
+            with ZipFile(constants.GTFS_SAMPLE_FILE) as source_zip, ZipFile(temp_file_path) as saved_zip:
+                self.assertIsNone(saved_zip.testzip())
+                for file_name in ["agency.txt", "routes.txt", "shapes.txt", "calendar.txt", "trips.txt", "stops.txt",
+                                  "stop_times.txt", "fare_attributes.txt", "fare_rules.txt"]:
+                    self.assertEqual(source_zip.getinfo(file_name).CRC, saved_zip.getinfo(file_name).CRC)
+                    self.assertEqual(source_zip.getinfo(file_name).compress_size,
+                                     saved_zip.getinfo(file_name).compress_size)
+
+            for trip in list(next(iter(td1.routes)).trips):
+                td1.trips.remove(trip, recursive=True)
+            td1.stops.add(stop_id=999999, stop_name="new stop", stop_lat=32.0, stop_lon=34.0)
+            td1.save(temp_file_path, passthrough=True)
+            self.assertEqual(td1, TransitData(temp_file_path))
+            with ZipFile(constants.GTFS_SAMPLE_FILE) as source_zip, ZipFile(temp_file_path) as saved_zip:
+                self.assertNotEqual(source_zip.getinfo("routes.txt").CRC, saved_zip.getinfo("routes.txt").CRC)
+                self.assertNotEqual(source_zip.getinfo("trips.txt").CRC, saved_zip.getinfo("trips.txt").CRC)
+                self.assertNotEqual(source_zip.getinfo("stops.txt").CRC, saved_zip.getinfo("stops.txt").CRC)
+                self.assertEqual(source_zip.getinfo("agency.txt").compress_size,
+                                 saved_zip.getinfo("agency.txt").compress_size)
+
+            # the changes made through the objects' setters are reported by the objects
+            route = next(iter(td1.routes))
+            route.route_long_name = "EDITED"
+            stop = next(iter(td1.stops))
+            stop.stop_name = "EDITED"
+            td1.save(temp_file_path, passthrough=True)
+            saved_td = TransitData(temp_file_path)
+            self.assertEqual("EDITED", saved_td.routes[route.id].route_long_name)
+            self.assertEqual("EDITED", saved_td.stops[stop.id].stop_name)
+
+            # members compressed with another method than the requested one are re-encoded
+            td1.save(temp_file_path, compression=ZIP_STORED, passthrough=True)
+            self.assertEqual(td1, TransitData(temp_file_path))
+            with ZipFile(temp_file_path) as saved_zip:
+                self.assertIsNone(saved_zip.testzip())
+                for zip_info in saved_zip.infolist():
+                    self.assertEqual(ZIP_STORED, zip_info.compress_type)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+    def test_save_passthrough_edited_objects(self):
+        edits = [("agency.txt", lambda td: setattr(next(iter(td.agencies)), "agency_name", "EDITED")),
+                 ("agency.txt", lambda td: setattr(next(iter(td.agencies)), "agency_phone", "EDITED")),
+                 ("routes.txt", lambda td: setattr(next(iter(td.routes)), "route_long_name", "EDITED")),
+                 ("routes.txt", lambda td: next(iter(td.routes)).attributes.__setitem__("route_desc", "EDITED")),
+                 ("stops.txt", lambda td: setattr(next(iter(td.stops)), "stop_name", "EDITED")),
+                 ("stops.txt", lambda td: setattr(next(iter(td.stops)), "stop_lat", 32.5)),
+                 ("stops.txt", lambda td: next(iter(td.stops)).attributes.__delitem__("stop_desc")),
+                 ("trips.txt", lambda td: setattr(next(iter(td.trips)), "trip_headsign", "EDITED")),
+                 ("trips.txt", lambda td: next(iter(td.trips)).attributes.update(new_attribute="EDITED")),
+                 ("stop_times.txt", lambda td: setattr(next(iter(td.trips)).stop_times[0], "departure_time",
+                                                       next(iter(td.trips)).stop_times[0].departure_time +
+                                                       timedelta(minutes=1))),
+                 ("stop_times.txt", lambda td: setattr(next(iter(td.trips)).stop_times[0], "stop_headsign", "EDITED")),
+                 ("shapes.txt", lambda td: setattr(next(iter(td.shapes)).shape_points[0], "latitude", 32.5)),
+                 ("calendar.txt", lambda td: setattr(next(iter(td.calendar)), "end_date", date(2030, 1, 1))),
+                 ("calendar.txt", lambda td: setattr(td.calendar[1], "saturday", True)),
+                 ("fare_attributes.txt", lambda td: setattr(next(iter(td.fare_attributes)), "price", 100.0)),
+                 ("fare_rules.txt", lambda td: setattr(next(iter(td.fare_rules)), "contains_id", 99))]
+
+        temp_file_path = tempfile.mktemp() + ".zip"
+        try:
+            for kwargs in [dict(), dict(compact_objects=True), dict(columnar_stop_times=True)]:
+                for file_name, edit in edits:
+                    td = TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE, **kwargs)
+                    edit(td)
+                    td.save(temp_file_path, passthrough=True)
+                    self.assertEqual(td, TransitData(temp_file_path, **kwargs))
+                    with ZipFile(constants.GTFS_SAMPLE_FILE) as source_zip, ZipFile(temp_file_path) as saved_zip:
+                        self.assertNotEqual(source_zip.getinfo(file_name).CRC, saved_zip.getinfo(file_name).CRC,
+                                            (file_name, kwargs))
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+    def test_save_late_attributes(self):
+        temp_file_path = tempfile.mktemp() + ".zip"
+        try:
+            td1 = create_full_transit_data()
+            next(iter(td1.stops)).attributes["late_attribute"] = "stop data"
+            next(iter(td1.trips)).stop_times[0].attributes["late_attribute"] = "stop time data"
+            next(iter(td1.shapes)).shape_points[0].attributes["late_attribute"] = "shape data"
+            td1.save(temp_file_path)
+
+            td2 = TransitData(temp_file_path)
+            self.assertEqual(td1, td2)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+    def test_add_object_between_representations(self):
+        representations = [dict(), dict(columnar_stop_times=True), dict(integer_times=True, compact_objects=True)]
+        for source_kwargs in representations:
+            source_td = create_full_transit_data(**source_kwargs)
+            for dest_kwargs in representations:
+                dest_td = TransitData(**dest_kwargs)
+                for trip in source_td.trips:
+                    for stop_time in trip.stop_times:
+                        dest_td.add_object(stop_time, recursive=True)
+
+                for trip in source_td.trips:
+                    dest_trip = dest_td.trips[trip.id]
+                    self.assertEqual(trip, dest_trip)
+                    self.assertEqual(trip.shape, dest_trip.shape)
+                    self.assertListEqual(list(trip.stop_times), list(dest_trip.stop_times))
+                    for stop_time, dest_stop_time in zip(trip.stop_times, dest_trip.stop_times):
+                        self.assertIs(dest_td.stops[stop_time.stop.id], dest_stop_time.stop)
+                        self.assertIs(dest_trip, dest_stop_time.trip)
+
     def test_clean(self):
         td = create_full_transit_data()
         for trip in td.trips:
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+import constants
+from gtfspy import TransitData
+from test_utils.create_gtfs_object import create_full_transit_data
+
+
+class TestTransitDataSnapshot(unittest.TestCase):
+    def test_save_load(self):
+        temp_file_path = tempfile.mktemp()
+        try:
+            td1 = create_full_transit_data()
+            td1.save_snapshot(temp_file_path)
+
+            for columnar_stop_times in [False, True]:
+                td2 = TransitData(columnar_stop_times=columnar_stop_times)
+                td2.load_snapshot(temp_file_path)
+                self.assertEqual(td1, td2)
+                self.assertEqual(td1.translator._words, td2.translator._words)
+                self.assertEqual(td1.unknown_files["unknown.txt"].data, td2.unknown_files["unknown.txt"].data)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+    def test_save_load_files(self):
+        for file_path in constants.GTFS_TEST_FILES:
+            print "testing '%s'" % (file_path,)
+
+            temp_file_path = tempfile.mktemp()
+            try:
+                td1 = TransitData(gtfs_file=file_path, columnar_stop_times=True)
+                td1.save_snapshot(temp_file_path)
+                td2 = TransitData()
+                td2.load_snapshot(temp_file_path)
+                self.assertEqual(td1, td2)
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+    def test_invalid_file(self):
+        temp_file_path = tempfile.mktemp()
+        try:
+            with open(temp_file_path, "wb") as f:
+                f.write("not a snapshot file, just some text")
+            self.assertRaises(ValueError, TransitData().load_snapshot, temp_file_path)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
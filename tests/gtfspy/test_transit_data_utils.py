@@ -1,15 +1,27 @@
 import unittest
+from cStringIO import StringIO
 
 import constants
-from gtfspy import TransitData, clone_transit_data, create_partial_transit_data, load_partial_transit_data
+from gtfspy import TransitData, clone_transit_data, create_partial_transit_data, create_partial_transit_datas, \
+    load_partial_transit_data
+from gtfspy.data_objects import UnknownFile
 from test_utils.create_gtfs_object import create_full_transit_data
 
 
 class TestTransitDataUtils(unittest.TestCase):
     def test_clone(self):
         td1 = create_full_transit_data()
+        td1.unknown_files["unknown.txt"] = UnknownFile(StringIO("a,b\r\n1,2\r\n"))
         td2 = clone_transit_data(td1)
         self.assertEqual(td1, td2)
+        self.assertEqual("a,b\r\n1,2\r\n", td2.unknown_files["unknown.txt"].data)
+
+        # the clone's objects are its own
+        route = iter(td2.routes).next()
+        route.route_long_name = u"CHANGED"
+        td2.unknown_files["unknown.txt"].data = "a,b\r\n3,4\r\n"
+        self.assertEqual(td1, create_full_transit_data())
+        self.assertEqual("a,b\r\n1,2\r\n", td1.unknown_files["unknown.txt"].data)
 
     def test_create_partial(self):
         partial = {15: ["58", "358", "458"]}
@@ -29,6 +41,50 @@ class TestTransitDataUtils(unittest.TestCase):
                     self.assertListEqual(sorted(line.line_number for line in agency.lines),
                                          sorted(line.line_number for line in td1.agencies[agency.id].lines))
 
+    def test_create_partials(self):
+        lines_list = [{1: ["1", "3"]}, {1: ["2", "4"], 15: ["301"]}, {15: None}]
+        for td in [TransitData(gtfs_file=constants.GTFS_SAMPLE_FILE), create_full_transit_data()]:
+            partial_tds = create_partial_transit_datas(td, lines_list)
+            self.assertEqual(len(lines_list), len(partial_tds))
+            for lines, partial_td in zip(lines_list, partial_tds):
+                partial_td.validate()
+
+                routes = [route for route in td.routes if route.agency.id in lines and
+                          (lines[route.agency.id] is None or route.route_short_name in lines[route.agency.id])]
+                trips = [trip for route in routes for trip in route.trips]
+                stops = {stop_time.stop for trip in trips for stop_time in trip.stop_times}
+                for stop in list(stops):
+                    while stop.parent_station is not None:
+                        stop = stop.parent_station
+                        stops.add(stop)
+                zone_ids = {stop.zone_id for stop in stops}
+                fare_rules = [fare_rule for fare_rule in td.fare_rules
+                              if (fare_rule.route is None or fare_rule.route in routes) and
+                              all(zone_id is None or zone_id in zone_ids for zone_id in
+                                  (fare_rule.origin_id, fare_rule.destination_id, fare_rule.contains_id))]
+
+                self.assertSetEqual({agency_id for agency_id in lines if agency_id in td.agencies},
+                                    {agency.id for agency in partial_td.agencies})
+                self.assertSetEqual({route.id for route in routes}, {route.id for route in partial_td.routes})
+                self.assertSetEqual({trip.id for trip in trips}, {trip.id for trip in partial_td.trips})
+                self.assertSetEqual({stop.id for stop in stops}, {stop.id for stop in partial_td.stops})
+                self.assertSetEqual({trip.service.id for trip in trips},
+                                    {service.id for service in partial_td.calendar})
+                self.assertSetEqual({trip.shape.id for trip in trips if trip.shape is not None},
+                                    {shape.id for shape in partial_td.shapes})
+                self.assertEqual(len(fare_rules), len(partial_td.fare_rules))
+                for trip in trips:
+                    self.assertEqual(trip, partial_td.trips[trip.id])
+                    self.assertListEqual(list(trip.stop_times), list(partial_td.trips[trip.id].stop_times))
+
+            self.assertListEqual(partial_tds, create_partial_transit_datas(td, lines_list, workers=2))
+
+    def test_create_partials_real_file(self):
+        lines_list = [{15: ["358", "459"]}, {15: ["459", "1"]}]
+        td = TransitData(gtfs_file=constants.GTFS_MINI_REAL_FILE)
+        self.assertListEqual([create_partial_transit_data(td, lines) for lines in lines_list],
+                             create_partial_transit_datas(td, lines_list))
+
     def test_load_partial(self):
         lines = {15: ["58", "358", "458"]}
         for file_path in constants.GTFS_TEST_FILES:
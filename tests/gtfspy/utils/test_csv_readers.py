@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from gtfspy.utils.csv_readers import ParallelZipCsvReader, ZipCsvReader
+
+CSV_FILES = {"simple.txt": "a,b,c\r\n1,2,3\r\n4,5,6\r\n",
+             "quoted.txt": "a,b\r\n\"x,y\",\"multi\r\nline\"\r\n,\r\n\"\",last\r\n",
+             "ragged.txt": "a,b,c\r\n1\r\n\r\n1,2,3,4,5\r\n",
+             "header_only.txt": "a,b,c\r\n",
+             "empty.txt": ""}
+
+
+class TestParallelZipCsvReader(unittest.TestCase):
+    def test_read_rows(self):
+        for compression in [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]:
+            temp_file_path = tempfile.mktemp(suffix=".zip")
+            try:
+                with zipfile.ZipFile(temp_file_path, mode="w", compression=compression) as zip_file:
+                    for file_name, data in CSV_FILES.iteritems():
+                        zip_file.writestr(file_name, data)
+
+                with zipfile.ZipFile(temp_file_path) as zip_file:
+                    reader = ZipCsvReader(zip_file)
+                    expected_rows = {file_name: list(reader.read_rows(file_name)) for file_name in CSV_FILES}
+
+                for from_file_object in [False, True]:
+                    with open(temp_file_path, "rb") as f:
+                        gtfs_file = f if from_file_object else temp_file_path
+                        with zipfile.ZipFile(gtfs_file) as zip_file:
+                            reader = ParallelZipCsvReader(gtfs_file, zip_file, list(CSV_FILES), 2)
+                            try:
+                                for file_name in CSV_FILES:
+                                    self.assertListEqual(expected_rows[file_name], list(reader.read_rows(file_name)))
+                            finally:
+                                reader.close()
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import csv
+import unittest
+from cStringIO import StringIO
+
+from gtfspy.utils.csv_schema import CsvSchema
+
+
+class TestCsvSchema(unittest.TestCase):
+    def test_update(self):
+        schema = CsvSchema(["a", "b"])
+        schema.update(["b", "c"])
+        schema.update({"a": 1, "d": 2})
+        schema.update([])
+        self.assertListEqual(schema.fields, ["a", "b", "c", "d"])
+        self.assertIn("c", schema)
+        self.assertNotIn("e", schema)
+        self.assertEqual(len(schema), 4)
+
+    def test_write(self):
+        schema = CsvSchema(["a", "b", "c"])
+        rows = [{"a": 1, "b": "text, with comma"}, {"c": 3.5}, {}]
+
+        f = StringIO()
+        schema.write(f, rows)
+        f.seek(0)
+        self.assertListEqual(list(csv.reader(f)), [["a", "b", "c"], ["1", "text, with comma", ""], ["", "", "3.5"],
+                                                   ["", "", ""]])
+
+        self.assertRaises(ValueError, schema.write, StringIO(), [{"a": 1}, {"a": 1, "d": 2}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from gtfspy.utils.geo import get_bounding_box, is_in_bounding_box, is_in_polygon
+
+POLYGON = [(0, 0), (0, 10), (10, 10), (5, 5), (10, 0)]
+
+
+class TestGeo(unittest.TestCase):
+    def test_is_in_bounding_box(self):
+        self.assertTrue(is_in_bounding_box(1, 2, (0, 0, 10, 10)))
+        self.assertTrue(is_in_bounding_box(10, 0, (0, 0, 10, 10)))
+        self.assertFalse(is_in_bounding_box(11, 2, (0, 0, 10, 10)))
+        self.assertFalse(is_in_bounding_box(1, -2, (0, 0, 10, 10)))
+
+    def test_is_in_polygon(self):
+        self.assertTrue(is_in_polygon(2, 5, POLYGON))
+        self.assertTrue(is_in_polygon(8, 1, POLYGON))
+        self.assertFalse(is_in_polygon(8, 5, POLYGON))
+        self.assertFalse(is_in_polygon(-1, 5, POLYGON))
+
+    def test_get_bounding_box(self):
+        self.assertTupleEqual((0, 0, 10, 10), get_bounding_box(POLYGON))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from datetime import timedelta
+
+from gtfspy.utils.time import *
+
+
+class TestParseTimeSeconds(unittest.TestCase):
+    def test_parse_string(self):
+        self.assertEqual(parse_time_seconds("00:00:00"), 0)
+        self.assertEqual(parse_time_seconds("01:02:03"), 3723)
+        self.assertEqual(parse_time_seconds("1:02:03"), 3723)
+        self.assertEqual(parse_time_seconds("25:13:00"), 25 * 3600 + 13 * 60)
+        self.assertEqual(parse_time_seconds(" 8:00:00"), 8 * 3600)
+
+    def test_parse_other_types(self):
+        self.assertEqual(parse_time_seconds(3723), 3723)
+        self.assertEqual(parse_time_seconds(timedelta(hours=25, minutes=1)), 25 * 3600 + 60)
+
+    def test_invalid_string(self):
+        self.assertRaises(ValueError, parse_time_seconds, "01:02")
+        self.assertRaises(ValueError, parse_time_seconds, "aa:bb:cc")
+
+
+class TestStrTimeSeconds(unittest.TestCase):
+    def test_str(self):
+        self.assertEqual(str_time_seconds(0), "00:00:00")
+        self.assertEqual(str_time_seconds(3723), "01:02:03")
+        self.assertEqual(str_time_seconds(25 * 3600 + 13 * 60), "25:13:00")
+        self.assertEqual(str_time_seconds(100 * 3600), "100:00:00")
+
+    def test_timedelta(self):
+        for time_string in ["00:00:00", "01:02:03", "23:59:59", "24:00:00", "25:13:00"]:
+            self.assertEqual(str_timedelta(parse_timedelta(time_string)), time_string)
+            self.assertEqual(str_time_seconds(parse_time_seconds(time_string)), time_string)
+
+
+if __name__ == '__main__':
+    unittest.main()
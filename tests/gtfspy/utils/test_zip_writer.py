@@ -0,0 +1,99 @@
+import os
+import struct
+import tempfile
+import unittest
+import zipfile
+
+from gtfspy.utils.zip_writer import ZipMemberWriter, copy_zip_member
+
+
+class TestZipMemberWriter(unittest.TestCase):
+    def test_write(self):
+        small_data = "a,b,c\r\n1,2,3\r\n"
+        large_data = "".join("%d,%d,some text\r\n" % (i, i * i) for i in xrange(100000))
+
+        for compression in [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]:
+            temp_file_path = tempfile.mktemp(suffix=".zip")
+            try:
+                with zipfile.ZipFile(temp_file_path, mode="w", compression=compression) as zip_file:
+                    with ZipMemberWriter(zip_file, "small.txt") as f:
+                        f.write(small_data)
+                    with ZipMemberWriter(zip_file, "empty.txt"):
+                        pass
+                    with ZipMemberWriter(zip_file, "large.txt", buffer_size=1000) as f:
+                        f.writelines(large_data[i:i + 777] for i in xrange(0, len(large_data), 777))
+                    zip_file.writestr("other.txt", small_data)
+
+                with zipfile.ZipFile(temp_file_path) as zip_file:
+                    self.assertIsNone(zip_file.testzip())
+                    self.assertListEqual(zip_file.namelist(), ["small.txt", "empty.txt", "large.txt", "other.txt"])
+                    self.assertEqual(zip_file.read("small.txt"), small_data)
+                    self.assertEqual(zip_file.read("empty.txt"), "")
+                    self.assertEqual(zip_file.read("large.txt"), large_data)
+                    self.assertEqual(zip_file.read("other.txt"), small_data)
+                    self.assertEqual(zip_file.getinfo("large.txt").compress_type, compression)
+            finally:
+                if os.path.exists(temp_file_path):
+                    os.remove(temp_file_path)
+
+    def test_write_zip64(self):
+        data = "a,b,c\r\n1,2,3\r\n"
+
+        temp_file_path = tempfile.mktemp(suffix=".zip")
+        try:
+            with zipfile.ZipFile(temp_file_path, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as \
+                    zip_file:
+                with ZipMemberWriter(zip_file, "data.txt") as f:
+                    f.write(data)
+                zip_file.writestr("other.txt", data)
+
+            with zipfile.ZipFile(temp_file_path) as zip_file:
+                self.assertIsNone(zip_file.testzip())
+                self.assertEqual(zip_file.read("data.txt"), data)
+                self.assertEqual(zip_file.read("other.txt"), data)
+
+                # the local header reserves a ZIP64 extra field, so the data descriptor has 8 bytes sizes
+                zip_info = zip_file.getinfo("data.txt")
+                zip_file.fp.seek(zip_info.header_offset)
+                file_header = struct.unpack(zipfile.structFileHeader, zip_file.fp.read(zipfile.sizeFileHeader))
+                zip_file.fp.seek(file_header[zipfile._FH_FILENAME_LENGTH], 1)
+                extra = zip_file.fp.read(file_header[zipfile._FH_EXTRA_FIELD_LENGTH])
+                self.assertEqual(1, struct.unpack("<H", extra[:2])[0])
+                zip_file.fp.seek(zip_info.compress_size, 1)
+                self.assertTupleEqual((zipfile._DD_SIGNATURE, zip_info.CRC, zip_info.compress_size,
+                                       zip_info.file_size), struct.unpack("<LLQQ", zip_file.fp.read(24)))
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+    def test_copy_member(self):
+        data = "".join("%d,%d,some text\r\n" % (i, i * i) for i in xrange(10000))
+
+        source_file_path = tempfile.mktemp(suffix=".zip")
+        temp_file_path = tempfile.mktemp(suffix=".zip")
+        try:
+            with zipfile.ZipFile(source_file_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                zip_file.writestr("data.txt", data)
+                with ZipMemberWriter(zip_file, "streamed.txt") as f:
+                    f.write(data)
+
+            with zipfile.ZipFile(source_file_path) as source_zip_file, \
+                    zipfile.ZipFile(temp_file_path, mode="w", compression=zipfile.ZIP_STORED) as zip_file:
+                zip_file.writestr("other.txt", "other data")
+                copy_zip_member(source_zip_file, source_zip_file.getinfo("streamed.txt"), zip_file)
+                copy_zip_member(source_zip_file, source_zip_file.getinfo("data.txt"), zip_file)
+
+            with zipfile.ZipFile(temp_file_path) as zip_file:
+                self.assertIsNone(zip_file.testzip())
+                self.assertEqual(zip_file.read("other.txt"), "other data")
+                self.assertEqual(zip_file.read("data.txt"), data)
+                self.assertEqual(zip_file.read("streamed.txt"), data)
+                self.assertEqual(zip_file.getinfo("data.txt").compress_type, zipfile.ZIP_DEFLATED)
+        finally:
+            for file_path in [source_file_path, temp_file_path]:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,8 @@ from gtfspy import TransitData
 from gtfspy.data_objects import UnknownFile
 
 
-def create_full_transit_data():
-    td = TransitData()
+def create_full_transit_data(**kwargs):
+    td = TransitData(**kwargs)
 
     td.stops.add(stop_id=10000, stop_name="Jerusalem Central Station", stop_lat=31.789467, stop_lon=35.203715,
                  stop_code="10000", stop_desc="Jerusalem Central Station", zone_id=1, location_type=1,